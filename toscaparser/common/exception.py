@@ -13,8 +13,10 @@
 '''
 TOSCA exception classes
 '''
+import contextlib
 import logging
 import sys
+import threading
 import traceback
 
 from toscaparser.utils.gettextutils import _
@@ -190,6 +192,7 @@ class ExceptionCollector(object):
     collecting = False
     near = None
     previous = False
+    _local = threading.local()  # see raising()
 
     @staticmethod
     def clear():
@@ -215,6 +218,21 @@ class ExceptionCollector(object):
     def resume():
         ExceptionCollector.collecting = ExceptionCollector.previous
 
+    @staticmethod
+    @contextlib.contextmanager
+    def raising():
+        '''Raise the exceptions appended by the current thread.
+
+        They are raised instead of collected; other threads are handled
+        as before.
+        '''
+        previous = getattr(ExceptionCollector._local, "raising", False)
+        ExceptionCollector._local.raising = True
+        try:
+            yield
+        finally:
+            ExceptionCollector._local.raising = previous
+
     @staticmethod
     def contains(exception):
         for ex in ExceptionCollector.exceptions:
@@ -224,7 +242,8 @@ class ExceptionCollector(object):
 
     @staticmethod
     def appendException(exception):
-        if ExceptionCollector.collecting:
+        if ExceptionCollector.collecting and not getattr(
+                ExceptionCollector._local, "raising", False):
             if not ExceptionCollector.contains(exception):
                 # extract_stack()[:-1] drops this appendException frame itself.
                 # The next frame up is the caller that raised the error — keep
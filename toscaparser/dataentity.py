@@ -28,6 +28,8 @@ import collections.abc
 
 
 class ValueDataType(object):
+    __slots__ = ("value_type", "defs")
+
     def __init__(self, type):
         self.value_type = type
         self.defs = dict(type=type)
@@ -38,6 +40,9 @@ class ValueDataType(object):
 class DataEntity(object):
     """A complex data value entity."""
 
+    __slots__ = ("custom_def", "type", "datatype", "schema", "value",
+                 "property_name", "_properties")
+
     def __init__(self, datatypename, value, custom_def=None, prop_name=None):
         self.custom_def = custom_def
         self.type = datatypename
@@ -78,7 +83,7 @@ class DataEntity(object):
             self.value = DataEntity.validate_datatype(
                 self.datatype.value_type, self.value, None, self.custom_def, None, None, self
             )
-            schema = Schema(self.property_name, self.datatype.defs)
+            schema = Schema.get_shared(self.property_name, self.datatype.defs)
             for constraint in schema.constraints:
                 constraint.validate(self.value)
         # If the datatype has 'properties' definition:
@@ -71,7 +71,8 @@ class ArtifactTypeDef(StatefulEntityType):
             return None
         partifact_entity = self.derived_from(self.defs)
         if partifact_entity:
-            return ArtifactTypeDef(partifact_entity, self.custom_def)
+            return ArtifactTypeDef.intern(partifact_entity,
+                                          custom_def=self.custom_def)
 
     def get_artifact(self, name):
         """Return the definition of an artifact field by name."""
@@ -17,6 +17,7 @@ from toscaparser.elements.statefulentitytype import StatefulEntityType
 class CapabilityType(StatefulEntityType):
     '''TOSCA built-in capabilities type.'''
     TOSCA_TYPEURI_CAPABILITY_ROOT = 'tosca.capabilities.Root'
+    _intern_type_arg = 1
 
     def __init__(self, name, ctype, custom_def=None):
         self.name = name
@@ -30,5 +31,5 @@ class CapabilityType(StatefulEntityType):
             return None
         pnode = self.derived_from(self.defs)
         if pnode:
-            return CapabilityType(self.name, pnode,
-                                     self.custom_def)
+            return CapabilityType.intern(self.name, pnode,
+                                         custom_def=self.custom_def)
@@ -14,6 +14,7 @@ import collections.abc
 import datetime
 import re
 import json
+import weakref
 
 from toscaparser.common.exception import ExceptionCollector
 from toscaparser.common.exception import InvalidSchemaError
@@ -27,6 +28,9 @@ from toscaparser.utils.validateutils import validate_version
 
 class Schema(collections.abc.Mapping):
 
+    __slots__ = ("name", "type", "schema", "_len", "_constraints_list",
+                 "__weakref__")
+
     KEYS = (TYPE, REQUIRED, DESCRIPTION, DEFAULT, CONSTRAINTS, KEY_SCHEMA, ENTRY_SCHEMA, STATUS, METADATA, TITLE) = (
         "type",
         "required",
@@ -93,6 +97,26 @@ class Schema(collections.abc.Mapping):
 
     SCALAR_UNIT_SIZE_DEFAULT = "B"
 
+    # schemas without errors, shared by the properties with the same definition
+    _shared = weakref.WeakValueDictionary()
+
+    @classmethod
+    def get_shared(cls, name, schema_dict, datatype=None):
+        '''Return a Schema for schema_dict, shared when possible.'''
+        key = (name, id(schema_dict), datatype)
+        try:
+            schema = cls._shared.get(key)
+        except TypeError:  # unhashable datatype
+            return cls(name, schema_dict, datatype)
+        if schema is not None and schema.schema is schema_dict:
+            return schema
+        schema = cls(name, schema_dict, datatype)
+        if (isinstance(schema_dict, collections.abc.Mapping) and
+                (datatype or "type" in schema_dict)):
+            # only share valid schemas so errors are reported each time
+            cls._shared[key] = schema
+        return schema
+
     def __init__(self, name, schema_dict, datatype=None):
         self.name = name
         if not isinstance(schema_dict, collections.abc.Mapping):
@@ -141,10 +165,15 @@ class Schema(collections.abc.Mapping):
         if self._constraints_list is None:
             constraint_schemata = self.schema.get(self.CONSTRAINTS)
             if constraint_schemata:
-                self._constraints_list = [
+                start = len(ExceptionCollector.exceptions)
+                constraints = [
                     Constraint(self.name, self.type, cschema)
                     for cschema in constraint_schemata
                 ]
+                if len(ExceptionCollector.exceptions) != start:
+                    # don't save so the errors are reported on each use
+                    return constraints
+                self._constraints_list = constraints
             else:
                 self._constraints_list = []
         return self._constraints_list
@@ -158,10 +187,15 @@ class Schema(collections.abc.Mapping):
         return self.schema.get(self.ENTRY_SCHEMA)
 
     def __getstate__(self):
-        state = self.__dict__.copy()
+        state = {k: getattr(self, k) for k in self.__slots__
+                 if k != "__weakref__" and hasattr(self, k)}
         state["_constraints_list"] = None  # might not be picklable
         return state
 
+    def __setstate__(self, state):
+        for k, v in state.items():
+            setattr(self, k, v)
+
     def __getitem__(self, key):
         return self.schema[key]
 
@@ -183,6 +217,9 @@ class Schema(collections.abc.Mapping):
 class Constraint(object):
     """Parent class for constraints for a Property or Input."""
 
+    __slots__ = ("property_name", "property_type", "constraint_value",
+                 "constraint_value_msg", "value_msg")
+
     CONSTRAINTS = (
         EQUAL,
         GREATER_THAN,
@@ -284,6 +321,8 @@ class Equal(Constraint):
     the value declared.
     """
 
+    __slots__ = ()
+
     constraint_key = Constraint.EQUAL
 
     valid_prop_types = Schema.PROPERTY_TYPES
@@ -312,6 +351,8 @@ class GreaterThan(Constraint):
     the value declared.
     """
 
+    __slots__ = ()
+
     constraint_key = Constraint.GREATER_THAN
 
     valid_types = (int, float, datetime.date, datetime.time, datetime.datetime)
@@ -361,6 +402,8 @@ class GreaterOrEqual(Constraint):
     to ('>=') the value declared.
     """
 
+    __slots__ = ()
+
     constraint_key = Constraint.GREATER_OR_EQUAL
 
     valid_types = (int, float, datetime.date, datetime.time, datetime.datetime)
@@ -411,6 +454,8 @@ class LessThan(Constraint):
     the value declared.
     """
 
+    __slots__ = ()
+
     constraint_key = Constraint.LESS_THAN
 
     valid_types = (int, float, datetime.date, datetime.time, datetime.datetime)
@@ -458,6 +503,8 @@ class LessOrEqual(Constraint):
     to ('<=') the value declared.
     """
 
+    __slots__ = ()
+
     constraint_key = Constraint.LESS_OR_EQUAL
 
     valid_types = (int, float, datetime.date, datetime.time, datetime.datetime)
@@ -507,6 +554,8 @@ class InRange(Constraint):
     the two values declared.
     """
 
+    __slots__ = ("min", "max")
+
     UNBOUNDED = "UNBOUNDED"
 
     constraint_key = Constraint.IN_RANGE
@@ -583,6 +632,8 @@ class ValidValues(Constraint):
     declared values.
     """
 
+    __slots__ = ()
+
     constraint_key = Constraint.VALID_VALUES
 
     valid_prop_types = Schema.PROPERTY_TYPES
@@ -616,6 +667,8 @@ class Length(Constraint):
     Constrains the property or parameter to a value of a given length.
     """
 
+    __slots__ = ()
+
     constraint_key = Constraint.LENGTH
 
     valid_types = (int,)
@@ -650,6 +703,8 @@ class MinLength(Constraint):
     Constrains the property or parameter to a value to a minimum length.
     """
 
+    __slots__ = ()
+
     constraint_key = Constraint.MIN_LENGTH
 
     valid_types = (int,)
@@ -685,6 +740,8 @@ class MaxLength(Constraint):
     Constrains the property or parameter to a value to a maximum length.
     """
 
+    __slots__ = ()
+
     constraint_key = Constraint.MAX_LENGTH
 
     valid_types = (int,)
@@ -721,6 +778,8 @@ class Pattern(Constraint):
     the provided regular expression.
     """
 
+    __slots__ = ("match",)
+
     constraint_key = Constraint.PATTERN
 
     valid_types = str
@@ -757,6 +816,8 @@ class SchemaConstraint(Constraint):
     the provided json schema.
     """
 
+    __slots__ = ("schema", "message")
+
     constraint_key = Constraint.SCHEMA
 
     valid_types = str
@@ -802,6 +863,8 @@ class VersionConstraint(Constraint):
     with the declared version requirement.
     """
 
+    __slots__ = ()
+
     constraint_key = Constraint.VERSION
 
     valid_types = (int, float, str)
@@ -32,7 +32,7 @@ class DataType(StatefulEntityType):
         '''Return a datatype this datatype is derived from.'''
         ptype = self.derived_from(self.defs)
         if ptype:
-            return DataType(ptype, self.custom_def)
+            return DataType.intern(ptype, custom_def=self.custom_def)
         return None
 
     @property
@@ -10,23 +10,294 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+from collections import ChainMap
+from collections import OrderedDict
 import copy
 import logging
 import os
 import threading
+from types import MappingProxyType
+import weakref
 from toscaparser.common.exception import ExceptionCollector
 from toscaparser.common.exception import ValidationError
 from toscaparser.extensions.exttools import ExtTools
+from toscaparser.utils import diskcache
 import toscaparser.utils.yamlparser
 
 logger = logging.getLogger('tosca')
+
+
+class _Scope(list):
+    # [types, parent_types, inherited values, instances], see TypeRegistry
+    __slots__ = ('__weakref__',)
+
+
+class TypeRegistry(object):
+    '''Resolved types that are shared by the templates parsed by a thread.
+
+    Types are kept in a scope keyed by the fingerprint of the namespace
+    they are bound to (see _Namespace.fingerprint()), so they are only
+    reused while the files that namespace (and everything it imports) was
+    loaded from are unchanged.
+
+    The types in a scope are bound to the namespaces of the template that
+    resolved them, so the registry only holds weak references to its
+    scopes. The namespaces that use a scope keep it alive, and it is
+    dropped once the templates using it are gone. At most `max_scopes`
+    scopes are tracked, set it to 0 to disable reuse. Use a TypeSnapshot
+    to keep types for longer.
+
+    If `snapshot` is set, scopes start with the types in that TypeSnapshot
+    and only the types resolved by this thread are added to the scope.
+    '''
+
+    max_scopes = 64
+
+    def __init__(self, snapshot=None):
+        self._scopes = OrderedDict()  # fingerprint => weakref to a _Scope
+        self.snapshot = snapshot
+
+    def scope(self, fingerprint):
+        ref = self._scopes.get(fingerprint)
+        scope = ref and ref()
+        if scope is None:
+            shared = self.snapshot and self.snapshot.get(fingerprint)
+            if shared:
+                # lookups fall through to the snapshot, updates stay here
+                scope = _Scope(ChainMap({}, cache) for cache in shared)
+            else:
+                scope = _Scope(({}, {}, {}, {}))
+            self._scopes[fingerprint] = weakref.ref(scope)
+            self._scopes.move_to_end(fingerprint)
+            if len(self._scopes) > self.max_scopes:
+                for key, ref in list(self._scopes.items()):
+                    if ref() is None:
+                        del self._scopes[key]
+                while len(self._scopes) > self.max_scopes:
+                    self._scopes.popitem(last=False)
+        else:
+            self._scopes.move_to_end(fingerprint)
+        return scope
+
+    def scopes(self):
+        '''Return the scopes that are still in use, keyed by fingerprint.'''
+        scopes = {}
+        for fingerprint, ref in list(self._scopes.items()):
+            scope = ref()
+            if scope is not None:
+                scopes[fingerprint] = scope
+        return scopes
+
+    def clear(self):
+        self._scopes.clear()
+
+    def __len__(self):
+        return len(self.scopes())
+
+
+class TypeSnapshot(object):
+    '''A read-only copy of the types resolved by a TypeRegistry.
+
+    A snapshot can be shared by several threads: pass it to ToscaTemplate
+    as `type_snapshot` and the types in it are reused instead of being
+    resolved again by each thread. Types that aren't in the snapshot are
+    resolved and cached by the thread using it (see TypeRegistry).
+
+    The type objects in the snapshot are shared, so anything computed
+    lazily on them must not depend on the template being parsed. What
+    they would compute on first use is computed when the snapshot is
+    taken and made read-only (see StatefulEntityType._prime()), so the
+    threads sharing them don't compute it concurrently.
+    '''
+
+    def __init__(self, registry, version=None):
+        self.version = version
+        self._prime(registry)
+        self._scopes = MappingProxyType({
+            fingerprint: tuple(MappingProxyType(dict(cache))
+                               for cache in scope)
+            for fingerprint, scope in registry.scopes().items()})
+        self._local = threading.local()
+
+    @classmethod
+    def build(cls, paths, **kw):
+        '''Parse the templates at `paths` and return a snapshot of their types.
+
+        All the types declared in the templates and their imports are
+        resolved (see Namespace.compile()). Keyword arguments are passed
+        to ToscaTemplate.
+        '''
+        from toscaparser.tosca_template import ToscaTemplate
+
+        registry = TypeRegistry()
+        previous = globals.registry, globals.default_registry
+        globals.registry = globals.default_registry = registry
+        # the templates keep the registry's scopes alive
+        templates = []
+        try:
+            for path in paths:
+                tosca = ToscaTemplate(path, **kw)
+                templates.append(tosca)
+                if tosca.topology_template:
+                    custom_defs = tosca.topology_template.custom_defs
+                    namespaces = custom_defs.all_namespaces
+                    for namespace in list(namespaces.values()):
+                        namespace.compile()
+            return cls(registry, globals.definitions_version)
+        finally:
+            globals.registry, globals.default_registry = previous
+
+    @staticmethod
+    def _prime(registry):
+        # priming a type can resolve more types, repeat until none are new
+        primed = {}
+        namespaces = {}
+        with ExceptionCollector.raising():
+            while True:
+                typedefs = [typedef
+                            for scope in registry.scopes().values()
+                            for typedef in _scope_types(scope)
+                            if id(typedef) not in primed]
+                if not typedefs:
+                    break
+                for typedef in typedefs:
+                    primed[id(typedef)] = typedef
+                    if isinstance(typedef.custom_def, _Namespace):
+                        namespaces[id(typedef.custom_def)] = typedef.custom_def
+                    try:
+                        typedef._prime()
+                    except Exception:
+                        # invalid, it is reported when a template uses it
+                        continue
+            for namespace in namespaces.values():
+                try:
+                    namespace._prime()
+                except Exception:
+                    continue
+
+    def get(self, fingerprint):
+        return self._scopes.get(fingerprint)
+
+    @property
+    def registry(self):
+        '''The TypeRegistry the current thread uses with this snapshot.'''
+        registry = getattr(self._local, "registry", None)
+        if registry is None:
+            registry = self._local.registry = TypeRegistry(self)
+        return registry
+
+    def __len__(self):
+        return len(self._scopes)
+
+
+def _scope_types(scope):
+    # the type objects cached in a TypeRegistry scope
+    types, parent_types, values, instances = scope
+    for typedef in types.values():
+        yield typedef
+    for parents in parent_types.values():
+        for typedef in parents:
+            yield typedef
+    for entry in instances.values():
+        yield entry[1]
+
+
 class _LocalState(threading.local):
     def __init__(self, **kw):
         self._types = None          # Dict[str, StatefulEntityType]
         self._parent_types = None  # Dict[str, List[StatefulEntityType]]
+        self._values = None  # see EntityType._get_inherited_value()
+        self._instances = None  # see StatefulEntityType.intern()
+        self._reported = None  # see StatefulEntityType.intern()
         self._annotate_namespaces = True  # disable for testing
+        self.overlay = None  # see update_definitions()
+        self.definitions_version = None
+        self.default_registry = self.registry = TypeRegistry()
 globals = _LocalState()
 
+_computing = object()
+
+
+def _record_errors(start):
+    '''Return the errors appended since ExceptionCollector.exceptions[start].
+
+    Use with _report_errors() when the value being computed is cached
+    across templates.
+    '''
+    errors = ExceptionCollector.exceptions[start:]
+    if errors and globals._reported is not None:
+        globals._reported[id(errors)] = errors
+    return errors
+
+
+def _report_errors(errors):
+    '''Append the errors recorded when a cached value was computed.
+
+    They are appended once for each template (until the next
+    reset_caches()), not every time the value is used.
+    '''
+    reported = globals._reported
+    if errors and (reported is None or id(errors) not in reported):
+        if reported is not None:
+            reported[id(errors)] = errors
+        for error in errors:
+            ExceptionCollector.appendException(error)
+
+
+class _Imports(dict):
+    '''Maps global names to prefixed local names.
+
+    Also indexes the global names by their prefixed name, the index is
+    kept up to date as imports are added and rebuilt if one is replaced.
+    '''
+
+    _prefixed = None  # prefixed name => first global name mapped to it
+
+    def find_global_name(self, prefixed):
+        if self._prefixed is None:
+            index = {}
+            for global_name, name in self.items():
+                index.setdefault(name, global_name)
+            self._prefixed = index
+        return self._prefixed.get(prefixed)
+
+    def __setitem__(self, global_name, prefixed):
+        if self._prefixed is not None:
+            if global_name in self:
+                self._prefixed = None
+            else:
+                self._prefixed.setdefault(prefixed, global_name)
+        dict.__setitem__(self, global_name, prefixed)
+
+    def update(self, *args, **kw):
+        for global_name, prefixed in dict(*args, **kw).items():
+            self[global_name] = prefixed
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def setdefault(self, global_name, prefixed=None):
+        if global_name not in self:
+            self[global_name] = prefixed
+        return self[global_name]
+
+    def __delitem__(self, global_name):
+        self._prefixed = None
+        dict.__delitem__(self, global_name)
+
+    def pop(self, *args):
+        self._prefixed = None
+        return dict.pop(self, *args)
+
+    def popitem(self):
+        self._prefixed = None
+        return dict.popitem(self)
+
+    def clear(self):
+        self._prefixed = None
+        dict.clear(self)
+
 
 class _Namespace:
     def __init__(
@@ -41,14 +312,49 @@ class _Namespace:
         self.all_namespaces = nested_custom_types
         self.source_info = source_info
         self.namespace_id = namespace_id
-        self.imports = {}  # map global specifiers to prefixed local name
+        # map global specifiers to prefixed local name
+        self.imports = _Imports()
         # register this namespace:
         self.all_namespaces[namespace_id] = self
         self.shared_namespace = shared_namespace
         self.repositories = {} if repositories is None else repositories
         self.mtime = mtime
+        self.dependencies = set()  # ids of the namespaces imported here
+        self._fingerprint = None
+        self._type_scopes = {}  # the registry scopes used, see _caches()
         # self.metadata = {}  # local_name => section?
 
+    def _prime(self):
+        # see TypeSnapshot._prime()
+        self.fingerprint()
+        self.imports.find_global_name(None)
+
+    def fingerprint(self):
+        '''Identifies the source of this namespace and of its imports.
+
+        Returns None if the namespace wasn't loaded from a local file
+        (or imports one that wasn't) so its types can't be shared.
+        '''
+        if self._fingerprint is _computing:
+            # circular import, the namespace is already in the fingerprint
+            return (self.namespace_id, self.mtime)
+        if self._fingerprint is None:
+            fingerprint = False
+            if self.namespace_id and self.mtime is not None:
+                self._fingerprint = _computing
+                dependencies = []
+                for namespace_id in self.dependencies:
+                    namespace = self.all_namespaces.get(namespace_id)
+                    dependency = namespace and namespace.fingerprint()
+                    if not dependency:
+                        break
+                    dependencies.append(dependency)
+                else:
+                    fingerprint = (self.namespace_id, self.mtime,
+                                   tuple(sorted(dependencies, key=repr)))
+            self._fingerprint = fingerprint
+        return self._fingerprint or None
+
     def get_local_name(self, global_name):
         local, sep, module_name = global_name.partition("@")
         if not module_name:
@@ -65,18 +371,18 @@ class _Namespace:
 
     def find_prefix(self, local_name):
         if "." in local_name:
-            for global_name, prefixed in self.imports.items():
-                if local_name == prefixed:
-                    local, sep, module_name = global_name.partition("@")
-                    return prefixed[:-len(local)-1]
+            global_name = self.imports.find_global_name(local_name)
+            if global_name:
+                local, sep, module_name = global_name.partition("@")
+                return local_name[:-len(local) - 1]
         return ""
 
     def get_global_name_and_prefix(self, local_name):
         if "." in local_name:  # might be prefixed
-            for global_name, prefixed in self.imports.items():
-                if local_name == prefixed:
-                    local, sep, module_name = global_name.partition("@")
-                    return global_name, prefixed[:-len(local)-1]
+            global_name = self.imports.find_global_name(local_name)
+            if global_name:
+                local, sep, module_name = global_name.partition("@")
+                return global_name, local_name[:-len(local) - 1]
         return self.get_global_name(local_name), ""
 
     def _get_source(self, local_name):
@@ -92,9 +398,9 @@ class _Namespace:
                 if name and namespace_id:
                     return f"{name}@{namespace_id}"
             if "." in local_name:  # might be prefixed
-                for global_name, prefix in self.imports.items():
-                    if local_name == prefix:
-                        return global_name
+                global_name = self.imports.find_global_name(local_name)
+                if global_name:
+                    return global_name
             return f"{local_name}@{self.namespace_id}"
         else:
             return local_name
@@ -105,10 +411,194 @@ class _Namespace:
         return self.all_namespaces.get(namespace_id, self)
 
 class Namespace(_Namespace, dict):
+    _compiled = None  # see compile()
+    _capabilities = None  # see _capability_index()
+
     def _get_source(self, local_name):
         return self[local_name].get("_source")
 
+    def _prime(self):
+        super()._prime()
+        self._capabilities = _freeze_value(self._capability_index())
+
+    def _capability_index(self):
+        '''Index the node types visible in this namespace by capability type.
+
+        Returns (providers, requirements): providers maps the name of a
+        capability type to the names of the node types that declare a
+        capability of that type themselves, requirements maps the
+        capability named in a requirement definition (declared or
+        inherited) to the names of the node types and the requirements.
+
+        The index is built from the type definitions as they are declared,
+        without resolving the types.
+        '''
+        if self._capabilities is None:
+            providers = {}
+            requirements = {}
+            for name, defs in self._node_type_definitions():
+                caps = defs.get("capabilities")
+                if isinstance(caps, dict):
+                    for cap in caps.values():
+                        ctype = isinstance(cap, dict) and cap.get("type")
+                        if isinstance(ctype, str):
+                            providers.setdefault(ctype, {})[name] = None
+                for req_name, capability in self._requirement_capabilities(
+                        defs):
+                    requirements.setdefault(capability, {})[
+                        (name, req_name)] = None
+            self._capabilities = providers, requirements
+        return self._capabilities
+
+    def _node_type_definitions(self):
+        # the node types visible here (except tosca.nodes.Root) in the
+        # order they were declared
+        root = "tosca.nodes.Root"
+        for name, defs in EntityType.TOSCA_DEF.items():
+            if (name.startswith(EntityType.NODE_PREFIX) and name != root
+                    and isinstance(defs, dict)):
+                yield name, defs
+        for name, defs in self.items():
+            if name in EntityType.TOSCA_DEF or not isinstance(defs, dict):
+                continue
+            parent_name, parent = name, defs
+            for i in range(MAX_ANCESTORS):
+                if parent_name.startswith(EntityType.NODE_PREFIX):
+                    yield name, defs
+                    break
+                parent_name, parent = self._parent_definition(parent)
+                if parent_name is None:
+                    break
+
+    def _parent_definition(self, defs):
+        # the name and definition of the type defs is derived from
+        parent = defs.get("derived_from")
+        if isinstance(parent, list):  # multiple inheritance
+            parent = parent[0] if parent else None
+        if not isinstance(parent, str):
+            return None, None
+        if parent in self and parent not in EntityType.TOSCA_DEF:
+            parent_defs = self[parent]
+        else:
+            # "tosca:Compute" and "Compute" are short for "tosca.nodes.Compute"
+            if parent not in EntityType.TOSCA_DEF:
+                short_name = parent
+                if short_name.startswith("tosca:"):
+                    short_name = short_name[len("tosca:"):]
+                if EntityType.NODE_PREFIX + short_name in EntityType.TOSCA_DEF:
+                    parent = EntityType.NODE_PREFIX + short_name
+            parent_defs = EntityType.TOSCA_DEF.get(parent)
+        if not isinstance(parent_defs, dict):
+            return None, None
+        return parent, parent_defs
+
+    def _requirement_capabilities(self, defs):
+        # (requirement name, capability) for the requirements of a node
+        # type and its ancestors, the capability is taken from the most
+        # derived definition of the requirement that names one
+        found = {}
+        for i in range(MAX_ANCESTORS):
+            reqs = defs.get("requirements")
+            if isinstance(reqs, list):
+                for req in reqs:
+                    if not isinstance(req, dict) or len(req) != 1:
+                        continue
+                    req_name, req_def = next(iter(req.items()))
+                    if found.get(req_name) is None:
+                        capability = (isinstance(req_def, dict)
+                                      and req_def.get("capability"))
+                        if isinstance(capability, str):
+                            found[req_name] = capability
+                        else:
+                            found[req_name] = None
+            name, defs = self._parent_definition(defs)
+            if defs is None:
+                break
+        return [(req_name, capability)
+                for req_name, capability in found.items() if capability]
+
+    def get_capability_providers(self, capability_type):
+        '''Return the node types that declare a capability of the given type.
+
+        The names of the node types visible in this namespace that declare
+        a capability of exactly that type themselves (capabilities they
+        inherit aren't matched) are returned in the order they were
+        declared, built-in types first.
+        '''
+        return list(self._capability_index()[0].get(capability_type, ()))
+
+    def get_capability_requirements(self, capability_type):
+        '''Return the requirements a capability of the given type can satisfy.
+
+        The requirements are returned as (node type name, requirement name)
+        pairs.
+        '''
+        from toscaparser.elements.capabilitytype import CapabilityType
+
+        requirements = self._capability_index()[1]
+        ExceptionCollector.pause()
+        try:
+            names = CapabilityType.intern(
+                "", capability_type, custom_def=self).ancestor_names()
+        except Exception:
+            names = (capability_type,)
+        finally:
+            ExceptionCollector.resume()
+        found = {}
+        for name in names:
+            found.update(requirements.get(name, {}))
+        return list(found)
+
+    def compile(self):
+        '''Resolve every type declared in this namespace into a CompiledType.
+
+        Returns a read-only mapping of type names to their flattened
+        definitions. Built-in types are only resolved as the ancestors of
+        those types. The resolved types are added to the type caches
+        so templates parsed afterwards share them instead of merging
+        each type's definitions with its ancestors again.
+        '''
+        if self._compiled is None:
+            from toscaparser.elements.statefulentitytype import \
+                StatefulEntityType
+            from toscaparser.topology_template import find_type
+
+            # skip invalid types, they are reported if a template uses them
+            names = []
+            ExceptionCollector.pause()
+            try:
+                for name in self:
+                    try:
+                        typedef = StatefulEntityType(name, "", self)
+                        if all(p.defs for p in typedef._ancestors()):
+                            names.append(name)
+                    except Exception:
+                        continue
+            finally:
+                ExceptionCollector.resume()
+            compiled = {}
+            for name in names:
+                typedef = find_type(name, self)
+                if typedef is not None:
+                    compiled[name] = CompiledType(typedef)
+            self._compiled = MappingProxyType(compiled)
+        return self._compiled
+
+    def _invalidate(self):
+        self._compiled = None
+        self._capabilities = None
+
+    def update(self, *args, **kw):
+        self._invalidate()
+        dict.update(self, *args, **kw)
+
+    def __setitem__(self, key, value):
+        self._invalidate()
+        dict.__setitem__(self, key, value)
+
     def add_with_prefix(self, local_custom_defs: "Namespace", prefix):
+        self.dependencies.add(local_custom_defs.namespace_id)
+        self._fingerprint = None
         if not prefix:
             self.imports.update(local_custom_defs.imports)
         for k, v in local_custom_defs.items():
@@ -121,6 +611,161 @@ class Namespace(_Namespace, dict):
 
 MAX_ANCESTORS = 20
 
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return MappingProxyType(value)
+    if isinstance(value, list):
+        return tuple(value)
+    return value
+
+
+class CompiledType(object):
+    '''The definition of a type merged with the definitions of its ancestors.
+
+    Each section is a read-only view of the merged value. The individual
+    definitions in it are shared with the type and must not be modified.
+    '''
+
+    SECTIONS = (METADATA, PROPERTIES, ATTRIBUTES, CAPABILITIES, REQUIREMENTS,
+                INTERFACES) = \
+               ('metadata', 'properties', 'attributes', 'capabilities',
+                'requirements', 'interfaces')
+
+    def __init__(self, typedef):
+        self.typedef = typedef
+        self.type = typedef.type
+        self.global_name = typedef.global_name
+        self.ancestors = tuple(p.global_name for p in typedef.ancestors())
+        attributes = typedef.get_definition(self.ATTRIBUTES)
+        if attributes:
+            attributes = dict(attributes)
+            typedef._merge_attributes(attributes)
+        if hasattr(typedef, "get_all_requirements"):
+            requirements = typedef.get_all_requirements()
+        else:
+            requirements = typedef.get_definition(self.REQUIREMENTS)
+        definitions = {
+            self.METADATA: typedef.get_value(self.METADATA, parent=True),
+            self.PROPERTIES: typedef.get_definition(self.PROPERTIES),
+            self.ATTRIBUTES: attributes,
+            self.CAPABILITIES: typedef.get_definition(self.CAPABILITIES),
+            self.REQUIREMENTS: requirements,
+            self.INTERFACES: typedef.interfaces,
+        }
+        self.definitions = MappingProxyType(
+            {k: _freeze(v) for k, v in definitions.items() if v})
+
+    def get(self, section, default=None):
+        return self.definitions.get(section, default)
+
+    def __getitem__(self, section):
+        return self.definitions[section]
+
+    def as_dict(self):
+        '''Return the definitions as plain (serializable) dicts and lists.'''
+        return {k: dict(v) if isinstance(v, MappingProxyType)
+                else list(v) if isinstance(v, tuple) else v
+                for k, v in self.definitions.items()}
+
+
+class _LazyDefinitions(object):
+    '''Class attribute that is computed on first access.
+
+    The descriptor replaces itself with the computed value so after the
+    first access it is an ordinary class attribute.
+    '''
+
+    _lock = threading.RLock()
+
+    def __init__(self, load):
+        self.load = load
+
+    def __set_name__(self, owner, name):
+        self.owner = owner
+        self.name = name
+
+    def __get__(self, instance, owner):
+        with self._lock:
+            value = self.owner.__dict__[self.name]
+            if value is self:
+                value = self.load(self.owner)
+                setattr(self.owner, self.name, value)
+        return value
+
+
+def _load_tosca_def_as_is(cls):
+    # parsed once and then loaded from a pre-parsed snapshot
+    return diskcache.load_snapshot(cls.TOSCA_DEF_FILE, cls.loader)
+
+
+def _load_tosca_def(cls):
+    tosca_def = _Definitions()
+    for section in cls.TOSCA_DEF_SECTIONS:
+        if section in cls.TOSCA_DEF_LOAD_AS_IS.keys():
+            value = cls.TOSCA_DEF_LOAD_AS_IS[section]
+            for key in value.keys():
+                dict.__setitem__(tosca_def, key, value[key])
+    return tosca_def
+
+
+class _Definitions(dict):
+    '''The built-in type definitions.
+
+    While a template with extension definitions for its
+    tosca_definitions_version is parsed, the definitions are read from
+    the overlay for that version instead (see update_definitions()).
+    '''
+
+    def __getitem__(self, key):
+        overlay = globals.overlay
+        if overlay is None:
+            return dict.__getitem__(self, key)
+        return overlay[key]
+
+    def __contains__(self, key):
+        overlay = globals.overlay
+        if overlay is None:
+            return dict.__contains__(self, key)
+        return key in overlay
+
+    def get(self, key, default=None):
+        overlay = globals.overlay
+        if overlay is None:
+            return dict.get(self, key, default)
+        return overlay.get(key, default)
+
+    def __iter__(self):
+        overlay = globals.overlay
+        if overlay is None:
+            return dict.__iter__(self)
+        return iter(overlay)
+
+    def __len__(self):
+        overlay = globals.overlay
+        if overlay is None:
+            return dict.__len__(self)
+        return len(overlay)
+
+    def keys(self):
+        overlay = globals.overlay
+        if overlay is None:
+            return dict.keys(self)
+        return overlay.keys()
+
+    def values(self):
+        overlay = globals.overlay
+        if overlay is None:
+            return dict.values(self)
+        return overlay.values()
+
+    def items(self):
+        overlay = globals.overlay
+        if overlay is None:
+            return dict.items(self)
+        return overlay.items()
+
+
 class EntityType(object):
     '''Base class for TOSCA elements.'''
 
@@ -162,15 +807,11 @@ class EntityType(object):
 
     loader = toscaparser.utils.yamlparser.load_yaml
 
-    TOSCA_DEF_LOAD_AS_IS = loader(TOSCA_DEF_FILE)
+    # these are loaded on first access, see _LazyDefinitions
+    TOSCA_DEF_LOAD_AS_IS = _LazyDefinitions(_load_tosca_def_as_is)
 
     # Map of definition with pre-loaded values of TOSCA_DEF_FILE_SECTIONS
-    TOSCA_DEF = {}
-    for section in TOSCA_DEF_SECTIONS:
-        if section in TOSCA_DEF_LOAD_AS_IS.keys():
-            value = TOSCA_DEF_LOAD_AS_IS[section]
-            for key in value.keys():
-                TOSCA_DEF[key] = value[key]
+    TOSCA_DEF = _LazyDefinitions(_load_tosca_def)
 
     RELATIONSHIP_TYPE = (DEPENDSON, HOSTEDON, CONNECTSTO, ATTACHESTO,
                          LINKSTO, BINDSTO) = \
@@ -196,19 +837,49 @@ class EntityType(object):
     _source = None
 
     @staticmethod
-    def _parent_types():
-        return globals._parent_types
+    def _caches(custom_def):
+        """Return the caches for the types bound to custom_def.
+
+        They are (types, parent_types, values, instances).
+
+        Types bound to a namespace loaded from unchanged files come from
+        the long-lived TypeRegistry, other types are only cached until the
+        next reset_caches().
+        """
+        if globals._types is None:
+            return None, None, None, None
+        if isinstance(custom_def, _Namespace) and globals.registry.max_scopes:
+            fingerprint = custom_def.fingerprint()
+            if fingerprint:
+                key = (globals.definitions_version, fingerprint)
+                scope = custom_def._type_scopes.get(key)
+                if scope is None:
+                    # the namespace keeps the scope alive, see TypeRegistry
+                    scope = globals.registry.scope(key)
+                    custom_def._type_scopes[key] = scope
+                return scope
+        return (globals._types, globals._parent_types, globals._values,
+                globals._instances)
+
+    def _parent_types(self):
+        return self._caches(self.custom_def)[1]
 
     @staticmethod
     def find_type(name, custom_defs = None):
-        if globals._types:
+        if globals._types is not None:
             if custom_defs is not None:
                 global_name = custom_defs.get_global_name(name)
+                # the type is bound to the namespace it was declared in
+                namespace_id = global_name.partition("@")[2]
+                scope = custom_defs.all_namespaces.get(namespace_id,
+                                                       custom_defs)
             else:
                 global_name = name
+                scope = None
+            types = EntityType._caches(scope)[0]
             # # self.type is the imported name for the type (varies by prefix)
             key = (name, global_name)
-            type_def = globals._types.get(key)
+            type_def = types.get(key)
             return type_def
         else:
             return None
@@ -216,14 +887,37 @@ class EntityType(object):
     @staticmethod
     def add_type(name, typedef):
         if globals._types is not None:
-            globals._types[name] = (typedef.type, typedef.global_name)
+            types = EntityType._caches(typedef.custom_def)[0]
+            types[(name, typedef.global_name)] = typedef
             return True
         return False
 
     @staticmethod
     def reset_caches():
+        """Reset the caches of types resolved for the current template.
+
+        Types in the TypeRegistry are kept, use clear_registry() to drop them.
+        """
         globals._types = {}
         globals._parent_types = {}
+        globals._values = {}
+        globals._instances = {}
+        globals._reported = {}
+
+    @staticmethod
+    def clear_registry():
+        globals.registry.clear()
+
+    @staticmethod
+    def use_snapshot(snapshot=None):
+        """Use the types in the given TypeSnapshot in the current thread.
+
+        If snapshot is None, go back to the thread's own TypeRegistry.
+        """
+        if snapshot is None:
+            globals.registry = globals.default_registry
+        else:
+            globals.registry = snapshot.registry
 
     def derived_from(self, defs):
         '''Return a type this type is derived from.'''
@@ -243,22 +937,32 @@ class EntityType(object):
             return False
         elif self.type == type_str or self.global_name == type_str:
             return True
-        elif self._implements(type_str):
-            return True
-        else:
-            for p in self.parent_types():  
-                # short curcuit if too many ancestors to avoid infinite loops in case of cycles
-                if counter < MAX_ANCESTORS and p.is_derived_from(type_str, counter + 1):
-                    return True
-            return False
+        return type_str in self.ancestor_names()
+
+    def ancestor_names(self):
+        '''Return the names of this type and of the types it derives from.
+
+        This includes the global and local names and the aliases of each
+        type and is computed once per type.
+        '''
+        names = self.__dict__.get("_ancestor_names")
+        if names is None:
+            names = set()
+            if self.type:
+                # _ancestors() skips types already seen in case of cycles
+                for p in self._ancestors():
+                    names.update(p._names())
+            names = frozenset(names)
+            self._ancestor_names = names
+        return names
+
+    def _names(self):
+        return (self.type, self.global_name)
 
     def entity_value(self, defs, key):
         if defs and key in defs:
             return defs[key]
 
-    def _implements(self, type_str):
-        return False
-
     @property
     def parent_type(self):
         return None
@@ -289,65 +993,106 @@ class EntityType(object):
         if defs is None:
             if not hasattr(self, 'defs'):
                 return None
+            if parent:
+                # the cached value is read-only, callers that modify it
+                # need to copy it
+                return self._get_inherited_value(ndtype, merge, add_namespace)
             defs = self.defs
         if defs and ndtype in defs:
-            # copy the value to avoid that next operations add items in the
-            # item definitions
             value = defs[ndtype]
         if parent:
-            if hasattr(value, "mapCtor"):
-                value = value.mapCtor(value)
-            else:
-                value = copy.copy(value)
-            for p in self.ancestors():  # [self, parent, grandparent]
-                check_namespace = add_namespace and isinstance(p.custom_def, Namespace) and p.custom_def.namespace_id and p._source
-                if p.defs and ndtype in p.defs:
-                    # get the parent value
-                    parent_value = p.defs[ndtype]
-                    if value:
-                        if isinstance(value, dict):
-                            # add items if key is missing
-                            assert isinstance(parent_value, dict), ndtype
+            # copy the value to avoid that next operations add items in the
+            # item definitions
+            value = _copy_value(value)
+            inherited = self._get_inherited_value(ndtype, merge, add_namespace)
+            if not value:
+                if inherited is not None:
+                    value = _copy_value(inherited)
+            elif inherited:
+                value = self._merge_parent_value(
+                    ndtype, value, inherited, merge)
+        return value
+
+    def _get_inherited_value(self, ndtype, merge, add_namespace):
+        # the value of ndtype merged from this type and its ancestors,
+        # computed once and shared by the instances of this type
+        values = self._caches(self.custom_def)[2]
+        if values is None:
+            values = self.__dict__.setdefault("_inherited_values", {})
+        key = (self.__class__, self.type, self.global_name, ndtype, merge,
+               add_namespace)
+        cached = values.get(key)
+        # the same name might be bound to different defs if custom_def
+        # isn't a Namespace
+        if cached is not None and cached[0] is self.defs:
+            return cached[1]
+        value = None
+        for p in self.ancestors():  # [self, parent, grandparent]
+            check_namespace = (add_namespace and
+                               isinstance(p.custom_def, Namespace) and
+                               p.custom_def.namespace_id and p._source)
+            namespace_id = (p.custom_def.namespace_id if check_namespace
+                            else None)
+            if p.defs and ndtype in p.defs:
+                # get the parent value
+                parent_value = p.defs[ndtype]
+                if value:
+                    value = self._merge_parent_value(
+                        ndtype, value, parent_value, merge, namespace_id)
+                else:
+                    # if missing so far then copy the parent
+                    value = _copy_value(parent_value)
+
+                    if namespace_id:
+                        if isinstance(parent_value, dict):
                             for k, v in parent_value.items():
-                                if k not in value:
-                                    value[k] = v
-                                    if check_namespace and "type" in v:
-                                        v["!namespace"] = p.custom_def.namespace_id
-                                elif merge and isinstance(v, dict) and isinstance(value[k], dict):
-                                    # merge value with parent and merge "metadata" keys if present
-                                    value_value = value[k]
-                                    metadata = "metadata" in value_value
-                                    cls = getattr(value_value, "mapCtor", value_value.__class__)
-                                    value[k] = cls(v, **value_value)
-                                    if check_namespace and "type" in v and "type" not in value_value:
-                                        value[k]["!namespace"] = p.custom_def.namespace_id
-                                    if metadata and "metadata" in v:
-                                        value[k]["metadata"] = cls(v["metadata"], **value_value["metadata"])
-
-                        elif merge and isinstance(value, list):
-                            # append parent items if unique to list
-                            assert isinstance(parent_value, list), ndtype
-                            for p_value in parent_value:
-                                if p_value not in value:
-                                    if check_namespace and isinstance(p_value, dict) and ndtype == "requirements":
-                                        _set_req_namespaces(p_value, p.custom_def.namespace_id)
-                                    value.append(p_value)
-                    else:
-                        # if missing so far then copy the parent
-                        if hasattr(parent_value, "mapCtor"):
-                            value = parent_value.mapCtor(parent_value)
-                        else:
-                            value = copy.copy(parent_value)
-
-                        if check_namespace:
-                            if isinstance(parent_value, dict):
-                                for k, v in parent_value.items():
-                                    if isinstance(v, dict) and "type" in v:
-                                        v["!namespace"] = p.custom_def.namespace_id
-                            elif isinstance(value, list) and ndtype == "requirements":
-                                for p_value in value:
-                                    if isinstance(p_value, dict):
-                                        _set_req_namespaces(p_value, p.custom_def.namespace_id)
+                                if isinstance(v, dict) and "type" in v:
+                                    v["!namespace"] = namespace_id
+                        elif (isinstance(value, list) and
+                              ndtype == "requirements"):
+                            for p_value in value:
+                                if isinstance(p_value, dict):
+                                    _set_req_namespaces(p_value, namespace_id)
+        value = _freeze_value(value)
+        values[key] = (self.defs, value)
+        return value
+
+    @staticmethod
+    def _merge_parent_value(ndtype, value, parent_value, merge,
+                            namespace_id=None):
+        if isinstance(value, dict):
+            # add items if key is missing
+            assert isinstance(parent_value, dict), ndtype
+            for k, v in parent_value.items():
+                if k not in value:
+                    value[k] = v
+                    if namespace_id and "type" in v:
+                        v["!namespace"] = namespace_id
+                elif (merge and isinstance(v, dict) and
+                      isinstance(value[k], dict)):
+                    # merge value with parent and merge "metadata" keys if
+                    # present
+                    value_value = value[k]
+                    metadata = "metadata" in value_value
+                    cls = getattr(value_value, "mapCtor",
+                                  value_value.__class__)
+                    value[k] = cls(v, **value_value)
+                    if (namespace_id and "type" in v and
+                            "type" not in value_value):
+                        value[k]["!namespace"] = namespace_id
+                    if metadata and "metadata" in v:
+                        value[k]["metadata"] = cls(
+                            v["metadata"], **value_value["metadata"])
+
+        elif merge and isinstance(value, list):
+            # append parent items if unique to list
+            assert isinstance(parent_value, list), ndtype
+            for p_value in parent_value:
+                if p_value not in value:
+                    if (namespace_id and isinstance(p_value, dict) and
+                            ndtype == "requirements"):
+                        _set_req_namespaces(p_value, namespace_id)
+                    value.append(p_value)
         return value
 
     def get_definition(self, ndtype):
@@ -355,6 +1100,90 @@ class EntityType(object):
         # XXX validate that the derived type is compatible with the base type
         return self.get_value(ndtype, None, True, True, True)
 
+
+def _copy_value(value):
+    if hasattr(value, "mapCtor"):
+        return value.mapCtor(value)
+    return copy.copy(value)
+
+
+def _read_only(self, *args, **kwargs):
+    raise TypeError("%s is read-only, copy it before modifying it"
+                    % self.__class__.__name__)
+
+
+class _FrozenDict(dict):
+    '''A dict that can't be modified.
+
+    Used for the inherited definitions that EntityType.get_value() shares
+    between the instances of a type. Copies of it are ordinary dicts.
+    '''
+
+    __slots__ = ()
+    mapCtor = dict
+
+    __setitem__ = __delitem__ = __ior__ = _read_only
+    clear = pop = popitem = setdefault = update = _read_only
+
+    def copy(self):
+        return dict(self)
+
+    __copy__ = copy
+
+    def __deepcopy__(self, memo):
+        return copy.deepcopy(dict(self), memo)
+
+    def __reduce__(self):
+        return (dict, (dict(self),))
+
+
+class _FrozenList(list):
+    '''A list that can't be modified, see _FrozenDict.'''
+
+    __slots__ = ()
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _read_only
+    append = clear = extend = insert = pop = remove = _read_only
+    reverse = sort = _read_only
+
+    def copy(self):
+        return list(self)
+
+    __copy__ = copy
+
+    def __deepcopy__(self, memo):
+        return copy.deepcopy(list(self), memo)
+
+    def __reduce__(self):
+        return (list, (list(self),))
+
+
+def _thaw(value):
+    # replace the read-only values in value with modifiable copies
+    if isinstance(value, (_FrozenDict, _FrozenList)):
+        return copy.deepcopy(value)
+    if isinstance(value, dict):
+        for k, v in value.items():
+            thawed = _thaw(v)
+            if thawed is not v:
+                value[k] = thawed
+    elif isinstance(value, list):
+        for i, v in enumerate(value):
+            thawed = _thaw(v)
+            if thawed is not v:
+                value[i] = thawed
+    return value
+
+
+def _freeze_value(value):
+    # a read-only copy of value, nested dicts and lists are frozen too
+    if isinstance(value, dict) and not isinstance(value, _FrozenDict):
+        return _FrozenDict((k, _freeze_value(v)) for k, v in value.items())
+    if isinstance(value, list) and not isinstance(value, _FrozenList):
+        return _FrozenList(_freeze_value(v) for v in value)
+    return value
+
+
 def _set_req_namespaces(req, namespace):
     if not globals._annotate_namespaces:
         return
@@ -366,22 +1195,42 @@ def _set_req_namespaces(req, namespace):
                 if not isinstance(value[key], dict) or "type" in value[key]:
                     value[f"!namespace-{key}"] = namespace
 
-_last_version = None
+
+_overlays = {}  # version => the definitions with that version's extensions
+_definitions_lock = threading.Lock()
 def update_definitions(exttools, version, loader=toscaparser.utils.yamlparser.load_yaml):
-    global _last_version
-    if _last_version == version:
-        return  # don't reload a version we already loaded
-    extension_defs_file = exttools.get_defs_file(version)
-    nfv_def_file = loader(extension_defs_file)
-    if not nfv_def_file:  # loading failed
-        return
-    for section in EntityType.TOSCA_DEF_SECTIONS:
-        if section in nfv_def_file.keys():
-            value = nfv_def_file[section]
-            for key in value.keys():
-                if key in EntityType.TOSCA_DEF:
-                    # replace sections
-                    EntityType.TOSCA_DEF[key].update(value[key])
-                else:
-                    EntityType.TOSCA_DEF[key] = value[key]
-    _last_version = version
+    '''Use the extension definitions for `version` in the current thread.
+
+    The built-in definitions aren't modified, instead the first time a
+    version is used they are copied into an overlay with its extension
+    definitions merged in.
+    '''
+    overlay = _overlays.get(version)
+    if overlay is None:
+        extension_defs_file = exttools.get_defs_file(version)
+        nfv_def_file = loader(extension_defs_file)
+        if not nfv_def_file:  # loading failed
+            return
+        definitions = dict(dict.items(EntityType.TOSCA_DEF))
+        for section in EntityType.TOSCA_DEF_SECTIONS:
+            if section in nfv_def_file.keys():
+                value = nfv_def_file[section]
+                for key in value.keys():
+                    if key in definitions:
+                        # replace sections
+                        merged = dict(definitions[key])
+                        merged.update(value[key])
+                        definitions[key] = merged
+                    else:
+                        definitions[key] = value[key]
+        with _definitions_lock:
+            overlay = _overlays.setdefault(version,
+                                           MappingProxyType(definitions))
+    globals.overlay = overlay
+    globals.definitions_version = version
+
+
+def reset_definitions():
+    '''Use the built-in definitions, without extensions, in this thread.'''
+    globals.overlay = None
+    globals.definitions_version = None
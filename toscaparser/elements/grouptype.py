@@ -59,7 +59,7 @@ class GroupType(StatefulEntityType):
             return None
         pgroup_entity = self.derived_from(self.defs)
         if pgroup_entity:
-            return GroupType(pgroup_entity, self.custom_def)
+            return GroupType.intern(pgroup_entity, custom_def=self.custom_def)
 
     @property
     def description(self):
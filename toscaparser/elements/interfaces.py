@@ -368,8 +368,11 @@ def _create_interfacedefs(type_definition, entity_tpl, msg):
     if type_definition.interfaces:
         interfacesDefs = type_definition.interfaces
         if tpl_interfaces:
+            # copy so the template's interfaces aren't added to the type's
+            cls = getattr(interfacesDefs, "mapCtor", interfacesDefs.__class__)
             return merge_interfacedefs(
-                interfacesDefs, tpl_interfaces, type_definition._source, msg
+                cls(interfacesDefs), tpl_interfaces, type_definition._source,
+                msg
             )
         return interfacesDefs
     else:
@@ -15,6 +15,9 @@ from toscaparser.common.exception import ExceptionCollector
 from toscaparser.common.exception import UnknownFieldError
 from toscaparser.elements.capabilitytype import CapabilityType
 from toscaparser.elements.entity_type import Namespace, _set_req_namespaces
+from toscaparser.elements.entity_type import _freeze_value
+from toscaparser.elements.entity_type import _record_errors
+from toscaparser.elements.entity_type import _report_errors
 import toscaparser.elements.interfaces as ifaces
 from toscaparser.elements.relationshiptype import RelationshipType
 from toscaparser.elements.statefulentitytype import StatefulEntityType
@@ -60,6 +63,10 @@ class NodeType(StatefulEntityType):
         super(NodeType, self).__init__(ntype, self.NODE_PREFIX, custom_def)
         self.ntype = ntype
         self._requirement_definitions = None
+        self._all_requirements = None
+        self._capability_typedefs = None
+        self._capability_errors = None
+        self._capabilities_def = None
         self._validate_keys()
 
     @property
@@ -73,10 +80,11 @@ class NodeType(StatefulEntityType):
                 ExceptionCollector.appendException(
                     InvalidTypeDefinition(type=self.type, what="derived_from has circular reference"))
                 return None
-            return NodeType(pnode, self.custom_def)
+            return NodeType.intern(pnode, custom_def=self.custom_def)
         elif self.type != "tosca.nodes.Root":
             # if derived_from is missing, default to root type for nodes
-            return NodeType("tosca.nodes.Root", self.custom_def)
+            return NodeType.intern("tosca.nodes.Root",
+                                   custom_def=self.custom_def)
 
     @property
     def relationship(self):
@@ -123,8 +131,13 @@ class NodeType(StatefulEntityType):
         '''Find the node type that has the provided capability
 
         This method will lookup all node types if they have the
-        provided capability.
+        provided capability (using the namespace's capability index
+        if custom_def is a Namespace). Only capabilities of exactly that
+        type declared by the node type itself are matched.
         '''
+        if isinstance(self.custom_def, Namespace):
+            providers = self.custom_def.get_capability_providers(cap)
+            return providers[0] if providers else None
 
         # Filter the node types
         node_types = [node_type for node_type in self.TOSCA_DEF.keys()
@@ -146,27 +159,46 @@ class NodeType(StatefulEntityType):
                             'type' in value and value['type'] == cap:
                         return node_type
 
+    def _prime(self):
+        super()._prime()
+        self._all_requirements = _freeze_value(self.get_all_requirements())
+        self._requirement_definitions = _freeze_value(
+            self.requirement_definitions)
+        self._capability_typedefs = _freeze_value(
+            self.get_capability_typedefs())
+        self._capabilities_def = _freeze_value(self.get_capabilities_def())
+
     def get_capability_typedefs(self):
         '''Return a list of capability type objects.'''
-        typecapabilities = []
-        caps = self.get_definition(self.CAPABILITIES)
-        if caps:
-            # 'name' is symbolic name of the capability
-            # 'value' is a dict { 'type': <capability type name> }
-            for name, value in caps.items():
-                ctype = value.get('type')
-                namespace_id = value.get("!namespace", None)
-                custom_def = self.custom_def
-                if namespace_id and isinstance(self.custom_def, Namespace):
-                    custom_def = self.custom_def.find_namespace(namespace_id)
-                cap = CapabilityType(name, ctype, custom_def)
-                typecapabilities.append(cap)
-        return typecapabilities
+        if self._capability_typedefs is None:
+            start = len(ExceptionCollector.exceptions)
+            typecapabilities = []
+            caps = self.get_definition(self.CAPABILITIES)
+            if caps:
+                # 'name' is symbolic name of the capability
+                # 'value' is a dict { 'type': <capability type name> }
+                for name, value in caps.items():
+                    ctype = value.get('type')
+                    namespace_id = value.get("!namespace", None)
+                    custom_def = self.custom_def
+                    if namespace_id and isinstance(custom_def, Namespace):
+                        custom_def = custom_def.find_namespace(namespace_id)
+                    cap = CapabilityType.intern(name, ctype,
+                                                custom_def=custom_def)
+                    typecapabilities.append(cap)
+            self._capability_typedefs = typecapabilities
+            # the type might be shared by other templates, see intern()
+            self._capability_errors = _record_errors(start)
+        else:
+            _report_errors(self._capability_errors)
+        return self._capability_typedefs
 
     def get_capabilities_def(self):
         '''Return a dictionary of capability name-objects pairs.'''
-        return {cap.name: cap
-                for cap in self.get_capability_typedefs()}
+        typedefs = self.get_capability_typedefs()
+        if self._capabilities_def is None:
+            self._capabilities_def = {cap.name: cap for cap in typedefs}
+        return self._capabilities_def
 
     @property
     def requirements(self):
@@ -202,6 +234,11 @@ class NodeType(StatefulEntityType):
 
     def get_all_requirements(self):
         # return list of requirements with any shorthand syntax normalized
+        if self._all_requirements is None:
+            self._all_requirements = self._merge_requirements()
+        return self._all_requirements
+
+    def _merge_requirements(self):
         if self._source and isinstance(self.custom_def, Namespace) and self.custom_def.namespace_id:
             local_reqs = self.get_value(self.REQUIREMENTS)
             if isinstance(local_reqs, list):
@@ -78,7 +78,8 @@ class PolicyType(StatefulEntityType):
             return None
         ppolicy_entity = self.derived_from(self.defs)
         if ppolicy_entity:
-            return PolicyType(ppolicy_entity, self.custom_def)
+            return PolicyType.intern(ppolicy_entity,
+                                     custom_def=self.custom_def)
 
     def get_policy(self, name):
         '''Return the definition of a policy field by name.'''
@@ -19,6 +19,9 @@ from toscaparser.utils.gettextutils import _
 class PropertyDef(object):
     '''TOSCA built-in Property type.'''
 
+    __slots__ = ("name", "value", "schema", "_status", "_required",
+                 "_parse_error")
+
     VALID_PROPERTY_KEYNAMES = (PROPERTY_KEYNAME_DEFAULT,
                                PROPERTY_KEYNAME_REQUIRED,
                                PROPERTY_KEYNAME_STATUS) = \
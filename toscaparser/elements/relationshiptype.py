@@ -37,7 +37,7 @@ class RelationshipType(StatefulEntityType):
         '''Return that parent is RelationshipType that this is derived from.'''
         prel = self.derived_from(self.defs)
         if prel:
-            return RelationshipType(prel, custom_def=self.custom_def)
+            return RelationshipType.intern(prel, custom_def=self.custom_def)
 
     @property
     def valid_target_types(self):
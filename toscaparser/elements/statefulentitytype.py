@@ -15,7 +15,9 @@ from toscaparser.common.exception import ExceptionCollector
 from toscaparser.common.exception import MissingTypeError
 from toscaparser.common.exception import TypeMismatchError
 from toscaparser.common.exception import UnknownFieldError, ValidationError
+from toscaparser.elements import entity_type
 from toscaparser.elements.entity_type import EntityType, Namespace
+from toscaparser.elements.entity_type import _freeze_value
 from toscaparser.elements.property_definition import PropertyDef
 from toscaparser.unsupportedtype import UnsupportedType
 from toscaparser.elements.interfaces import INTERFACE_DEF_RESERVED_WORDS
@@ -42,6 +44,8 @@ class StatefulEntityType(EntityType):
                                                     'remove_source',
                                                     'target_changed']
 
+    _intern_type_arg = 0  # the position of the type name in intern()'s args
+
     def __init__(self, entitytype, prefix, custom_def=None):
         entire_entitytype = entitytype
         custom = False
@@ -118,6 +122,75 @@ class StatefulEntityType(EntityType):
             return
         self._validate_interfaces()
 
+    @classmethod
+    def intern(cls, *args, custom_def=None):
+        '''Return the shared instance of this class for these arguments.
+
+        The instance is bound to the namespace the type was declared in
+        (or to custom_def for built-in types) and is kept with that
+        namespace's types (see EntityType._caches()), keyed by the global
+        name of the type. So the lazily computed definitions of a type
+        are only computed once and, if the namespace was loaded from
+        unchanged files, are shared by the templates that import them.
+
+        Errors found while constructing the instance are reported once for
+        each template that uses it.
+        '''
+        name = args[cls._intern_type_arg]
+        if entity_type.globals._instances is None or not isinstance(name, str):
+            return cls(*args, custom_def=custom_def)
+        if isinstance(custom_def, Namespace):
+            global_name = custom_def.get_global_name(name)
+            namespace_id = global_name.partition("@")[2]
+            bound = custom_def.all_namespaces.get(namespace_id, custom_def)
+        else:
+            global_name = name
+            bound = custom_def
+        instances = cls._caches(bound)[3]
+        shared = instances is not entity_type.globals._instances
+        if shared:
+            key = (cls, global_name, args)
+        else:
+            # only kept until reset_caches(), custom_def might not be a
+            # Namespace
+            key = (cls, global_name, args, id(custom_def))
+        try:
+            entry = instances.get(key)
+        except TypeError:  # unhashable (and invalid) arguments
+            return cls(*args, custom_def=custom_def)
+        if entry is None or not shared and entry[0] is not custom_def:
+            start = len(ExceptionCollector.exceptions)
+            typedef = cls(*args, custom_def=custom_def)
+            entry = (custom_def, typedef, entity_type._record_errors(start))
+            instances[key] = entry
+        else:
+            entity_type._report_errors(entry[2])
+        return entry[1]
+
+    def _prime(self):
+        '''Compute what this type would otherwise compute on first use.
+
+        Used for the types in a TypeSnapshot, which are shared by threads.
+        The results are made read-only.
+        '''
+        self.ancestor_names()
+        self.parent_types()
+        self.__ancestors = _freeze_value(self.ancestors())
+        if not self.defs:
+            return
+        sections = set()
+        for p in self.ancestors():
+            if p.defs:
+                sections.update(p.defs)
+        for section in sections:
+            for merge in (False, True):
+                for add_namespace in (False, True):
+                    self.get_value(section, parent=True, merge=merge,
+                                   add_namespace=add_namespace)
+        self.interfaces
+        self._property_defs = _freeze_value(self.get_properties_def_objects())
+        self._attribute_defs = _freeze_value(self.get_attributes_def_objects())
+
     def ancestors(self):
         if self.__ancestors is None:
             self.__ancestors = list(self._ancestors())
@@ -142,9 +215,10 @@ class StatefulEntityType(EntityType):
             for pnode in parents:
                 if self.__class__ is StatefulEntityType:
                     #  prefix is only used to expand "tosca:Type"
-                    yield self.__class__(pnode, self.NODE_PREFIX, self.custom_def)
+                    yield self.intern(pnode, self.NODE_PREFIX,
+                                      custom_def=self.custom_def)
                 else:
-                    yield self.__class__(pnode, self.custom_def)
+                    yield self.intern(pnode, custom_def=self.custom_def)
         else:
             parent = self.parent_type
             if parent:
@@ -168,12 +242,14 @@ class StatefulEntityType(EntityType):
         prel = self.derived_from(self.defs)
         if prel:
             # prefix is only used to expand "tosca:Type"
-            return StatefulEntityType(prel, self.NODE_PREFIX, custom_def=self.custom_def)
+            return StatefulEntityType.intern(prel, self.NODE_PREFIX,
+                                             custom_def=self.custom_def)
         return None
 
-    def _implements(self, type_str):
-        # for backwards compatibility compare the local_name (the unprefixed name)
-        return type_str == self.local_name or type_str in self.aliases
+    def _names(self):
+        # for backwards compatibility also match the local_name (the
+        # unprefixed name) and the aliases
+        return [self.type, self.global_name, self.local_name] + self.aliases
 
     def get_properties_def_objects(self):
         '''Return a list of property definition objects.'''
@@ -205,6 +281,7 @@ class StatefulEntityType(EntityType):
             _attribute_defs = []
             attrs = self.get_definition(self.ATTRIBUTES)
             if attrs:
+                attrs = dict(attrs)
                 self._merge_attributes(attrs)
                 _attribute_defs = [PropertyDef(attr, None, schema)
                                    for attr, schema in attrs.items()]
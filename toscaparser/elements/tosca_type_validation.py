@@ -13,6 +13,7 @@
 from toscaparser.common.exception import ExceptionCollector
 from toscaparser.common.exception import InvalidTemplateVersion
 from toscaparser.common.exception import UnknownFieldError
+from toscaparser.elements.entity_type import _LazyDefinitions
 from toscaparser.extensions.exttools import ExtTools
 
 
@@ -30,12 +31,15 @@ class TypeValidation(object):
          'relationship_types', 'capability_types',
          'interface_types', 'policy_types', 'topology_template',
          'metadata')
-    VALID_TEMPLATE_VERSIONS = ['tosca_simple_yaml_1_0',
-                               'tosca_simple_yaml_1_2',
-                               'tosca_simple_yaml_1_3']
+    MAIN_TEMPLATE_VERSIONS = ['tosca_simple_yaml_1_0',
+                              'tosca_simple_yaml_1_2',
+                              'tosca_simple_yaml_1_3']
     exttools = ExtTools()
-    VALID_TEMPLATE_VERSIONS.extend(exttools.get_versions())
-    ADDITIONAL_SECTIONS = exttools.get_sections()
+    # extensions are only discovered if these are accessed
+    VALID_TEMPLATE_VERSIONS = _LazyDefinitions(
+        lambda cls: cls.MAIN_TEMPLATE_VERSIONS + cls.exttools.get_versions())
+    ADDITIONAL_SECTIONS = _LazyDefinitions(
+        lambda cls: cls.exttools.get_sections())
 
     def __init__(self, custom_types, import_def):
         self.import_def = import_def
@@ -48,7 +52,10 @@ class TypeValidation(object):
         if version:
             self._validate_type_version(version)
             self.version = version
-            ADDITIONAL_SECTIONS = self.ADDITIONAL_SECTIONS.get(version, ())
+            if version in self.MAIN_TEMPLATE_VERSIONS:
+                ADDITIONAL_SECTIONS = ()
+            else:
+                ADDITIONAL_SECTIONS = self.ADDITIONAL_SECTIONS.get(version, ())
         else:
             ADDITIONAL_SECTIONS = ()
 
@@ -59,7 +66,8 @@ class TypeValidation(object):
                                       field=name))
 
     def _validate_type_version(self, version):
-        if version not in self.VALID_TEMPLATE_VERSIONS:
+        if (version not in self.MAIN_TEMPLATE_VERSIONS and
+                version not in self.VALID_TEMPLATE_VERSIONS):
             ExceptionCollector.appendException(
                 InvalidTemplateVersion(
                     what=version + ' in ' + str(self.import_def),
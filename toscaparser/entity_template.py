@@ -57,24 +57,26 @@ class EntityTemplate(object):
         if '__typename' not in template and "_original_properties" not in template:
             self._validate_fields(template)
         if entity_name == 'node_type':
-            self.type_definition = NodeType(type, custom_def) \
-                if type is not None else None
+            self.type_definition = NodeType.intern(
+                type, custom_def=custom_def) if type is not None else None
             self._validate_directives(self.entity_tpl)
         if entity_name == 'relationship_type':
-            self.type_definition = RelationshipType(type, custom_def)
+            self.type_definition = RelationshipType.intern(
+                type, custom_def=custom_def)
         if entity_name == 'policy_type':
             if not type:
                 msg = (_('Policy definition of "%(pname)s" must have'
                        ' a "type" ''attribute.') % dict(pname=name))
                 ExceptionCollector.appendException(
                     ValidationError(message=msg))
-            self.type_definition = PolicyType(type, custom_def)
+            self.type_definition = PolicyType.intern(
+                type, custom_def=custom_def)
         if entity_name == 'group_type':
-            self.type_definition = GroupType(type, custom_def) \
-                if type is not None else None
+            self.type_definition = GroupType.intern(
+                type, custom_def=custom_def) if type is not None else None
         if entity_name == 'artifact_type':
-            self.type_definition = ArtifactTypeDef(type, custom_def) \
-                if type is not None else None
+            self.type_definition = ArtifactTypeDef.intern(
+                type, custom_def=custom_def) if type is not None else None
         self._properties = None
         self._interfaces = None
         self._requirements = None
@@ -229,8 +231,8 @@ class EntityTemplate(object):
     def _create_capability(self, capabilitydefs, name, ctype, props):
         c = capabilitydefs.get(name)
         if ctype and (not c or ctype != c.type):
-            c = CapabilityType(name, ctype,
-                                    self.type_definition.custom_def)
+            c = CapabilityType.intern(
+                name, ctype, custom_def=self.type_definition.custom_def)
         properties = {}
         # first use the definition default value
         for prop_def in c.get_properties_def_objects():
@@ -16,50 +16,103 @@ import importlib
 import logging
 import os
 import os.path
-from stevedore import extension
+import sys
+import threading
 
 from toscaparser.common.exception import ToscaExtAttributeError
 from toscaparser.common.exception import ToscaExtImportError
+from toscaparser.utils import diskcache
 
 log = logging.getLogger("tosca.model")
 
 REQUIRED_ATTRIBUTES = ['VERSION', 'DEFS_FILE']
 
+NAMESPACE = 'toscaparser.extensions'
+
+# extension metadata shared by all ExtTools instances, see get_extension_info()
+_extension_info = None
+_lock = threading.Lock()
+
+
 def _b(*args):
   print(args)
 
+
+def _index_key(cache):
+    # the set of installed entry points can only change if the contents of
+    # the directories on sys.path change
+    parts = [sys.executable]
+    for path in sys.path:
+        try:
+            mtime = os.stat(path or '.').st_mtime_ns
+        except OSError:
+            mtime = None
+        parts.append('%s=%s' % (path, mtime))
+    return cache.make_key(NAMESPACE, None, '\n'.join(parts))
+
+
+def get_extension_info():
+    '''Return the metadata of the installed extensions, keyed by version.
+
+    Entry points are only scanned the first time this is called in a
+    process, and not at all if the on-disk cache has a valid index.
+    '''
+    global _extension_info
+    with _lock:
+        if _extension_info is None:
+            cache = diskcache.get_disk_cache()
+            key = cache and _index_key(cache)
+            extensions = cache and cache.get(key)
+            if extensions is None or not all(
+                    os.path.isfile(info['defs_file'])
+                    for info in extensions.values()):
+                extensions = _load_extensions()
+                if cache:
+                    cache.put(key, extensions)
+            _extension_info = extensions
+        return _extension_info
+
+
+def _load_extensions():
+    '''Dynamically load all the extensions .'''
+    from stevedore import extension
+
+    extensions = collections.OrderedDict()
+
+    extmgr = extension.ExtensionManager(
+        namespace=NAMESPACE,
+        # propagate_map_exceptions=True,
+        # on_load_failure_callback = _b,
+        invoke_on_load=True)
+    extns = extmgr.extensions
+    for e in extns:
+        try:
+            extinfo = importlib.import_module(e.plugin.__module__)
+            base_path = os.path.dirname(extinfo.__file__)
+            plugin = e.obj  # instantiated by invoke_on_load
+            version = plugin.VERSION
+            defs_file = os.path.join(os.path.abspath(base_path),
+                                     plugin.DEFS_FILE)
+
+            # Sections is an optional attribute
+            sections = getattr(plugin, 'SECTIONS', ())
+
+            extensions[version] = {'sections': sections,
+                                   'defs_file': defs_file}
+        except ImportError:
+            raise ToscaExtImportError(ext_name=e.name)
+        except AttributeError:
+            attrs = ', '.join(REQUIRED_ATTRIBUTES)
+            raise ToscaExtAttributeError(ext_name=e.name, attrs=attrs)
+
+    return extensions
+
+
 class ExtTools(object):
-    def __init__(self):
-        self.EXTENSION_INFO = self._load_extensions()
-
-    def _load_extensions(self):
-        '''Dynamically load all the extensions .'''
-        extensions = collections.OrderedDict()
-
-        extmgr = extension.ExtensionManager(namespace='toscaparser.extensions',
-#                                           propagate_map_exceptions=True,
-#                                           on_load_failure_callback = _b,
-                                           invoke_on_load=True)
-        extns =  extmgr.extensions
-        for e in extns:
-            try:
-                extinfo = importlib.import_module(e.plugin.__module__)
-                base_path = os.path.dirname(extinfo.__file__)
-                version = e.plugin().VERSION
-                defs_file = os.path.join(os.path.abspath(base_path), e.plugin().DEFS_FILE)
-
-                # Sections is an optional attribute
-                sections = getattr(e.plugin(), 'SECTIONS', ())
-
-                extensions[version] = {'sections': sections,
-                                       'defs_file': defs_file}
-            except ImportError:
-                raise ToscaExtImportError(ext_name=e.name)
-            except AttributeError:
-                attrs = ', '.join(REQUIRED_ATTRIBUTES)
-                raise ToscaExtAttributeError(ext_name=e.name, attrs=attrs)
-
-        return extensions
+
+    @property
+    def EXTENSION_INFO(self):
+        return get_extension_info()
 
     def get_versions(self):
         return sorted(self.EXTENSION_INFO.keys())
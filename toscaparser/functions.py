@@ -86,8 +86,7 @@ class GetInput(Function):
                     'Expected one or two arguments for function "get_input" but '
                     'received "%s".') % self.args))
         if len(self.args) == 1:  # no default arg
-            inputs = [input.name for input in self.tosca_tpl.inputs]
-            if self.args[0] not in inputs:
+            if self.tosca_tpl.get_input(self.args[0]) is None:
                 ExceptionCollector.appendException(
                     UnknownInputError(input_name=self.args[0]))
 
@@ -104,10 +103,9 @@ class GetInput(Function):
                 self.tosca_tpl.tpl['inputs'][self.input_name]['type'],
                 self.args[1])
 
-        input = [input_def for input_def in self.tosca_tpl.inputs
-                 if self.input_name == input_def.name]
+        input = self.tosca_tpl.get_input(self.input_name)
         if input:
-            return input[0].default
+            return input.default
         return None
 
     @property
@@ -307,9 +305,9 @@ class GetAttribute(Function):
             if node_template_name == SELF and \
             not isinstance(self.context, list) \
             else node_template_name
-        for node_template in self.tosca_tpl.nodetemplates:
-            if node_template.name == name or node_template.is_derived_from(name):
-                return node_template
+        node_template = self.tosca_tpl.find_node_template(name)
+        if node_template:
+            return node_template
         ExceptionCollector.appendException(
             KeyError(_(
                 'Node template "{0}" was not found.'
@@ -561,9 +559,9 @@ class GetProperty(Function):
             return self.context.source
         if not hasattr(self.tosca_tpl, 'nodetemplates'):
             return
-        for node_template in self.tosca_tpl.nodetemplates:
-            if node_template.name == node_template_name or node_template.is_derived_from(node_template_name):
-                return node_template
+        node_template = self.tosca_tpl.find_node_template(node_template_name)
+        if node_template:
+            return node_template
         ExceptionCollector.appendException(
             KeyError(_(
                 'Node template "{0}" was not found.'
@@ -794,9 +792,7 @@ class GetOperationOutput(Function):
             if node_template_name == SELF and \
             not isinstance(self.context, list) \
             else node_template_name
-        for node_template in self.tosca_tpl.nodetemplates:
-            if node_template.name == name or node_template.is_derived_from(name):
-                return node_template
+        return self.tosca_tpl.find_node_template(name)
 
     def _find_relationship_template(self, relationship_template_name):
         for rel_template in self.tosca_tpl.relationship_templates:
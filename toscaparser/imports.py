@@ -10,6 +10,9 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait
 import logging
 import os
 from typing import Optional
@@ -22,6 +25,7 @@ from toscaparser.common.exception import ValidationError
 from toscaparser.common.exception import URLException
 from toscaparser.elements.entity_type import EntityType, Namespace
 from toscaparser.elements.tosca_type_validation import TypeValidation
+from toscaparser.utils import archiveutils
 from toscaparser.utils.gettextutils import _
 import toscaparser.utils.urlutils
 import toscaparser.utils.yamlparser
@@ -84,6 +88,12 @@ class ImportResolver:
 
     solve_topology = None
 
+    # number of threads used to fetch imported documents ahead of loading
+    # them. If None, imports are only prefetched if load_yaml() isn't
+    # overridden; subclasses with a thread-safe load_yaml() can set it.
+    prefetch_workers = None
+    default_prefetch_workers = 8
+
     def get_repository(self, name, tpl=None):
         if tpl is None:
             return None
@@ -115,9 +125,19 @@ class ImportResolver:
 
     def load_imports(self, importsLoader, importslist):
         importsLoader.importslist = importslist
+        workers = self.get_prefetch_workers()
+        if importsLoader.prefetched is None and workers:
+            importsLoader.prefetch(importslist, workers)
         importsLoader._validate_and_load_imports()
         return importsLoader.get_custom_defs()
 
+    def get_prefetch_workers(self):
+        if self.prefetch_workers is not None:
+            return self.prefetch_workers
+        if type(self).load_yaml is ImportResolver.load_yaml:
+            return self.default_prefetch_workers
+        return 0
+
     def find_matching_node(self, relTpl, req_name, req_def):
         if relTpl.target:
             return relTpl.target, relTpl.capability
@@ -161,6 +181,8 @@ class ImportsLoader(object):
             else namespace
         )
         self.nested_tosca_tpls = {}
+        # (path, fragment) => (doc, ctx), shared with nested loaders
+        self.prefetched = None
         self.resolver = resolver or ImportResolver()
         self.repository_root = None
         if repository_root is not None:
@@ -192,27 +214,111 @@ class ImportsLoader(object):
             return
 
         for import_tpl in self.importslist:
-            if isinstance(import_tpl, dict):
-                if len(import_tpl) == 1 and "file" not in import_tpl:
-                    # old style {name: uri}
-                    import_name, import_def = list(import_tpl.items())[0]
-                    if import_name in imports_names:
-                        msg = _('Duplicate import name "%s" was found.') % import_name
-                        log.error(msg)
-                        ExceptionCollector.appendException(ValidationError(message=msg))
-                    imports_names.add(import_name)
-                else:  # new style {"file": uri}
-                    import_name = None
-                    import_def = import_tpl
-            else:  # import_def is just the uri string
-                import_name = None
-                import_def = import_tpl
+            import_name, import_def = self._split_import(import_tpl)
+            if import_name is not None:
+                if import_name in imports_names:
+                    msg = (_('Duplicate import name "%s" was found.') %
+                           import_name)
+                    log.error(msg)
+                    ExceptionCollector.appendException(
+                        ValidationError(message=msg))
+                imports_names.add(import_name)
 
             imported_types, prefix = self._load_import(import_def, import_name)
             if imported_types and imported_types is not self.custom_defs:
                 # add the imported types that are in a separate namespace
                 self.custom_defs.add_with_prefix(imported_types, prefix)
 
+    @staticmethod
+    def _split_import(import_tpl):
+        if isinstance(import_tpl, dict):
+            if len(import_tpl) == 1 and "file" not in import_tpl:
+                # old style {name: uri}
+                return list(import_tpl.items())[0]
+            # new style {"file": uri}
+        # otherwise import_def is just the uri string
+        return None, import_tpl
+
+    def prefetch(self, importslist, max_workers):
+        """Fetch and parse all the documents in the import graph concurrently.
+
+        The graph is walked breadth-first, each document's imports are
+        resolved as soon as it has been parsed. The documents are saved in
+        ``self.prefetched`` and consumed by ``load_yaml()`` so namespaces
+        are still created in import order by ``_validate_and_load_imports()``.
+        Errors are ignored here, they are reported when the import is loaded.
+        """
+        self.prefetched = {}
+        seen = set()
+        frontier = [(self, importslist)]
+        pending = {}
+        with ThreadPoolExecutor(max_workers) as executor:
+            while True:
+                for loader, imports in frontier:
+                    if not isinstance(imports, list):
+                        continue
+                    for import_tpl in imports:
+                        import_name, import_def = self._split_import(
+                            import_tpl)
+                        try:
+                            with ExceptionCollector.raising():
+                                url_info = loader.resolve_import(
+                                    import_def, import_name)
+                        except Exception:
+                            continue
+                        if url_info is None:
+                            continue
+                        base, path, fragment, ctx = url_info
+                        if (path, fragment) in seen:
+                            continue
+                        seen.add((path, fragment))
+                        if (isinstance(import_def, dict) and
+                                import_def.get(self.REPOSITORY)):
+                            root_path = base
+                        else:
+                            root_path = loader.repository_root
+                        future = executor.submit(
+                            self._prefetch_yaml, path, fragment, ctx)
+                        pending[future] = (path, fragment, loader, root_path)
+                frontier = []
+                if not pending:
+                    break
+                done, not_done = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    path, fragment, loader, root_path = pending.pop(future)
+                    try:
+                        doc, ctx = future.result()
+                    except Exception:
+                        continue
+                    if doc is None:
+                        continue
+                    self.prefetched[(path, fragment)] = (doc, ctx)
+                    imports = isinstance(doc, dict) and doc.get("imports")
+                    if imports:
+                        repositories = loader.repositories
+                        if isinstance(doc.get("repositories"), dict):
+                            repositories = dict(repositories,
+                                                **doc["repositories"])
+                        try:
+                            with ExceptionCollector.raising():
+                                nested = ImportsLoader(
+                                    None,
+                                    getattr(doc, "path", path),
+                                    None,
+                                    repositories,
+                                    self.resolver,
+                                    root_path,
+                                )
+                        except Exception:
+                            continue
+                        frontier.append((nested, imports))
+        log.debug("prefetched %s imports", len(self.prefetched))
+
+    def _prefetch_yaml(self, path, fragment, ctx):
+        # errors raise so they are only seen by this prefetch's future
+        with ExceptionCollector.raising():
+            return self.resolver.load_yaml(path, fragment, ctx)
+
     def _load_import(self, import_def, import_name):
         base, full_file_name, imported_tpl = self.load_yaml(import_def, import_name)
         if full_file_name is None:
@@ -259,11 +365,7 @@ class ImportsLoader(object):
         if namespace_id in self.custom_defs.all_namespaces:
             imported_types = self.custom_defs.all_namespaces[namespace_id]
         else:
-            mtime = (
-                os.path.getmtime(full_file_name)
-                if os.path.isfile(full_file_name)
-                else None
-            )
+            mtime = archiveutils.getmtime(full_file_name)
             imported_types = Namespace(
                 self.custom_defs.all_namespaces,
                 _source,
@@ -284,6 +386,7 @@ class ImportsLoader(object):
                     self.resolver,
                     root_path,
                 )
+                imports_loader.prefetched = self.prefetched
                 imports_loader.resolver.load_imports(imports_loader, imports)
                 self.nested_tosca_tpls.update(imports_loader.nested_tosca_tpls)
 
@@ -368,7 +471,10 @@ class ImportsLoader(object):
             path = url_info
             try:
                 base, path, fragment, ctx = url_info
-                doc, ctx = self.resolver.load_yaml(path, fragment, ctx)
+                if self.prefetched and (path, fragment) in self.prefetched:
+                    doc, ctx = self.prefetched.pop((path, fragment))
+                else:
+                    doc, ctx = self.resolver.load_yaml(path, fragment, ctx)
             except Exception as e:
                 msg = _('Import "%s" is not valid.') % path
                 url_exc = URLException(what=msg)
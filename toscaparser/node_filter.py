@@ -0,0 +1,198 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import bisect
+from collections import OrderedDict
+import threading
+
+from toscaparser.activities import ConditionClause
+from toscaparser.common.exception import ExceptionCollector
+from toscaparser.elements.constraints import Constraint
+from toscaparser.elements.constraints import InRange
+
+# property types whose values are compared as is by the equal, valid_values
+# and in_range constraints
+INDEXED_TYPES = ('string', 'integer', 'float', 'boolean')
+NUMBER_TYPES = ('integer', 'float')
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+class PropertyFilter(object):
+    '''The compiled "properties" conditions of a node_filter.
+
+    The conditions can also be those of one of the node_filter's capability
+    or artifact filters. A condition's constraints depend on the type of
+    the property they are applied to so they are created the first time a
+    property of that type is matched and reused afterwards.
+    '''
+
+    # node_filter id => the most recently used compiled filters
+    _compiled = OrderedDict()
+    _compiled_lock = threading.Lock()
+    max_compiled = 1024
+
+    @classmethod
+    def get_compiled(cls, node_filter):
+        '''Return the PropertyFilter for node_filter.
+
+        An existing one is reused if possible.
+        '''
+        key = id(node_filter)
+        with cls._compiled_lock:
+            compiled = cls._compiled.get(key)
+            if compiled is not None and compiled.node_filter is node_filter:
+                cls._compiled.move_to_end(key)
+                return compiled
+        compiled = cls(node_filter)
+        with cls._compiled_lock:
+            cls._compiled[key] = compiled
+            while len(cls._compiled) > cls.max_compiled:
+                cls._compiled.popitem(last=False)
+        return compiled
+
+    def __init__(self, node_filter):
+        self.node_filter = node_filter
+        self.conditions = []  # (name, value, type => ConditionClause or None)
+        for condition in node_filter.get('properties') or []:
+            assert isinstance(condition, dict)
+            key, value = list(condition.items())[0]
+            if isinstance(value, dict):
+                if 'eval' in value or 'q' in value:
+                    continue
+                self.conditions.append((key, value, {}))
+            else:  # simple match
+                self.conditions.append((key, value, None))
+
+    def _get_clause(self, key, value, clauses, datatype):
+        clause = clauses.get(datatype)
+        if clause is None:
+            start = len(ExceptionCollector.exceptions)
+            clause = ConditionClause(key, value, datatype)
+            if len(ExceptionCollector.exceptions) == start:
+                # only reuse valid clauses so errors are reported each time
+                clauses[datatype] = clause
+        return clause
+
+    def match(self, entity):
+        props = entity.builtin_properties()
+        props.update(entity.get_properties())
+        for key, value, clauses in self.conditions:
+            if key not in props:
+                return False
+            prop = props[key]
+            propvalue = prop.value
+            if clauses is not None:
+                clause = self._get_clause(key, value, clauses, prop.type)
+                if not clause.evaluate({key: propvalue}):
+                    return False
+            elif propvalue != value:  # simple match
+                return False
+        return True
+
+    def find_candidates(self, index):
+        '''Return the names of the templates that could match.
+
+        Returns the templates in the given _NodeTemplateIndex that could
+        match these conditions or None if the conditions can't be answered
+        from the index. The templates still need to be matched.
+        '''
+        found = None
+        for key, value, clauses in self.conditions:
+            if clauses is None:
+                names = index.get_property_index(key).find_equal([value])
+            elif len(value) == 1:
+                ctype, cvalue = next(iter(value.items()))
+                if ctype in (Constraint.EQUAL, Constraint.VALID_VALUES):
+                    values = [cvalue] if ctype == Constraint.EQUAL else cvalue
+                    names = index.get_property_index(key).find_equal(values)
+                elif ctype == Constraint.IN_RANGE:
+                    names = index.get_property_index(key).find_in_range(cvalue)
+                else:
+                    names = None
+            else:
+                names = None
+            if names is not None:
+                found = names if found is None else found & names
+        return found
+
+
+class PropertyIndex(object):
+    '''Indexes the templates that have the given property by its value.
+
+    Only values of the INDEXED_TYPES are indexed, templates with other
+    values are returned by every lookup. The index isn't updated if a
+    property's value changes after the template was added.
+    '''
+
+    def __init__(self, name):
+        self.name = name
+        self.values = {}  # value => template names
+        self.numbers = []  # (value, template name)
+        self.keys = None  # the sorted values in numbers
+        self.other = set()  # templates whose value isn't indexed
+        self.other_numbers = set()  # templates whose value isn't a number
+
+    def add(self, node):
+        props = node.builtin_properties()
+        props.update(node.get_properties())
+        prop = props.get(self.name)
+        if prop is None:
+            return
+        value = prop.value
+        if prop.type in INDEXED_TYPES and not isinstance(value, (list, dict)):
+            try:
+                self.values.setdefault(value, set()).add(node.name)
+            except TypeError:  # unhashable
+                self.other.add(node.name)
+        else:
+            self.other.add(node.name)
+        if prop.type in NUMBER_TYPES and _is_number(value):
+            self.numbers.append((value, node.name))
+            self.keys = None
+        else:
+            self.other_numbers.add(node.name)
+
+    def find_equal(self, values):
+        if not isinstance(values, (list, tuple)):
+            return None
+        found = set(self.other)
+        for value in values:
+            try:
+                found.update(self.values.get(value, ()))
+            except TypeError:  # unhashable, can't use the index
+                return None
+        return found
+
+    def find_in_range(self, bounds):
+        if not isinstance(bounds, (list, tuple)) or len(bounds) != 2:
+            return None
+        low, high = bounds
+        if not all(_is_number(b) or b == InRange.UNBOUNDED for b in bounds):
+            return None  # e.g. scalar-units
+        if self.keys is None:
+            self.numbers.sort(key=lambda item: item[0])
+            self.keys = [item[0] for item in self.numbers]
+        keys = self.keys
+        if low == InRange.UNBOUNDED:
+            start = 0
+        else:
+            start = bisect.bisect_left(keys, low)
+        if high == InRange.UNBOUNDED:
+            end = len(keys)
+        else:
+            end = bisect.bisect_right(keys, high)
+        found = set(self.other_numbers)
+        found.update(name for value, name in self.numbers[start:end])
+        return found
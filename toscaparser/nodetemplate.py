@@ -11,6 +11,7 @@
 #    under the License.
 
 
+import copy
 import logging
 
 
@@ -23,12 +24,14 @@ from toscaparser.common.exception import InvalidOccurrences
 from toscaparser.dataentity import DataEntity
 from toscaparser.elements.statefulentitytype import StatefulEntityType
 from toscaparser.entity_template import EntityTemplate
+from toscaparser.node_filter import PropertyFilter
 from toscaparser.relationship_template import RelationshipTemplate
 from toscaparser.utils.gettextutils import _
 from toscaparser.artifacts import Artifact
 from toscaparser.activities import ConditionClause
-from toscaparser.elements.nodetype import NodeType
+from toscaparser.elements.entity_type import _thaw
 from toscaparser.elements.entity_type import Namespace
+from toscaparser.elements.nodetype import NodeType
 
 log = logging.getLogger('tosca')
 
@@ -234,6 +237,8 @@ class NodeTemplate(EntityTemplate):
     def _get_rel_type(self, relationship, name, namespace):
         relTpl = None
         if isinstance(relationship, dict):
+            # the template needs its own copy of the node type's definition
+            relationship = _thaw(relationship)
             type = relationship.get('type')
             if not type:
                 ExceptionCollector.appendException(
@@ -265,12 +270,24 @@ class NodeTemplate(EntityTemplate):
         related_node = None
         related_capability = None
         capability = req_def.get('capability')
-        for nodeTemplate in self.topology_template.node_templates.values():
+        valid_target_types = relTpl.type_definition.valid_target_types
+        if capability:
+            capabilities = [capability]
+            global_name = self._get_capability_global_name(capability, req_def)
+            if global_name:
+                capabilities.append(global_name)
+        elif valid_target_types:
+            capabilities = valid_target_types
+        else:
+            capabilities = None
+        candidates = self.topology_template.find_node_templates(
+            nodetype, capabilities, node_filter)
+        for nodeTemplate in candidates:
             found = None
             found_cap = None
             # check if node name is node type
             if not nodetype or nodeTemplate.is_derived_from(nodetype):
-                if capability or relTpl.type_definition.valid_target_types:
+                if capability or valid_target_types:
                     capabilities = relTpl.get_matching_capabilities(nodeTemplate, capability, req_def)
                     if capabilities:
                         found = nodeTemplate
@@ -317,6 +334,17 @@ class NodeTemplate(EntityTemplate):
                     related_capability = found_cap
         return related_node, related_capability
 
+    def _get_capability_global_name(self, capability, req_def):
+        # the capability might be a type name declared in the requirement's
+        # namespace
+        if not isinstance(self.custom_def, Namespace):
+            return None
+        namespace = self.custom_def.find_namespace(
+            req_def.get("!namespace-capability"))
+        if namespace.get(capability):
+            return namespace.get_global_name(capability)
+        return None
+
     def _set_relationship(self, related_node, related_capability, relTpl):
         if self.topology_template.substitution_mappings:
             # the outer topology's node template might have overridden this requirement
@@ -512,6 +540,9 @@ class NodeTemplate(EntityTemplate):
                         # specifying that an artifact of a certain type is required
                     required_artifacts[name] = value
             else:
+                if isinstance(value, dict):
+                    # the artifact gets its own copy of the type's definition
+                    value = copy.deepcopy(value)
                 if isinstance(value, dict) and isinstance(parent_type.custom_def, Namespace):
                     namespace = parent_type.custom_def.find_namespace(value.pop("!namespace", None))
                 else:
@@ -763,24 +794,7 @@ class NodeTemplate(EntityTemplate):
         return valid
 
     def _match_filter(self, entity, node_filter):
-        filters = node_filter.get('properties') or []
-        props = entity.builtin_properties()
-        props.update(entity.get_properties())
-        for condition in filters:
-            assert isinstance(condition, dict)
-            key, value = list(condition.items())[0]
-            if key not in props:
-                return False
-            prop = props[key]
-            propvalue = prop.value
-            if isinstance(value, dict):
-                if 'eval' in value or 'q' in value:
-                    continue
-                if not ConditionClause(key, value, prop.type).evaluate({key:propvalue}):
-                    return False
-            elif propvalue != value: # simple match
-                return False
-        return True
+        return PropertyFilter.get_compiled(node_filter).match(entity)
 
     @staticmethod
     def get_filters(node_filter):
@@ -14,7 +14,6 @@ import os.path
 import requests
 import shutil
 import tempfile
-import yaml
 import zipfile
 
 from io import BytesIO
@@ -23,6 +22,7 @@ from toscaparser.common.exception import ExceptionCollector
 from toscaparser.common.exception import URLException
 from toscaparser.common.exception import ValidationError
 from toscaparser.imports import ImportsLoader
+from toscaparser.utils import archiveutils
 from toscaparser.utils.gettextutils import _
 from toscaparser.utils.urlutils import UrlUtils
 from toscaparser.utils import yamlparser
@@ -35,12 +35,19 @@ YAML_LOADER = yamlparser.load_yaml
 
 class CSAR(object):
 
-    def __init__(self, csar_file, a_file=True, unzip_dir=None):
+    # number of threads used to check the URLs referenced by templates,
+    # set to 0 to check them one at a time
+    url_check_workers = 8
+
+    def __init__(self, csar_file, a_file=True, unzip_dir=None, extract=True):
         self.path = csar_file
         self.a_file = a_file
         self.is_validated = False
         self.csar = None
         self.unzip_dir = unzip_dir
+        # if False the archive is mounted at unzip_dir instead of extracted
+        self.extract = extract
+        self.mounted = False
         self.is_tosca_metadata = False
         self.main_template_file_name = None
         self.zfile = None
@@ -132,13 +139,12 @@ class CSAR(object):
     def get_main_template_yaml(self):
         main_template = self.get_main_template()
         if main_template:
-            data = self.zfile.read(main_template)
             invalid_tosca_yaml_err_msg = (
                 _('The file "%(template)s" in the CSAR "%(csar)s" does not '
                   'contain valid TOSCA YAML content.') %
                 {'template': main_template, 'csar': self.path})
             try:
-                tosca_yaml = yaml.safe_load(data)
+                tosca_yaml = self._load_member(main_template)
                 if type(tosca_yaml) is not dict:
                     ExceptionCollector.appendException(
                         ValidationError(message=invalid_tosca_yaml_err_msg))
@@ -163,10 +169,38 @@ class CSAR(object):
         assert self.csar
         with zipfile.ZipFile(self.csar, "r") as zf:
             zf.extractall(self.unzip_dir)
+            for name in zf.namelist():
+                yamlparser.cache_extracted_member(
+                    zf, name, os.path.join(self.unzip_dir, name))
+
+    def mount(self):
+        """Make the files in the CSAR readable under unzip_dir.
+
+        YAML files are read straight from the archive, use extract_file()
+        to write other files to unzip_dir when they are needed.
+        """
+        if not self.is_validated:
+            self.validate()
+        assert self.unzip_dir is not None
+        assert self.zfile
+        archiveutils.mount(self.unzip_dir, self.zfile)
+        self.mounted = True
+
+    def unmount(self):
+        if self.mounted:
+            archiveutils.unmount(self.unzip_dir)
+            self.mounted = False
+
+    def extract_file(self, name):
+        """Extract a single file from the CSAR and return its path."""
+        assert self.unzip_dir is not None
+        assert self.zfile
+        return self.zfile.extract(name, self.unzip_dir)
 
     def _validate_external_artifact_imports(self, main_tpl, tpl_filename):
         """validate the imports and artifacts"""
 
+        self._check_urls(main_tpl)
         self._validate_template(main_tpl, tpl_filename)
 
         if main_tpl:
@@ -198,15 +232,65 @@ class CSAR(object):
             temp_dir = tempfile.TemporaryDirectory()
             self.unzip_dir = temp_dir.name
         try:
-            self.decompress()
+            if temp_dir or not self.extract:
+                self.mount()
+            else:
+                self.decompress()
             self._validate_external_artifact_imports(
                 main_tpl,
                 self.main_template_file_name)
         finally:
             if temp_dir:
+                self.unmount()
                 self.unzip_dir = None
                 temp_dir.cleanup()
 
+    def _check_urls(self, template_data):
+        """Check the URLs referenced by the template concurrently
+
+        url_accessible() caches the results so _validate_external_reference()
+        doesn't need to wait for them one at a time.
+        """
+        if not self.url_check_workers or not template_data:
+            return
+        urls = [resource for resource in
+                self._external_references(template_data)
+                if isinstance(resource, str) and
+                UrlUtils.validate_url(resource)]
+        if urls:
+            UrlUtils.check_urls(urls, self.url_check_workers)
+
+    def _external_references(self, template_data):
+        topology_template = template_data.get('topology_template')
+        if not isinstance(topology_template, dict):
+            return
+        node_templates = topology_template.get('node_templates')
+        if not isinstance(node_templates, dict):
+            return
+        for node_template in node_templates.values():
+            if not isinstance(node_template, dict):
+                continue
+            artifacts = node_template.get('artifacts')
+            if isinstance(artifacts, dict):
+                for artifact in artifacts.values():
+                    if isinstance(artifact, dict):
+                        yield artifact.get('file')
+                    else:
+                        yield artifact
+            interfaces = node_template.get('interfaces')
+            if isinstance(interfaces, dict):
+                for interface in interfaces.values():
+                    if not isinstance(interface, dict):
+                        continue
+                    for operation in interface.values():
+                        if isinstance(operation, dict):
+                            operation = operation.get('implementation')
+                        if isinstance(operation, dict):
+                            yield operation.get('primary')
+                            yield operation.get('dependencies')
+                        else:
+                            yield operation
+
     def _validate_template(self, template_data, template):
         if 'topology_template' in template_data:
             topology_template = template_data['topology_template']
@@ -290,9 +374,9 @@ class CSAR(object):
                     URLException(what=msg))
 
         assert self.unzip_dir is not None
-        if os.path.isfile(os.path.join(self.unzip_dir,
-                                       os.path.dirname(tpl_file),
-                                       resource_file)):
+        if archiveutils.isfile(os.path.join(self.unzip_dir,
+                                            os.path.dirname(tpl_file),
+                                            resource_file)):
             return
         elif self._validate_artifact_name(node_templates):
             return
@@ -304,14 +388,21 @@ class CSAR(object):
                 ValueError(_('The resource "%s" does not exist.')
                            % resource_file))
 
+    def _load_member(self, name):
+        # parsed documents are cached so they are only parsed once even
+        # when they are loaded again through the mounted path
+        cache_key = None
+        if self.unzip_dir is not None:
+            cache_key = os.path.abspath(os.path.join(self.unzip_dir, name))
+        return yamlparser.load_archive_member(self.zfile, name, cache_key)
+
     def _read_template_yaml(self, template):
-        data = self.zfile.read(template)
         invalid_tosca_yaml_err_msg = (
             _('The file "%(template)s" in the CSAR "%(csar)s" does not '
               'contain valid YAML content.') %
             {'template': template, 'csar': self.path})
         try:
-            tosca_yaml = yaml.safe_load(data)
+            tosca_yaml = self._load_member(template)
             if type(tosca_yaml) is not dict:
                 ExceptionCollector.appendException(
                     ValidationError(message=invalid_tosca_yaml_err_msg))
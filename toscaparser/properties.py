@@ -20,6 +20,9 @@ import logging
 class Property(object):
     '''TOSCA built-in Property type.'''
 
+    __slots__ = ("name", "value", "custom_def", "entity", "schema",
+                 "_entry_schema_entity")
+
     PROPERTY_KEYS = Schema.KEYS
 
     ENTRY_SCHEMA_KEYS = (
@@ -37,7 +40,8 @@ class Property(object):
             self.custom_def = custom_def.find_namespace(namespace_id)
         self.entity = DataEntity(schema_dict['type'], self.value, self.custom_def, self.name)
         # the value_type will be the simple if the datatype was derived from one
-        self.schema = Schema(property_name, schema_dict, self.entity.datatype.value_type)
+        self.schema = Schema.get_shared(property_name, schema_dict,
+                                        self.entity.datatype.value_type)
         self._entry_schema_entity = None
 
     @property
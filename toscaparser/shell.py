@@ -16,6 +16,7 @@ import os
 import sys
 
 from toscaparser.tosca_template import ToscaTemplate
+from toscaparser.utils import diskcache
 from toscaparser.utils.gettextutils import _
 import toscaparser.utils.urlutils
 
@@ -49,12 +50,29 @@ class ParserShell(object):
                             required=True,
                             help=_('YAML template or CSAR file to parse.'))
 
+        parser.add_argument('--cache-dir',
+                            metavar='<directory>',
+                            help=_('Cache parsed imports in this directory.'))
+
+        parser.add_argument('--cache-max-bytes',
+                            metavar='<bytes>',
+                            type=int,
+                            help=_('Maximum size of the cache directory.'))
+
+        parser.add_argument('--no-cache',
+                            action='store_true',
+                            help=_('Disable the cache of parsed imports.'))
+
         return parser
 
     def main(self, argv):
         parser = self.get_parser(argv)
         (args, extra_args) = parser.parse_known_args(argv)
         path = args.template_file
+        if args.no_cache:
+            diskcache.disable_disk_cache()
+        elif args.cache_dir:
+            diskcache.enable_disk_cache(args.cache_dir, args.cache_max_bytes)
         if os.path.isfile(path):
             self.parse(path)
         elif toscaparser.utils.urlutils.UrlUtils.validate_url(path):
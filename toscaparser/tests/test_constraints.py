@@ -11,6 +11,7 @@
 #    under the License.
 
 import datetime
+import pickle
 import yaml
 
 from toscaparser.activities import value_to_type
@@ -44,6 +45,26 @@ class ConstraintTest(TestCase):
         self.assertEqual(True, cpus_schema.required)
         self.assertIsNone(cpus_schema.default)
 
+    def test_schema_shared_and_pickled(self):
+        tpl_snippet = '''
+        cpus:
+          type: integer
+          constraints:
+            - in_range: [1, 4]
+        '''
+        schema = yamlparser.simple_parse(tpl_snippet)
+        cpus_schema = Schema.get_shared('cpus', schema['cpus'])
+        self.assertIs(cpus_schema, Schema.get_shared('cpus', schema['cpus']))
+        self.assertIsNot(cpus_schema,
+                         Schema.get_shared('cpus', dict(schema['cpus'])))
+        self.assertFalse(hasattr(cpus_schema, '__dict__'))
+        self.assertFalse(hasattr(cpus_schema.constraints[0], '__dict__'))
+
+        copy = pickle.loads(pickle.dumps(cpus_schema))
+        self.assertEqual('integer', copy.type)
+        self.assertEqual(schema['cpus'], copy.schema)
+        self.assertEqual([1, 4], copy.constraints[0].constraint_value)
+
     def test_schema_not_dict(self):
         tpl_snippet = '''
         cpus:
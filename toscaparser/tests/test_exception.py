@@ -10,7 +10,10 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import threading
+
 from toscaparser.common import exception
+from toscaparser.common.exception import ExceptionCollector
 from toscaparser.tests.base import TestCase
 from toscaparser.utils.gettextutils import _
 
@@ -40,3 +43,21 @@ class ExceptionTest(TestCase):
     def _formate_exception(self):
         exception.UnknownFieldError.set_fatal_format_exception(True)
         raise exception.UnknownFieldError(what='Template')
+
+    def test_collector_raising(self):
+        ExceptionCollector.start()
+        self.addCleanup(ExceptionCollector.stop)
+
+        def other_thread():
+            ExceptionCollector.appendException(ValueError("collected"))
+
+        with ExceptionCollector.raising():
+            self.assertRaises(ValueError, ExceptionCollector.appendException,
+                              ValueError("raised"))
+            # only the current thread raises
+            thread = threading.Thread(target=other_thread)
+            thread.start()
+            thread.join()
+        ExceptionCollector.appendException(ValueError("after"))
+        errors = [str(e) for e in ExceptionCollector.exceptions]
+        self.assertEqual(["collected", "after"], errors)
@@ -0,0 +1,122 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import fixtures
+from stevedore import extension
+
+from toscaparser.common import exception
+from toscaparser.elements.entity_type import _LazyDefinitions
+from toscaparser.elements.entity_type import EntityType
+from toscaparser.elements.tosca_type_validation import TypeValidation
+from toscaparser.extensions import exttools
+from toscaparser.extensions.mec.tosca_simple_profile_for_mec_1_0_0 \
+    import MecProfile_1_0_0
+from toscaparser.extensions.nfv.tosca_simple_profile_for_nfv_1_0_0 \
+    import NfvProfile_1_0_0
+from toscaparser.tests.base import TestCase
+from toscaparser.tests import utils
+from toscaparser.tosca_template import ToscaTemplate
+from toscaparser.utils import diskcache
+
+
+class ExtensionsFixture(fixtures.Fixture):
+    '''Register the extensions in the source tree.
+
+    The tests then don't depend on the package's entry points being
+    installed. Extensions are still discovered lazily, through
+    exttools._load_extensions().
+    '''
+
+    PLUGINS = [NfvProfile_1_0_0, MecProfile_1_0_0]
+
+    def _setUp(self):
+        manager = extension.ExtensionManager.make_test_instance(
+            [extension.Extension(plugin.VERSION, None, plugin, plugin())
+             for plugin in self.PLUGINS],
+            namespace=exttools.NAMESPACE)
+        self.useFixture(fixtures.MockPatch(
+            "stevedore.extension.ExtensionManager", return_value=manager))
+        self.useFixture(fixtures.MonkeyPatch(
+            "toscaparser.extensions.exttools._extension_info", None))
+        # forget the versions found before the extensions were registered
+        for cls, name, load in [
+            (ToscaTemplate, "VALID_TEMPLATE_VERSIONS",
+             lambda cls: cls.MAIN_TEMPLATE_VERSIONS +
+             cls.exttools.get_versions()),
+            (TypeValidation, "VALID_TEMPLATE_VERSIONS",
+             lambda cls: cls.MAIN_TEMPLATE_VERSIONS +
+             cls.exttools.get_versions()),
+            (TypeValidation, "ADDITIONAL_SECTIONS",
+             lambda cls: cls.exttools.get_sections()),
+        ]:
+            lazy = _LazyDefinitions(load)
+            lazy.__set_name__(cls, name)
+            self.useFixture(fixtures.MockPatchObject(cls, name, lazy))
+
+
+class ExtToolsTest(TestCase):
+
+    def setUp(self):
+        super(ExtToolsTest, self).setUp()
+        self.useFixture(ExtensionsFixture())
+        self.useFixture(fixtures.MonkeyPatch(
+            "toscaparser.utils.diskcache._disk_cache", None))
+        self.useFixture(fixtures.MonkeyPatch(
+            "toscaparser.utils.diskcache._disabled", False))
+
+    def test_core_template_does_not_load_extensions(self):
+        scan = self.useFixture(fixtures.MockPatchObject(
+            exttools, "_load_extensions")).mock
+        ToscaTemplate(utils.get_sample_test_path(
+            "data/tosca_helloworld.yaml"))
+        scan.assert_not_called()
+
+    def test_extension_info_is_cached(self):
+        scan = self.useFixture(fixtures.MockPatchObject(
+            exttools, "_load_extensions",
+            wraps=exttools._load_extensions)).mock
+        self.assertIn("tosca_simple_profile_for_nfv_1_0_0",
+                      exttools.ExtTools().get_versions())
+        exttools.ExtTools().get_sections()
+        self.assertEqual(1, scan.call_count)
+
+    def test_extension_index_persisted(self):
+        diskcache.enable_disk_cache(
+            self.useFixture(fixtures.TempDir()).path)
+        info = exttools.get_extension_info()
+        self.assertIn("tosca_simple_profile_for_nfv_1_0_0", info)
+        # simulate a new process
+        exttools._extension_info = None
+        scan = self.useFixture(fixtures.MockPatchObject(
+            exttools, "_load_extensions")).mock
+        self.assertEqual(info, exttools.get_extension_info())
+        scan.assert_not_called()
+
+    def test_extension_template(self):
+        tosca = ToscaTemplate(utils.get_sample_test_path(
+            "data/extensions/tosca_helloworld_nfv.yaml"))
+        self.assertEqual("tosca_simple_profile_for_nfv_1_0_0", tosca.version)
+
+    def test_profiles_do_not_leak(self):
+        nfv_tpl = utils.get_sample_test_path(
+            "data/extensions/tosca_helloworld_nfv.yaml")
+        core_tpl = {
+            "tosca_definitions_version": "tosca_simple_yaml_1_3",
+            "topology_template": {"node_templates": {
+                "VDU1": {"type": "tosca.nodes.nfv.VDU"}}}}
+        for i in range(2):
+            tosca = ToscaTemplate(nfv_tpl)
+            self.assertIn("VDU1", tosca.topology_template.node_templates)
+            self.assertIn("tosca.nodes.nfv.VDU", EntityType.TOSCA_DEF)
+            self.assertRaises(exception.ValidationError, ToscaTemplate,
+                              None, yaml_dict_tpl=core_tpl)
+            self.assertNotIn("tosca.nodes.nfv.VDU", EntityType.TOSCA_DEF)
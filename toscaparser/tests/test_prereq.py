@@ -15,7 +15,6 @@ import tempfile
 import requests
 import shutil
 from unittest import mock
-import urllib
 import zipfile
 
 from toscaparser.common.exception import ExceptionCollector
@@ -184,7 +183,7 @@ class CSARPrereqTest(TestCase):
         self.assertTrue(csar.unzip_dir is None or
                         not os.path.exists(csar.unzip_dir))
 
-    @mock.patch.object(urllib.request, 'urlopen')
+    @mock.patch.object(UrlUtils, 'open_url')
     @mock.patch.object(UrlUtils, 'url_accessible')
     def test_valid_csar_with_url_import_and_script(
             self, mock_url_accessible, mock_urlopen):
@@ -202,6 +201,25 @@ class CSARPrereqTest(TestCase):
         self.assertTrue(csar.unzip_dir is None or
                         not os.path.exists(csar.unzip_dir))
 
+    @mock.patch.object(UrlUtils, 'open_url')
+    @mock.patch.object(UrlUtils, 'check_urls')
+    def test_external_references_checked_together(
+            self, mock_check_urls, mock_urlopen):
+        path = os.path.join(self.base_path, "data/CSAR/csar_wordpress_with_url"
+                            "_import_and_script.zip")
+        mock_path = "https://example.com/wordpress.yaml"
+
+        mockclass = MockTestClass()
+        mockclass.comp_urldict = {mock_path: utils.get_sample_test_path(
+            "data/custom_types/wordpress.yaml")}
+        mock_urlopen.side_effect = mockclass.mock_urlopen_method
+        with mock.patch.object(UrlUtils, 'url_accessible') as accessible:
+            accessible.return_value = True
+            csar = CSAR(path)
+            self.assertTrue(csar.validate())
+        mock_check_urls.assert_called_once_with(
+            ["https://example.com/install.sh"], CSAR.url_check_workers)
+
     def test_metadata_invalid_csar(self):
         path = os.path.join(self.base_path,
                             "data/CSAR/csar_metadata_not_yaml.zip")
@@ -10,9 +10,14 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import tracemalloc
+from unittest import mock
+
 from testtools import matchers
 
 from toscaparser.common import exception
+from toscaparser.dataentity import DataEntity
+from toscaparser.elements.constraints import Schema
 from toscaparser.elements.property_definition import PropertyDef
 from toscaparser.nodetemplate import NodeTemplate
 from toscaparser.topology_template import TopologyTemplate
@@ -22,6 +27,25 @@ from toscaparser.utils.gettextutils import _
 from toscaparser.utils import yamlparser
 
 
+def _with_dict(cls):
+    # a copy of cls that keeps its attributes in a __dict__ instead of slots
+    attrs = {k: v for k, v in vars(cls).items()
+             if k not in cls.__slots__ and k != '__slots__'}
+    return type(cls.__name__, cls.__bases__, attrs)
+
+
+def _retained_memory(create, count):
+    tracemalloc.start()
+    try:
+        start = tracemalloc.get_traced_memory()[0]
+        objects = [create(i) for i in range(count)]
+        retained = tracemalloc.get_traced_memory()[0] - start
+    finally:
+        tracemalloc.stop()
+    del objects
+    return retained
+
+
 class PropertyTest(TestCase):
 
     def test_type(self):
@@ -371,3 +395,28 @@ class PropertyTest(TestCase):
             rel_tpls.extend(relationship[0].target.get_relationship_templates())
         self.assertEqual(expected_properties,
                          sorted(rel_tpls[0].get_properties().keys()))
+
+    def test_property_memory(self):
+        # compare with properties built from classes without __slots__
+        # that don't share their schemas
+        schema = {'type': 'integer', 'required': False,
+                  'constraints': [{'in_range': [1, 4]}]}
+
+        def create(i):
+            prop = Property('cpus', i % 4 + 1, schema)
+            prop.validate()
+            return prop
+
+        count = 2000
+        retained = _retained_memory(create, count)
+        DictSchema = _with_dict(Schema)
+        DictSchema.get_shared = classmethod(
+            lambda cls, name, schema_dict, datatype=None:
+            cls(name, schema_dict, datatype))
+        with mock.patch('toscaparser.properties.Schema', DictSchema), \
+                mock.patch('toscaparser.properties.DataEntity',
+                           _with_dict(DataEntity)):
+            unslotted = _retained_memory(create, count)
+        self.assertLess(retained, unslotted * 0.75,
+                        '%s bytes with __slots__, %s without'
+                        % (retained, unslotted))
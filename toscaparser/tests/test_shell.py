@@ -10,10 +10,13 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import fixtures
+
 from toscaparser.common import exception
 import toscaparser.shell as shell
 from toscaparser.tests.base import TestCase
 from toscaparser.tests import utils
+from toscaparser.utils import diskcache
 from toscaparser.utils.gettextutils import _
 
 
@@ -45,3 +48,11 @@ class ShellTest(TestCase):
             shell.main([arg])
         except Exception:
             self.fail(_('The program raised an exception unexpectedly.'))
+
+    def test_template_valid_no_cache(self):
+        self.useFixture(fixtures.MonkeyPatch(
+            "toscaparser.utils.diskcache._disk_cache", None))
+        self.useFixture(fixtures.MonkeyPatch(
+            "toscaparser.utils.diskcache._disabled", False))
+        shell.main(['--template-file=' + self.tosca_helloworld, '--no-cache'])
+        self.assertIsNone(diskcache.get_disk_cache())
@@ -10,9 +10,14 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import fixtures
 import os
+import threading
+from unittest import mock
 
 from toscaparser.common import exception
+from toscaparser.node_filter import PropertyFilter
+from toscaparser.relationship_template import RelationshipTemplate
 from toscaparser.substitution_mappings import SubstitutionMappings
 from toscaparser.tests.base import TestCase
 from toscaparser.tests import utils
@@ -460,3 +465,171 @@ class TopologyTemplateTest(TestCase):
                                                          custom_defs))
         errormsg = _('inputs must be of type "dict".')
         self.assertEqual(errormsg, err.__str__())
+
+    def _app_topology(self, count):
+        return {
+            'tosca_definitions_version': 'tosca_simple_yaml_1_3',
+            'capability_types': {
+                'my.Db': {'derived_from': 'tosca.capabilities.Endpoint'}},
+            'node_types': {
+                'my.Database': {
+                    'derived_from': 'tosca.nodes.Root',
+                    'capabilities': {'db': {'type': 'my.Db'}}},
+                'my.App': {
+                    'derived_from': 'tosca.nodes.Root',
+                    'requirements': [{'db': {'capability': 'my.Db',
+                                             'occurrences': [1, 1]}}]}},
+            'topology_template': {'node_templates': dict(
+                db={'type': 'my.Database'},
+                **{'app%s' % i: {
+                    'type': 'my.App',
+                    'requirements': [{'db': {'capability': 'my.Db'}}]}
+                   for i in range(count)})}}
+
+    def test_find_node_templates(self):
+        tosca = ToscaTemplate(yaml_dict_tpl=self._app_topology(2))
+        topology = tosca.topology_template
+        self.assertEqual(['db'], [n.name for n in topology.find_node_templates(
+            capabilities=['tosca.capabilities.Endpoint'])])
+        self.assertEqual(['app0', 'app1'], [
+            n.name for n in topology.find_node_templates('my.App')])
+        self.assertEqual([], topology.find_node_templates('my.App', ['db']))
+        for node in topology.nodetemplates:
+            if node.name != 'db':
+                self.assertEqual('db', node.relationships[0][0].target.name)
+        # the index is updated as templates are added
+        topology.add_node_template('db2', {'type': 'my.Database'})
+        self.assertEqual(['db', 'db2'], [
+            n.name for n in topology.find_node_templates(
+                capabilities=['my.Db'])])
+        db = topology.node_templates['db']
+        del topology.node_templates['db']
+        self.assertEqual(['db2'], [
+            n.name for n in topology.find_node_templates(
+                capabilities=['my.Db'])])
+        topology.node_templates |= {'db': db}
+        self.assertEqual(['db2', 'db'], [
+            n.name for n in topology.find_node_templates(
+                capabilities=['my.Db'])])
+
+    def test_find_node_template(self):
+        tpl = self._app_topology(2)
+        # a template named after a type is found before later templates of
+        # that type
+        tpl['topology_template']['node_templates'] = dict(
+            {'my.Database': {'type': 'tosca.nodes.Root'}},
+            **tpl['topology_template']['node_templates'])
+        tpl['topology_template']['inputs'] = {
+            'port': {'type': 'integer', 'default': 80}}
+        tpl['topology_template']['outputs'] = {
+            'app_state': {'value': {'get_attribute': ['my.App', 'state']}}}
+        topology = ToscaTemplate(yaml_dict_tpl=tpl).topology_template
+        self.assertEqual('app1', topology.find_node_template('app1').name)
+        self.assertEqual('app0', topology.find_node_template('my.App').name)
+        self.assertEqual('my.Database',
+                         topology.find_node_template('my.Database').name)
+        self.assertEqual('my.Database',
+                         topology.find_node_template('tosca.nodes.Root').name)
+        self.assertIsNone(topology.find_node_template('missing'))
+        self.assertIsNone(topology.find_node_template(['app0']))
+        self.assertEqual(80, topology.get_input('port').default)
+        self.assertIsNone(topology.get_input('missing'))
+        self.assertEqual('app_state', topology.get_output('app_state').name)
+        # the maps are updated when the lists change
+        port = topology.inputs[0]
+        topology.inputs[0] = mock.Mock()
+        topology.inputs[0].name = 'other'
+        self.assertIsNone(topology.get_input('port'))
+        self.assertIsNotNone(topology.get_input('other'))
+        topology.inputs = [port]
+        self.assertIs(port, topology.get_input('port'))
+        other = mock.Mock()
+        other.name = 'other'
+        topology.inputs += [other]
+        self.assertIs(other, topology.get_input('other'))
+        topology.outputs.clear()
+        self.assertIsNone(topology.get_output('app_state'))
+        topology.add_node_template('app', {'type': 'my.App'})
+        self.assertEqual('app0', topology.find_node_template('my.App').name)
+        del topology.node_templates['app0']
+        self.assertEqual('app1', topology.find_node_template('my.App').name)
+        topology.node_templates = {'app': topology.node_templates['app']}
+        self.assertEqual('app', topology.find_node_template('my.App').name)
+
+    def test_compiled_property_filters_shared_between_threads(self):
+        self.useFixture(fixtures.MockPatchObject(
+            PropertyFilter, "max_compiled", 4))
+        filters = [{'properties': [{'port': i}]} for i in range(16)]
+        errors = []
+
+        def compile_filters():
+            try:
+                for i in range(200):
+                    node_filter = filters[i % len(filters)]
+                    compiled = PropertyFilter.get_compiled(node_filter)
+                    assert compiled.node_filter is node_filter
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=compile_filters) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual([], errors)
+        self.assertLessEqual(len(PropertyFilter._compiled), 4)
+
+    def test_requirement_matching_scales_linearly(self):
+        # each requirement should only check the templates that offer the
+        # capability
+        for count in (10, 100):
+            with mock.patch.object(
+                    RelationshipTemplate, 'get_matching_capabilities',
+                    autospec=True,
+                    side_effect=RelationshipTemplate.get_matching_capabilities
+            ) as matching:
+                ToscaTemplate(yaml_dict_tpl=self._app_topology(count))
+                self.assertEqual(count, matching.call_count)
+
+    def test_find_node_templates_by_property(self):
+        tpl = {
+            'tosca_definitions_version': 'tosca_simple_yaml_1_3',
+            'node_types': {
+                'my.Server': {
+                    'derived_from': 'tosca.nodes.Root',
+                    'properties': {'zone': {'type': 'string'},
+                                   'cpus': {'type': 'integer'}}},
+                'my.App': {
+                    'derived_from': 'tosca.nodes.Root',
+                    'requirements': [{'server': {'node': 'my.Server'}}]}},
+            'topology_template': {'node_templates': dict(
+                app={'type': 'my.App',
+                     'requirements': [{'server': {'node_filter': {
+                         'properties': [
+                             {'zone': {'valid_values': ['west', 'north']}},
+                             {'cpus': {'in_range': [8, 'UNBOUNDED']}}]}}}]},
+                **{'server%s' % i: {
+                    'type': 'my.Server',
+                    'properties': {'zone': ('east', 'west')[i % 2],
+                                   'cpus': i}}
+                   for i in range(10)})}}
+        topology = ToscaTemplate(yaml_dict_tpl=tpl).topology_template
+        app = topology.node_templates['app']
+        self.assertEqual('server9', app.relationships[0][0].target.name)
+
+        def find(*conditions):
+            node_filter = {'properties': list(conditions)}
+            return [n.name for n in topology.find_node_templates(
+                'my.Server', node_filter=node_filter)]
+
+        self.assertEqual(['server1', 'server3'], find(
+            {'zone': 'west'}, {'cpus': {'in_range': [0, 4]}}))
+        self.assertEqual(['server2'], find({'cpus': {'equal': 2}}))
+        self.assertEqual(['server8', 'server9'],
+                         find({'cpus': {'in_range': [8, 'UNBOUNDED']}}))
+        # conditions that aren't indexed don't narrow down the candidates
+        self.assertEqual(10, len(find({'cpus': {'greater_than': 8}})))
+        # the index is updated as templates are added
+        topology.add_node_template('server10', {
+            'type': 'my.Server', 'properties': {'zone': 'west', 'cpus': 2}})
+        self.assertEqual(['server2', 'server10'], find({'cpus': {'equal': 2}}))
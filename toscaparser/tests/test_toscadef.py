@@ -10,9 +10,17 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import copy
+import subprocess
+import sys
+from unittest import mock
+
+import fixtures
+
 from toscaparser.common import exception
 from toscaparser.elements.artifacttype import ArtifactTypeDef
 from toscaparser.elements.entity_type import EntityType
+from toscaparser.elements.entity_type import Namespace
 from toscaparser.elements.grouptype import GroupType
 import toscaparser.elements.interfaces as ifaces
 from toscaparser.elements.nodetype import NodeType
@@ -356,3 +364,160 @@ class ToscaDefTest(TestCase):
             sorted(['protocol', 'target', 'target_range', 'source',
                     'source_range']),
             sorted(properties.keys()))
+
+    def test_definitions_loaded_lazily(self):
+        code = ("import toscaparser.elements.entity_type as e; "
+                "assert isinstance(e.EntityType.__dict__['TOSCA_DEF'], "
+                "e._LazyDefinitions); "
+                "assert 'tosca.nodes.Root' in e.EntityType.TOSCA_DEF; "
+                "assert isinstance(e.EntityType.__dict__['TOSCA_DEF'], dict)")
+        subprocess.check_call([sys.executable, "-c", code])
+
+    def test_ancestor_names(self):
+        names = compute_type.ancestor_names()
+        self.assertIsInstance(names, frozenset)
+        self.assertIn('tosca.nodes.Compute', names)
+        self.assertIn('tosca.nodes.Root', names)
+        self.assertIs(names, compute_type.ancestor_names())
+        self.assertTrue(compute_type.is_derived_from('tosca.nodes.Root'))
+        self.assertFalse(compute_type.is_derived_from('tosca.nodes.Storage'))
+
+    def test_get_capability_providers(self):
+        namespace = Namespace({}, None, "")
+        namespace['my.Endpoint'] = {
+            'derived_from': 'tosca.capabilities.Endpoint'}
+        namespace['my.Server'] = {
+            'derived_from': 'tosca.nodes.Root',
+            'capabilities': {'api': {'type': 'my.Endpoint'}}}
+        namespace['my.SubServer'] = {'derived_from': 'my.Server'}
+        namespace['my.Client'] = {
+            'derived_from': 'tosca.nodes.Root',
+            'requirements': [
+                {'api': {'capability': 'tosca.capabilities.Endpoint'}}]}
+        namespace['my.SubClient'] = {'derived_from': 'my.Client'}
+        self.assertEqual(['my.Server'],
+                         namespace.get_capability_providers('my.Endpoint'))
+        # only capabilities of exactly that type declared by the node type
+        providers = namespace.get_capability_providers(
+            'tosca.capabilities.Endpoint')
+        self.assertNotIn('my.Server', providers)
+        self.assertIn('tosca.nodes.WebServer', providers)
+        self.assertEqual([], namespace.get_capability_providers('my.Missing'))
+        server = NodeType('my.Server', namespace)
+        self.assertEqual(providers[0], server._get_node_type_by_cap(
+            'tosca.capabilities.Endpoint'))
+        self.assertEqual('tosca.nodes.Container.Runtime',
+                         server._get_node_type_by_cap(
+                             'tosca.capabilities.Container'))
+        # every node type inherits the "feature" capability from Root
+        self.assertIsNone(server._get_node_type_by_cap(
+            'tosca.capabilities.Node'))
+        # requirements are matched by the capability type and its ancestors
+        requirements = namespace.get_capability_requirements('my.Endpoint')
+        self.assertIn(('my.Client', 'api'), requirements)
+        self.assertIn(('my.SubClient', 'api'), requirements)
+        self.assertNotIn(('my.Client', 'api'),
+                         namespace.get_capability_requirements(
+                             'tosca.capabilities.Root'))
+        # the capability definitions are computed once
+        self.assertIs(server.get_capabilities_def(),
+                      server.get_capabilities_def())
+
+    def test_inherited_values_computed_once(self):
+        for name in ('_types', '_parent_types', '_values'):
+            self.useFixture(fixtures.MonkeyPatch(
+                'toscaparser.elements.entity_type.globals.' + name, {}))
+        webserver = NodeType('tosca.nodes.WebServer')
+        with mock.patch.object(NodeType, 'ancestors',
+                               autospec=True,
+                               side_effect=NodeType.ancestors) as ancestors:
+            caps = webserver.get_definition('capabilities')
+            self.assertIn('data_endpoint', caps)  # from WebServer
+            self.assertIn('host', caps)  # from SoftwareComponent
+            self.assertIn('feature', caps)  # from Root
+            # the cached value is shared and read-only
+            self.assertIs(caps, webserver.get_definition('capabilities'))
+            self.assertRaises(TypeError, caps.pop, 'host')
+            self.assertRaises(TypeError, caps['feature'].__setitem__,
+                              'occurrences', [0, 0])
+            self.assertRaises(TypeError, caps['data_endpoint'].clear)
+            # but copies of it can be modified
+            caps = copy.deepcopy(caps)
+            del caps['host']
+            caps['feature']['occurrences'] = [0, 0]
+            caps = webserver.get_definition('capabilities')
+            self.assertIn('host', caps)
+            self.assertNotIn('occurrences', caps['feature'])
+            self.assertEqual(1, ancestors.call_count)
+
+        # template values are merged with the inherited value
+        tpl = {'capabilities': {'my_cap': {'type': 'tosca.capabilities.Node'},
+                                'host': {'valid_source_types': []}}}
+        caps = webserver.get_value('capabilities', tpl, True, True)
+        self.assertIn('my_cap', caps)
+        self.assertIn('feature', caps)
+        self.assertEqual([], caps['host']['valid_source_types'])
+        self.assertEqual('tosca.capabilities.Compute',
+                         caps['host']['type'])
+        self.assertRaises(TypeError, caps['feature'].__setitem__,
+                          'type', 'my.Feature')
+        caps = webserver.get_definition('capabilities')
+        self.assertNotIn('my_cap', caps)
+        self.assertEqual('tosca.capabilities.Node', caps['feature']['type'])
+
+    def test_namespace_prefixed_names(self):
+        namespaces = {}
+        root = Namespace(namespaces, None, "root")
+        lib = Namespace(namespaces, None, "lib")
+        lib['Base'] = {'derived_from': 'tosca.nodes.Root'}
+        root.add_with_prefix(lib, 'mylib')
+        self.assertEqual('mylib', root.find_prefix('mylib.Base'))
+        self.assertEqual('Base@lib', root.get_global_name('mylib.Base'))
+        self.assertEqual(('Base@lib', 'mylib'),
+                         root.get_global_name_and_prefix('mylib.Base'))
+        self.assertEqual('mylib.Base', root.get_local_name('Base@lib'))
+        self.assertEqual('', root.find_prefix('Base'))
+
+        # the index follows changes to the imports
+        lib['Other'] = {'derived_from': 'Base'}
+        root.add_with_prefix(lib, 'other')
+        self.assertEqual('other', root.find_prefix('other.Other'))
+        root.imports['Base@lib'] = 'renamed.Base'
+        self.assertEqual('', root.find_prefix('mylib.Base'))
+        self.assertEqual('renamed', root.find_prefix('renamed.Base'))
+        root.imports |= {'Other@lib': 'merged.Other'}
+        self.assertEqual('merged', root.find_prefix('merged.Other'))
+
+    def test_intern(self):
+        for name in ('_types', '_parent_types', '_values', '_instances'):
+            self.useFixture(fixtures.MonkeyPatch(
+                'toscaparser.elements.entity_type.globals.' + name, {}))
+        self.useFixture(fixtures.MonkeyPatch(
+            'toscaparser.elements.entity_type.globals._reported', {}))
+        custom_def = {'my.Compute': {'derived_from': 'tosca.nodes.Compute'}}
+        my_compute = NodeType.intern('my.Compute', custom_def=custom_def)
+        self.assertIs(my_compute,
+                      NodeType.intern('my.Compute', custom_def=custom_def))
+        self.assertIs(my_compute.parent_type,
+                      NodeType.intern('tosca.nodes.Compute',
+                                      custom_def=custom_def))
+        # types bound to a different custom_def aren't shared
+        self.assertIsNot(my_compute, NodeType.intern(
+            'my.Compute', custom_def=dict(custom_def)))
+
+        # errors are reported once for each template that uses the type
+        custom_def = {'my.Bad': {'derived_from': 'tosca.nodes.Root',
+                                 'unknown': 1}}
+        self.addCleanup(exception.ExceptionCollector.stop)
+        for i in range(2):
+            self.useFixture(fixtures.MonkeyPatch(
+                'toscaparser.elements.entity_type.globals._reported', {}))
+            exception.ExceptionCollector.start()
+            with mock.patch.object(
+                    exception.ExceptionCollector, 'appendException',
+                    wraps=exception.ExceptionCollector.appendException
+            ) as append:
+                NodeType.intern('my.Bad', custom_def=custom_def)
+                NodeType.intern('my.Bad', custom_def=custom_def)
+            self.assertEqual(1, append.call_count)
+            self.assertEqual(1, len(exception.ExceptionCollector.exceptions))
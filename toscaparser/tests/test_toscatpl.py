@@ -10,12 +10,23 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import copy
+import fixtures
+import functools
+import gc
+import http.server
+import operator
 import os
 import requests
+import threading
 from unittest import mock, skip
-import urllib
+import weakref
+import yaml
 
 from toscaparser.common import exception
+from toscaparser.elements import entity_type
+from toscaparser.elements.entity_type import EntityType
+from toscaparser.elements.entity_type import TypeSnapshot
 import toscaparser.elements.interfaces as ifaces
 from toscaparser.elements.nodetype import NodeType
 from toscaparser.elements.portspectype import PortSpec
@@ -27,6 +38,8 @@ from toscaparser.tests.base import MockTestClass
 from toscaparser.tests.base import TestCase
 from toscaparser.tests import utils
 from toscaparser.tosca_template import ToscaTemplate
+from toscaparser.tpl_relationship_graph import ToscaGraph
+from toscaparser.utils import archiveutils
 from toscaparser.utils.gettextutils import _
 from toscaparser.utils.urlutils import UrlUtils
 import toscaparser.utils.yamlparser
@@ -331,7 +344,7 @@ class ToscaTemplateTest(TestCase):
                     expected_hosts,
                     sorted([v[0].target.type for v in node_tpl.relationships]))
 
-    @mock.patch.object(urllib.request, "urlopen")
+    @mock.patch.object(UrlUtils, 'open_url')
     def test_repositories(self, mock_urlopen):
         # mock URL resolution to avoid dependency on the availability of an external website.
         mockclass = MockTestClass()
@@ -569,7 +582,7 @@ class ToscaTemplateTest(TestCase):
                               parsed_params={'db_root_pwd': '123456'})
         self.assertTrue(tosca.topology_template.custom_defs)
 
-    @mock.patch.object(urllib.request, 'urlopen')
+    @mock.patch.object(UrlUtils, 'open_url')
     def test_url_template_with_local_relpath_import(self, mock_urlopen):
         tosca_tpl = ('https://example.com/tosca_single_instance_'
                      'wordpress.yaml')
@@ -590,7 +603,7 @@ class ToscaTemplateTest(TestCase):
                                              "cpus": 4})
         self.assertTrue(tosca.topology_template.custom_defs)
 
-    @mock.patch.object(urllib.request, 'urlopen')
+    @mock.patch.object(UrlUtils, 'open_url')
     def test_url_template_with_local_abspath_import(self, mock_urlopen):
         tosca_tpl = ('https://example.com/tosca_single_instance_wordpress_'
                      'with_local_abspath_import.yaml')
@@ -612,7 +625,7 @@ class ToscaTemplateTest(TestCase):
     @mock.patch.object(UrlUtils, 'join_url')
     @mock.patch.object(os.path, 'isabs')
     @mock.patch.object(ToscaTemplate, '_tpl_imports')
-    @mock.patch.object(urllib.request, 'urlopen')
+    @mock.patch.object(UrlUtils, 'open_url')
     def test_url_template_with_url_import(
             self, mock_urlopen, mock_tpl_imports, mock_isabs, mock_join_url):
         tosca_tpl = ('https://example.com/tosca_single_instance_wordpress_'
@@ -644,6 +657,81 @@ class ToscaTemplateTest(TestCase):
                                                      "db_port": 3306,
                                                      "cpus": 4}))
 
+    def test_csar_parsed_without_extracting(self):
+        self.useFixture(fixtures.MockPatchObject(
+            ToscaTemplate, "mount_csar", True))
+        csar_archive = utils.get_sample_test_path(
+            "data/CSAR/csar_wordpress.zip")
+        tosca = ToscaTemplate(csar_archive,
+                              parsed_params={"db_name": "mysql",
+                                             "db_user": "mysql",
+                                             "db_root_pwd": "1234",
+                                             "db_pwd": "5678",
+                                             "db_port": 3306,
+                                             "cpus": 4})
+        self.assertEqual([], os.listdir(tosca.base_dir))
+        # read from TOSCA-Metadata/TOSCA.meta in the archive
+        self.assertEqual("OASIS TOSCA TC",
+                         tosca.metadata.get("template_author"))
+        script = tosca.csar.extract_file("Scripts/WordPress/install.sh")
+        self.assertEqual(
+            os.path.join(tosca.base_dir, "Scripts/WordPress/install.sh"),
+            script)
+        self.assertTrue(os.path.isfile(script))
+        # imports read from the archive use the member's mtime
+        imported = os.path.join(tosca.base_dir, "Definitions/wordpress.yaml")
+        self.assertFalse(os.path.isfile(imported))
+        namespaces = tosca.topology_template.custom_defs.all_namespaces
+        self.assertIsNotNone(namespaces[imported].mtime)
+        self.assertEqual(archiveutils.getmtime(imported),
+                         namespaces[imported].mtime)
+
+    def test_csar_extracted_by_default(self):
+        csar_archive = utils.get_sample_test_path(
+            "data/CSAR/csar_wordpress.zip")
+        tosca = ToscaTemplate(csar_archive,
+                              parsed_params={"db_name": "mysql",
+                                             "db_user": "mysql",
+                                             "db_root_pwd": "1234",
+                                             "db_pwd": "5678",
+                                             "db_port": 3306,
+                                             "cpus": 4})
+        self.assertTrue(os.path.isfile(os.path.join(
+            tosca.base_dir, "Scripts/WordPress/install.sh")))
+
+    def test_csar_members_parsed_once(self):
+        csar_archive = utils.get_sample_test_path(
+            "data/CSAR/csar_wordpress.zip")
+        EntityType.TOSCA_DEF  # make sure the definitions are loaded
+        toscaparser.utils.yamlparser.yaml_cache.clear()
+        parse = self.useFixture(fixtures.MockPatch(
+            "yaml.load", wraps=yaml.load)).mock
+        ToscaTemplate(csar_archive,
+                      parsed_params={"db_name": "mysql",
+                                     "db_user": "mysql",
+                                     "db_root_pwd": "1234",
+                                     "db_pwd": "5678",
+                                     "db_port": 3306,
+                                     "cpus": 4})
+        # TOSCA.meta, the main template and its import
+        self.assertEqual(3, parse.call_count)
+        # each miss is a lookup that had to parse the document
+        self.assertEqual(3, toscaparser.utils.yamlparser.yaml_cache.misses)
+
+    def test_csar_extracted_to_base_dir(self):
+        csar_archive = utils.get_sample_test_path(
+            "data/CSAR/csar_wordpress.zip")
+        base_dir = self.useFixture(fixtures.TempDir()).path
+        ToscaTemplate(csar_archive, base_dir=base_dir,
+                      parsed_params={"db_name": "mysql",
+                                     "db_user": "mysql",
+                                     "db_root_pwd": "1234",
+                                     "db_pwd": "5678",
+                                     "db_port": 3306,
+                                     "cpus": 4})
+        self.assertTrue(os.path.isfile(os.path.join(
+            base_dir, "Scripts/WordPress/install.sh")))
+
     @mock.patch.object(requests, 'get')
     def test_csar_parsing_elk_url_based(self, mock_requests_get):
         csar_archive = 'https://example.com/csar_elk.zip'
@@ -948,6 +1036,83 @@ class ToscaTemplateTest(TestCase):
                                                              ['mem_size'],
                                                              '512 MB')
 
+    def test_lazy_node_templates(self):
+        self.useFixture(fixtures.MonkeyPatch(
+            "toscaparser.tosca_template.ToscaTemplate.lazy_node_templates",
+            True))
+        tosca = ToscaTemplate(self.tosca_tpl, parsed_params=self.params)
+        topology = tosca.topology_template
+        node_templates = topology.node_templates
+        self.assertIn('wordpress', node_templates)
+        self.assertFalse(node_templates.is_loaded('wordpress'))
+        self.assertEqual('tosca.nodes.WebApplication.WordPress',
+                         topology.get_node_template_type('wordpress'))
+        requirements = topology.get_node_template_requirements('wordpress')
+        self.assertEqual(['host', 'database_endpoint'],
+                         [list(req)[0] for req in requirements])
+        self.assertFalse(node_templates.is_loaded('wordpress'))
+
+        wordpress = node_templates['wordpress']
+        self.assertIs(wordpress, node_templates.get('wordpress'))
+        self.assertTrue(node_templates.is_loaded('wordpress'))
+        self.assertFalse(node_templates.is_loaded('server'))
+        # resolving explicit relationships only loads their targets
+        self.assertEqual('webserver',
+                         wordpress.relationships[0][0].target.name)
+        self.assertTrue(node_templates.is_loaded('webserver'))
+        self.assertFalse(node_templates.is_loaded('mysql_dbms'))
+
+        tosca.validate_node_templates()
+        self.assertTrue(all(node_templates.is_loaded(name)
+                            for name in node_templates))
+        self.assertEqual(sorted(self.tosca.topology_template.node_templates),
+                         sorted(node.name for node in tosca.nodetemplates))
+
+    def test_relationship_graph(self):
+        graph = ToscaGraph(self.tosca.nodetemplates)
+        names = [node.name for node in graph.topological_order()]
+        self.assertEqual(sorted(names), sorted(graph.vertices))
+        for node in graph:
+            for target in graph.targets(node):
+                self.assertLess(names.index(target.name),
+                                names.index(node.name))
+                self.assertIn(node, graph.sources(target))
+        self.assertEqual(list(reversed(names)),
+                         [node.name
+                          for node in graph.reverse_topological_order()])
+        self.assertEqual(['webserver', 'server'],
+                         [node.name for node in graph.hosted_on('wordpress')])
+        self.assertEqual(
+            {'webserver', 'server', 'mysql_database', 'mysql_dbms'},
+            graph.dependencies('wordpress'))
+        self.assertIs(graph.dependencies('wordpress'),
+                      graph.dependencies('wordpress'))
+        self.assertEqual({'wordpress', 'my_wordpress'},
+                         graph.dependents('webserver'))
+        self.assertEqual([], graph.cycles())
+
+    def test_relationship_graph_cycles(self):
+        tpl = {
+            'tosca_definitions_version': 'tosca_simple_yaml_1_3',
+            'topology_template': {'node_templates': {
+                'a': {'type': 'tosca.nodes.Root',
+                      'requirements': [{'dependency': 'b'}]},
+                'b': {'type': 'tosca.nodes.Root',
+                      'requirements': [{'dependency': 'c'}]},
+                'c': {'type': 'tosca.nodes.Root',
+                      'requirements': [{'dependency': 'a'}]},
+                'd': {'type': 'tosca.nodes.Root',
+                      'requirements': [{'dependency': 'a'}]},
+            }}}
+        tosca = ToscaTemplate(yaml_dict_tpl=tpl)
+        graph = ToscaGraph(tosca.nodetemplates)
+        cycles = graph.cycles()
+        self.assertEqual(1, len(cycles))
+        self.assertEqual({'a', 'b', 'c'}, {node.name for node in cycles[0]})
+        self.assertEqual('d', graph.topological_order()[-1].name)
+        self.assertEqual({'a', 'b', 'c'}, graph.dependencies('d'))
+        self.assertEqual({'a', 'b', 'c', 'd'}, graph.dependents('b'))
+
     def test_node_filter(self):
         tosca_tpl = utils.get_sample_test_path(
             "data/node_filter/test_node_filter.yaml")
@@ -1056,7 +1221,7 @@ class ToscaTemplateTest(TestCase):
             "data/test_attributes_inheritance.yaml")
         ToscaTemplate(tosca_tpl)
 
-    @mock.patch.object(urllib.request, 'urlopen')
+    @mock.patch.object(UrlUtils, 'open_url')
     def test_repositories_definition(self, mock_urlopen):
         tosca_tpl = utils.get_sample_test_path(
             "data/repositories/test_repositories_definition.yaml")
@@ -1219,3 +1384,242 @@ class ToscaTemplateTest(TestCase):
                 (t.tpl["topology_template"]["node_templates"]["wordpress"]
                     ["interfaces"]["Standard"]["configure"]["inputs"]).keys())
             self.assertEqual(expected, actual)
+
+
+class TypeRegistryTest(TestCase):
+    '''Types shared by templates importing the same files.'''
+
+    def setUp(self):
+        super(TypeRegistryTest, self).setUp()
+        EntityType.clear_registry()
+        self.addCleanup(EntityType.clear_registry)
+        tmpdir = self.useFixture(fixtures.TempDir()).path
+        self.lib = os.path.join(tmpdir, "lib.yaml")
+        with open(self.lib, "w") as f:
+            f.write("tosca_definitions_version: tosca_simple_yaml_1_3\n"
+                    "node_types:\n"
+                    "  Base:\n    derived_from: tosca.nodes.Root\n"
+                    "  Derived:\n    derived_from: Base\n")
+        self.main = os.path.join(tmpdir, "main.yaml")
+        with open(self.main, "w") as f:
+            f.write("tosca_definitions_version: tosca_simple_yaml_1_3\n"
+                    "imports:\n  - lib.yaml\n"
+                    "topology_template:\n  node_templates:\n"
+                    "    node:\n      type: Derived\n")
+
+    def _parent_type(self):
+        tosca = ToscaTemplate(self.main)
+        node = tosca.topology_template.node_templates["node"]
+        type_definition = node.type_definition
+        return type_definition.parent_types()[0]
+
+    def test_types_shared_across_templates(self):
+        parent = self._parent_type()
+        self.assertEqual("Base", parent.type)
+        self.assertIs(parent, self._parent_type())
+        nodes = [ToscaTemplate(self.main).topology_template.node_templates[
+            "node"] for i in range(2)]
+        self.assertIs(nodes[0].type_definition, nodes[1].type_definition)
+
+    def test_registry_does_not_keep_templates_alive(self):
+        tosca = ToscaTemplate(self.main)
+        namespace = weakref.ref(tosca.topology_template.custom_defs)
+        registry = entity_type.globals.registry
+        self.assertGreater(len(registry), 0)
+        # while a template uses a scope, later templates share its types
+        node = tosca.topology_template.node_templates["node"]
+        self.assertIs(node.type_definition.parent_types()[0],
+                      self._parent_type())
+        del tosca, node
+        EntityType.reset_caches()
+        gc.collect()
+        self.assertIsNone(namespace())
+        self.assertEqual(0, len(registry))
+
+    def test_shared_type_errors_reported_for_each_template(self):
+        with open(self.lib, "a") as f:
+            f.write("  Bad:\n    derived_from: Base\n"
+                    "    capabilities:\n      cap:\n"
+                    "        type: no.such.Capability\n")
+        with open(self.main, "a") as f:
+            f.write("    bad:\n      type: Bad\n")
+        for i in range(2):
+            error = self.assertRaises(exception.ValidationError,
+                                      ToscaTemplate, self.main)
+            self.assertIn('"no.such.Capability"', str(error))
+
+    def test_types_invalidated_when_import_changes(self):
+        parent = self._parent_type()
+        stat = os.stat(self.lib)
+        os.utime(self.lib, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        self.assertIsNot(parent, self._parent_type())
+
+    def test_types_not_shared_for_preparsed_templates(self):
+        tpl = toscaparser.utils.yamlparser.load_yaml(self.main)
+        tpl["node_types"] = {"Local": {"derived_from": "Derived"}}
+        tpl["topology_template"]["node_templates"]["node"]["type"] = "Local"
+        types = []
+        parents = []
+        for i in range(2):
+            tosca = ToscaTemplate(self.main, yaml_dict_tpl=copy.deepcopy(tpl))
+            node = tosca.topology_template.node_templates["node"]
+            types.append(node.type_definition)
+            parents.append(node.type_definition.parent_types()[0])
+        self.assertEqual("Derived", parents[0].type)
+        # types declared in a preparsed template are never shared
+        self.assertIsNot(types[0], types[1])
+        # but the types it imports from unchanged files are
+        self.assertIs(parents[0], parents[1])
+
+    def test_type_snapshot_shared_by_threads(self):
+        snapshot = TypeSnapshot.build([self.main])
+        sizes = [len(cache) for scope in snapshot._scopes.values()
+                 for cache in scope]
+        parents = []
+        errors = []
+
+        def parse():
+            try:
+                tosca = ToscaTemplate(self.main, type_snapshot=snapshot)
+                node = tosca.topology_template.node_templates["node"]
+                parents.append(node.type_definition.parent_types()[0])
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=parse) for i in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual([], errors)
+        self.assertEqual("Base", parents[0].type)
+        self.assertIs(parents[0], parents[1])
+        # threads add the types they resolve to their own registry
+        self.assertEqual(sizes, [len(cache)
+                                 for scope in snapshot._scopes.values()
+                                 for cache in scope])
+        # templates parsed without the snapshot don't use it
+        self.assertIsNot(parents[0], self._parent_type())
+
+    def test_type_snapshot_computed_when_taken(self):
+        snapshot = TypeSnapshot.build([self.main])
+        derived = [typedef for scope in snapshot._scopes.values()
+                   for typedef in scope[0].values()
+                   if typedef.type == "Derived"][0]
+        merge = self.useFixture(fixtures.MockPatchObject(
+            EntityType, "_merge_parent_value",
+            wraps=EntityType._merge_parent_value)).mock
+        tosca = ToscaTemplate(self.main, type_snapshot=snapshot)
+        node = tosca.topology_template.node_templates["node"]
+        self.assertIs(derived, node.type_definition)
+        self.assertEqual(["feature"], list(node.get_capabilities()))
+        merge.assert_not_called()
+        # and is read-only, the threads sharing it can't change it
+        self.assertRaises(TypeError, operator.setitem,
+                          derived.get_capabilities_def(), "feature", None)
+        self.assertRaises(TypeError, derived.get_all_requirements().append,
+                          {})
+
+    def test_compile_types(self):
+        self.useFixture(fixtures.MonkeyPatch(
+            "toscaparser.tosca_template.ToscaTemplate.compile_types", True))
+        tosca = ToscaTemplate(self.main)
+        custom_defs = tosca.topology_template.custom_defs
+        compiled = custom_defs.compile()
+        self.assertIs(compiled, custom_defs.compile())
+        derived = compiled["Derived"]
+        self.assertEqual("Derived", derived.type)
+        self.assertEqual(3, len(derived.ancestors))
+        self.assertEqual("tosca.nodes.Root", derived.ancestors[-1])
+        self.assertIn("feature", derived["capabilities"])
+        self.assertEqual(["dependency"],
+                         [list(req)[0] for req in derived["requirements"]])
+        self.assertRaises(TypeError, operator.setitem,
+                          derived["capabilities"], "feature", {})
+        # the compiled types are the ones used by the templates
+        self.assertIs(derived.typedef,
+                      EntityType.find_type("Derived", custom_defs))
+        # compile again after the namespace changes
+        custom_defs["Other"] = {"derived_from": "Derived"}
+        self.assertIn("Other", custom_defs.compile())
+
+
+class ImportPrefetchTest(TestCase):
+    '''Imports fetched from a local HTTP server.'''
+
+    DOCS = {
+        "main.yaml": "tosca_definitions_version: tosca_simple_yaml_1_3\n"
+                     "imports:\n  - a.yaml\n  - b.yaml\n"
+                     "topology_template:\n  node_templates: {}\n",
+        "a.yaml": "tosca_definitions_version: tosca_simple_yaml_1_3\n"
+                  "imports:\n  - c.yaml\n"
+                  "node_types:\n  A:\n    derived_from: C\n",
+        "b.yaml": "tosca_definitions_version: tosca_simple_yaml_1_3\n"
+                  "node_types:\n  B:\n    derived_from: tosca.nodes.Root\n",
+        "c.yaml": "tosca_definitions_version: tosca_simple_yaml_1_3\n"
+                  "node_types:\n  C:\n    derived_from: tosca.nodes.Root\n",
+    }
+
+    def setUp(self):
+        super(ImportPrefetchTest, self).setUp()
+        docroot = self.useFixture(fixtures.TempDir()).path
+        for name, contents in self.DOCS.items():
+            with open(os.path.join(docroot, name), "w") as f:
+                f.write(contents)
+        self.requests = []
+        # if set, requests for these documents wait for each other
+        self.barrier = None
+        self.barrier_paths = ()
+        lock = threading.Lock()
+        test = self
+
+        class Handler(http.server.SimpleHTTPRequestHandler):
+            def do_GET(self):
+                with lock:
+                    test.requests.append(self.path)
+                if test.barrier and self.path in test.barrier_paths:
+                    test.barrier.wait()
+                super(Handler, self).do_GET()
+
+            def log_message(self, *args):
+                pass
+
+        server = http.server.ThreadingHTTPServer(
+            ("127.0.0.1", 0), functools.partial(Handler, directory=docroot))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.url = "http://127.0.0.1:%s/main.yaml" % server.server_port
+        self.useFixture(fixtures.EnvironmentVariable("no_proxy", "*"))
+
+    def test_imports_prefetched_concurrently(self):
+        # a.yaml and b.yaml are only served once both have been requested
+        self.barrier = threading.Barrier(2, timeout=30)
+        self.barrier_paths = ("/a.yaml", "/b.yaml")
+        tosca = ToscaTemplate(self.url, a_file=False)
+        self.assertIn("A", tosca.topology_template.custom_defs)
+        self.assertIn("C", tosca.topology_template.custom_defs)
+        # each import is only fetched once
+        self.assertEqual(["/a.yaml", "/b.yaml", "/c.yaml", "/main.yaml"],
+                         sorted(self.requests))
+        # sibling imports are fetched at the same time
+        self.assertFalse(self.barrier.broken)
+
+    def test_prefetch_disabled(self):
+        self.useFixture(fixtures.MockPatchObject(
+            imports.ImportResolver, "prefetch_workers", 0))
+        tosca = ToscaTemplate(self.url, a_file=False)
+        self.assertIn("A", tosca.topology_template.custom_defs)
+        self.assertEqual(["/main.yaml", "/a.yaml", "/c.yaml", "/b.yaml"],
+                         self.requests)
+
+    def test_prefetch_only_by_default_for_builtin_load_yaml(self):
+        class Resolver(imports.ImportResolver):
+            def load_yaml(self, path, fragment, ctx):
+                return super(Resolver, self).load_yaml(path, fragment, ctx)
+
+        self.assertEqual(8, imports.ImportResolver().get_prefetch_workers())
+        self.assertEqual(0, Resolver().get_prefetch_workers())
+        resolver = Resolver()
+        resolver.prefetch_workers = 2
+        self.assertEqual(2, resolver.get_prefetch_workers())
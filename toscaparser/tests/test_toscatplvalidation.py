@@ -11,7 +11,6 @@
 #    under the License.
 
 from unittest import mock
-import urllib
 
 from toscaparser.common import exception
 from toscaparser.imports import ImportsLoader
@@ -30,6 +29,7 @@ from toscaparser.topology_template import TopologyTemplate
 from toscaparser.tosca_template import ToscaTemplate
 from toscaparser.triggers import Triggers
 from toscaparser.utils.gettextutils import _
+from toscaparser.utils.urlutils import UrlUtils
 import toscaparser.utils.yamlparser
 from testtools.testcase import skip
 EntityTemplate.additionalProperties = False
@@ -379,7 +379,7 @@ class ToscaTemplateValidationTest(TestCase):
                                 tpl_snippet, path, None)
         self.assertEqual(errormsg, err.__str__())
 
-    @mock.patch.object(urllib.request, 'urlopen')
+    @mock.patch.object(UrlUtils, 'open_url')
     def test_imports_without_import_name(self, mock_urlopen):
         tpl_snippet = '''
         imports:
@@ -398,7 +398,7 @@ class ToscaTemplateValidationTest(TestCase):
                                                  "node_types")
         self.assertTrue(custom_defs)
 
-    @mock.patch.object(urllib.request, 'urlopen')
+    @mock.patch.object(UrlUtils, 'open_url')
     def test_imports_wth_import_name(self, mock_urlopen):
         tpl_snippet = '''
         imports:
@@ -447,7 +447,7 @@ tosca-parser/master/toscaparser/tests/data/custom_types/wordpress.yaml
                                 tpl_snippet, None, None)
         self.assertEqual(errormsg, err.__str__())
 
-    @mock.patch.object(urllib.request, 'urlopen')
+    @mock.patch.object(UrlUtils, 'open_url')
     def test_imports_duplicate_name(self, mock_urlopen):
         tpl_snippet = '''
         imports:
@@ -485,7 +485,7 @@ tosca-parser/master/toscaparser/tests/data/custom_types/wordpress.yaml
                                 tpl_snippet, path, None)
         self.assertEqual(errormsg, err.__str__())
 
-    @mock.patch.object(urllib.request, 'urlopen')
+    @mock.patch.object(UrlUtils, 'open_url')
     @mock.patch.object(ToscaTemplate, '_tpl_imports')
     def test_imports_file_with_uri(self, mock_tpl_imports, mock_urlopen):
         tpl_snippet = '''
@@ -509,7 +509,7 @@ tosca-parser/master/toscaparser/tests/data/custom_types/wordpress.yaml
         self.assertTrue(custom_defs.get("tosca.nodes."
                                         "WebApplication.WordPress"))
 
-    @mock.patch.object(urllib.request, 'urlopen')
+    @mock.patch.object(UrlUtils, 'open_url')
     def test_imports_file_namespace_fields(self, mock_urlopen):
         tpl_snippet = '''
         imports:
@@ -532,7 +532,7 @@ tosca-parser/master/toscaparser/tests/data/custom_types/wordpress.yaml
                                         "WebApplication.WordPress"))
 
     @skip("local_defs not implemented")
-    @mock.patch.object(urllib.request, 'urlopen')
+    @mock.patch.object(UrlUtils, 'open_url')
     def test_imports_with_local_defs(self, mock_urlopen):
         """Compare custom types on local and remote."""
 
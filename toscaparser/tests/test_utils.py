@@ -10,7 +10,16 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
+import http.server
+import os
+import threading
+import urllib.error
+
+import fixtures
+
 from toscaparser.tests.base import TestCase
+from toscaparser.utils import diskcache
 import toscaparser.utils.urlutils
 import toscaparser.utils.yamlparser
 
@@ -46,3 +55,332 @@ class UrlUtilsTest(TestCase):
             self.url_utils.join_url("http://github.com/proj1/scripts",
                                     "scripts/b.js"),
             "http://github.com/proj1/scripts/b.js")
+
+
+class UrlFetcherTest(TestCase):
+
+    def setUp(self):
+        super(UrlFetcherTest, self).setUp()
+        self.requests = []
+        self.heads = []
+        test = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                test.requests.append(
+                    (self.path, self.headers.get("If-None-Match")))
+                if self.path == "/flaky" and len(test.requests) == 1:
+                    self.send_response(503)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                elif self.path == "/missing":
+                    self.send_error(404)
+                elif self.headers.get("Range") == "bytes=0-0":
+                    self.send_response(206)
+                    self.send_header("Content-Length", "1")
+                    self.end_headers()
+                    self.wfile.write(b"a")
+                elif self.headers.get("If-None-Match") == '"v1"':
+                    self.send_response(304)
+                    self.end_headers()
+                else:
+                    body = b"a: 1\n"
+                    self.send_response(200)
+                    self.send_header("ETag", '"v1"')
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+            def do_HEAD(self):
+                test.heads.append(self.path)
+                if self.path == "/nohead":
+                    self.send_response(405)
+                elif self.path == "/unavailable":
+                    self.send_response(503)
+                elif self.path == "/missing":
+                    self.send_response(404)
+                else:
+                    self.send_response(200)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.base_url = "http://127.0.0.1:%s" % server.server_port
+        self.useFixture(fixtures.EnvironmentVariable("no_proxy", "*"))
+        self.useFixture(fixtures.MonkeyPatch(
+            "toscaparser.utils.diskcache._disabled", True))
+        self.fetcher = toscaparser.utils.urlutils.UrlFetcher(
+            backoff_factor=0)
+
+    def test_revalidates_with_etag(self):
+        url = self.base_url + "/doc.yaml"
+        self.assertEqual(b"a: 1\n", self.fetcher.fetch(url))
+        self.assertEqual(b"a: 1\n", self.fetcher.fetch(url))
+        self.assertEqual([("/doc.yaml", None), ("/doc.yaml", '"v1"')],
+                         self.requests)
+
+    def test_retries_server_errors(self):
+        self.assertEqual(b"a: 1\n",
+                         self.fetcher.fetch(self.base_url + "/flaky"))
+        self.assertEqual(2, len(self.requests))
+
+    def test_http_error(self):
+        error = self.assertRaises(urllib.error.HTTPError, self.fetcher.fetch,
+                                  self.base_url + "/missing")
+        self.assertEqual(404, error.code)
+
+    def test_is_accessible_uses_head(self):
+        url = self.base_url + "/doc.yaml"
+        self.assertTrue(self.fetcher.is_accessible(url))
+        self.assertTrue(self.fetcher.is_accessible(url))
+        self.assertFalse(self.fetcher.is_accessible(
+            self.base_url + "/missing"))
+        self.assertEqual(["/doc.yaml", "/missing"], self.heads)
+        self.assertEqual([], self.requests)
+
+    def test_is_accessible_does_not_cache_failures(self):
+        fetcher = toscaparser.utils.urlutils.UrlFetcher(retries=0)
+        url = self.base_url + "/unavailable"
+        self.assertFalse(fetcher.is_accessible(url))
+        self.assertFalse(fetcher.is_accessible(url))
+        self.assertEqual(["/unavailable", "/unavailable"], self.heads)
+        # nothing listens on the port of a closed server
+        server = http.server.HTTPServer(("127.0.0.1", 0),
+                                        http.server.BaseHTTPRequestHandler)
+        server.server_close()
+        url = "http://127.0.0.1:%s/doc.yaml" % server.server_port
+        self.assertFalse(fetcher.is_accessible(url, timeout=5))
+        self.assertEqual({}, fetcher._accessible)
+
+    def test_is_accessible_falls_back_to_range_request(self):
+        self.assertTrue(self.fetcher.is_accessible(self.base_url + "/nohead"))
+        self.assertEqual([("/nohead", None)], self.requests)
+
+    def test_check_urls(self):
+        self.useFixture(fixtures.MockPatchObject(
+            toscaparser.utils.urlutils, "url_fetcher", self.fetcher))
+        urls = [self.base_url + path
+                for path in ("/a", "/missing", "/b", "/a")]
+        self.assertEqual({urls[0]: True, urls[1]: False, urls[2]: True},
+                         toscaparser.utils.urlutils.UrlUtils.check_urls(urls))
+        self.assertEqual(3, len(self.heads))
+
+
+class OrderedParseTest(TestCase):
+
+    yamlparser = toscaparser.utils.yamlparser
+
+    def test_simple_ordered_parse(self):
+        tpl = self.yamlparser.simple_ordered_parse("b: 1\na: {d: 2, c: 3}\n")
+        self.assertEqual(["b", "a"], list(tpl))
+        self.assertEqual(["d", "c"], list(tpl["a"]))
+        self.assertIsInstance(tpl["a"], collections.OrderedDict)
+        self.assertEqual({}, self.yamlparser.simple_ordered_parse(""))
+
+    def test_ordered_parse_is_safe(self):
+        self.assertRaises(ValueError, self.yamlparser.simple_ordered_parse,
+                          "a: !!python/object/apply:os.getcwd []")
+
+    def test_source_positions(self):
+        positions = self.yamlparser.SourcePositions()
+        tpl = self.yamlparser.simple_ordered_parse(
+            "a:\n  b:\n    c: 1\n", positions)
+        self.assertEqual(3, len(positions))
+        self.assertEqual((1, 1), positions.get(tpl))
+        self.assertEqual((2, 3), positions.get(tpl["a"]))
+        self.assertEqual((3, 5), positions.get(tpl["a"]["b"]))
+        self.assertIsNone(positions.get({}))
+
+    def test_object_pairs_hook(self):
+        tpl = self.yamlparser.ordered_load("b: 1\na: 2\n",
+                                           object_pairs_hook=dict)
+        self.assertEqual(dict, type(tpl))
+        self.assertEqual(["b", "a"], list(tpl))
+
+
+class YamlCacheTest(TestCase):
+
+    def setUp(self):
+        super(YamlCacheTest, self).setUp()
+        toscaparser.utils.yamlparser.yaml_cache.clear()
+        self.path = os.path.join(self.useFixture(fixtures.TempDir()).path,
+                                 "types.yaml")
+        with open(self.path, "w") as f:
+            f.write("node_types:\n  A:\n    derived_from: tosca.nodes.Root\n")
+
+    def test_load_yaml_returns_private_copies(self):
+        cache = toscaparser.utils.yamlparser.yaml_cache
+        doc = YAML_LOADER(self.path)
+        doc["node_types"]["A"]["_source"] = "mutated"
+        doc2 = YAML_LOADER(self.path)
+        self.assertEqual(1, cache.hits)
+        self.assertNotIn("_source", doc2["node_types"]["A"])
+        self.assertIsNot(doc["node_types"], doc2["node_types"])
+
+    def test_load_yaml_invalidates_on_change(self):
+        YAML_LOADER(self.path)
+        stat = os.stat(self.path)
+        with open(self.path, "w") as f:
+            f.write("node_types:\n  B:\n    derived_from: tosca.nodes.Root\n")
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        self.assertIn("B", YAML_LOADER(self.path)["node_types"])
+
+    def test_lru_eviction(self):
+        cache = toscaparser.utils.yamlparser.YamlCache(max_bytes=250)
+        cache.put("a", 1, {"a": "x" * 80})
+        cache.put("b", 1, {"b": "x" * 80})
+        self.assertEqual({"a": "x" * 80}, cache.get("a", 1))
+        cache.put("c", 1, {"c": "x" * 80})
+        # "b" was least recently used
+        self.assertIsNone(cache.get("b", 1))
+        self.assertIsNotNone(cache.get("a", 1))
+        self.assertLessEqual(cache.size, 250)
+        self.assertIsNone(cache.get("a", 2))
+
+    def test_link(self):
+        cache = toscaparser.utils.yamlparser.YamlCache()
+        cache.put("a", 1, {"a": 1})
+        self.assertTrue(cache.link("a", 1, "b", 2))
+        self.assertFalse(cache.link("a", 2, "c", 2))
+        self.assertEqual((0, 0), (cache.hits, cache.misses))
+        self.assertEqual({"a": 1}, cache.get("b", 2))
+        self.assertEqual({"a": 1}, cache.get("a", 1))
+        self.assertIsNone(cache.get("c", 2))
+
+
+class DiskCacheTest(TestCase):
+
+    def setUp(self):
+        super(DiskCacheTest, self).setUp()
+        tempdir = self.useFixture(fixtures.TempDir()).path
+        self.path = os.path.join(tempdir, "types.yaml")
+        with open(self.path, "w") as f:
+            f.write("node_types:\n  A:\n    derived_from: tosca.nodes.Root\n")
+        self.useFixture(fixtures.MonkeyPatch(
+            "toscaparser.utils.diskcache._disk_cache", None))
+        self.useFixture(fixtures.MonkeyPatch(
+            "toscaparser.utils.diskcache._disabled", False))
+        self.cache = diskcache.enable_disk_cache(
+            os.path.join(tempdir, "cache"))
+        toscaparser.utils.yamlparser.yaml_cache.clear()
+
+    def test_load_yaml_uses_disk_cache(self):
+        doc = YAML_LOADER(self.path)
+        self.assertEqual(dict(misses=1, writes=1, entries=1),
+                         {k: self.cache.stats()[k]
+                          for k in ("misses", "writes", "entries")})
+        # simulate a new process
+        toscaparser.utils.yamlparser.yaml_cache.clear()
+        self.assertEqual(doc, YAML_LOADER(self.path))
+        self.assertEqual(1, self.cache.hits)
+
+    def test_disk_cache_eviction(self):
+        self.cache.max_bytes = 300
+        for i in range(5):
+            self.cache.put("key%s" % i, {"a": "x" * 100})
+        stats = self.cache.stats()
+        self.assertLessEqual(stats["size"], 300)
+        self.assertGreater(stats["evictions"], 0)
+        self.assertIsNotNone(self.cache.get("key4"))
+
+    def test_kill_switch(self):
+        self.useFixture(fixtures.EnvironmentVariable(diskcache.NO_CACHE_ENV,
+                                                     "1"))
+        self.assertIsNone(diskcache.get_disk_cache())
+        YAML_LOADER(self.path)
+        self.assertEqual(0, self.cache.stats()["entries"])
+
+    def test_clear_resets_stats(self):
+        self.cache.put("key", {"a": 1})
+        self.cache.get("key")
+        self.cache.clear()
+        self.assertEqual(dict(hits=0, misses=0, writes=0, evictions=0,
+                              entries=0, size=0), self.cache.stats())
+
+    def test_max_bytes_from_env(self):
+        self.useFixture(fixtures.EnvironmentVariable(
+            diskcache.CACHE_MAX_BYTES_ENV, "1000"))
+        cache = diskcache.enable_disk_cache(self.cache.directory)
+        self.assertEqual(1000, cache.max_bytes)
+
+    def test_unsafe_directory_is_not_used(self):
+        os.makedirs(self.cache.directory)
+        os.chmod(self.cache.directory, 0o777)
+        self.assertFalse(self.cache.is_safe())
+        self.assertFalse(self.cache.put("key", {"a": 1}))
+        self.assertIsNone(self.cache.get("key"))
+
+    def test_directory_is_private(self):
+        self.assertTrue(self.cache.is_safe())
+        mode = os.stat(self.cache.directory).st_mode
+        self.assertEqual(0o700, mode & 0o777)
+
+    def test_failed_write_removes_temp_file(self):
+        self.useFixture(fixtures.MockPatch("os.replace",
+                                           side_effect=OSError("full")))
+        self.assertFalse(self.cache.put("key", {"a": 1}))
+        self.assertEqual([], os.listdir(self.cache.directory))
+
+
+class SnapshotTest(TestCase):
+
+    def setUp(self):
+        super(SnapshotTest, self).setUp()
+        tempdir = self.useFixture(fixtures.TempDir()).path
+        self.path = os.path.join(tempdir, "types.yaml")
+        with open(self.path, "w") as f:
+            f.write("node_types:\n  A:\n    derived_from: tosca.nodes.Root\n")
+        self.cache_dir = os.path.join(tempdir, "cache")
+        self.useFixture(fixtures.EnvironmentVariable(diskcache.CACHE_DIR_ENV,
+                                                     self.cache_dir))
+        # the snapshot is written even though the disk cache is disabled
+        self.useFixture(fixtures.MonkeyPatch(
+            "toscaparser.utils.diskcache._disk_cache", None))
+        self.useFixture(fixtures.MonkeyPatch(
+            "toscaparser.utils.diskcache._disabled", False))
+        self.loaded = []
+
+    def load(self, path):
+        self.loaded.append(path)
+        with open(path) as f:
+            return toscaparser.utils.yamlparser.simple_parse(f.read())
+
+    def test_parsed_once(self):
+        doc = diskcache.load_snapshot(self.path, self.load)
+        self.assertEqual(["types.yaml" + diskcache.SNAPSHOT_SUFFIX],
+                         os.listdir(self.cache_dir))
+        self.assertEqual(doc, diskcache.load_snapshot(self.path, self.load))
+        self.assertEqual([self.path], self.loaded)
+
+    def test_stale_snapshot_is_not_used(self):
+        diskcache.load_snapshot(self.path, self.load)
+        with open(self.path, "w") as f:
+            f.write("node_types:\n  B:\n    derived_from: tosca.nodes.Root\n")
+        doc = diskcache.load_snapshot(self.path, self.load)
+        self.assertIn("B", doc["node_types"])
+        self.assertEqual(2, len(self.loaded))
+        diskcache.load_snapshot(self.path, self.load)
+        self.assertEqual(2, len(self.loaded))
+
+    def test_snapshot_next_to_file(self):
+        doc = self.load(self.path)
+        self.assertTrue(diskcache.write_snapshot(self.path, doc))
+        self.assertEqual(doc, diskcache.load_snapshot(self.path, self.load))
+        self.assertEqual(1, len(self.loaded))
+        self.assertEqual([], os.listdir(self.cache_dir))
+
+    def test_kill_switch(self):
+        self.useFixture(fixtures.EnvironmentVariable(diskcache.NO_CACHE_ENV,
+                                                     "1"))
+        diskcache.load_snapshot(self.path, self.load)
+        diskcache.load_snapshot(self.path, self.load)
+        self.assertEqual(2, len(self.loaded))
+        self.assertFalse(os.path.exists(self.cache_dir))
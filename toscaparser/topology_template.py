@@ -17,6 +17,8 @@ from toscaparser.common import exception
 from toscaparser.dataentity import DataEntity
 from toscaparser import functions
 from toscaparser.groups import Group
+from toscaparser.node_filter import PropertyFilter
+from toscaparser.node_filter import PropertyIndex
 from toscaparser.nodetemplate import NodeTemplate
 from toscaparser.parameters import Output
 from toscaparser.policy import Policy
@@ -46,6 +48,276 @@ SECTIONS = (DESCRIPTION, INPUTS, NODE_TEMPLATES,
 log = logging.getLogger("tosca.model")
 
 
+class _NodeTemplateIndex(object):
+    '''Indexes node templates by type and by capability.
+
+    Each template is indexed by the names of its type and the type's
+    ancestors and by the names and the (ancestor) type names of its
+    capabilities. Templates are also indexed by the value of a property
+    the first time a node_filter on that property is looked up (see
+    PropertyIndex). Lookups return the templates in the order they were
+    added to the topology.
+    '''
+
+    def __init__(self):
+        self.nodes = {}  # template name => template
+        self.positions = {}  # template name => order it was first added
+        self.by_type = {}  # type name => {template name: None}
+        # capability or type name => {template name: None}
+        self.by_capability = {}
+        self.by_property = {}  # property name => PropertyIndex
+        self.first_of_type = {}  # type name => first template of that type
+
+    def add(self, node):
+        self.remove(node.name)
+        self.first_of_type.clear()
+        self.nodes[node.name] = node
+        self.positions.setdefault(node.name, len(self.positions))
+        types = {node.type}
+        if node.type_definition:
+            types.update(node.type_definition.ancestor_names())
+        for name in types:
+            self.by_type.setdefault(name, {})[node.name] = None
+        for cap in node.get_capabilities_objects():
+            names = {cap.name, cap.type}
+            if cap.type_definition:
+                names.update(cap.type_definition.ancestor_names())
+            for name in names:
+                self.by_capability.setdefault(name, {})[node.name] = None
+        for index in self.by_property.values():
+            index.add(node)
+
+    def remove(self, name):
+        if self.nodes.pop(name, None) is not None:
+            self.first_of_type.clear()
+            for index in (self.by_type, self.by_capability):
+                for names in index.values():
+                    names.pop(name, None)
+            # rebuilt on next use
+            self.by_property = {}
+
+    def get_property_index(self, name):
+        index = self.by_property.get(name)
+        if index is None:
+            index = self.by_property[name] = PropertyIndex(name)
+            for node in self.nodes.values():
+                index.add(node)
+        return index
+
+    def find_names(self, index, keys):
+        found = set()
+        for key in keys:
+            found.update(index.get(key, ()))
+        return found
+
+    def find(self, index, keys):
+        return self.get_nodes(self.find_names(index, keys))
+
+    def find_first(self, name):
+        """Return the first template named or derived from the type name."""
+        node = self.nodes.get(name)
+        if name not in self.first_of_type:
+            names = self.by_type.get(name)
+            self.first_of_type[name] = names and self.nodes[
+                min(names, key=self.positions.__getitem__)]
+        first = self.first_of_type[name]
+        if node is None or (
+                first and self.positions[first.name] < self.positions[name]):
+            return first or None
+        return node
+
+    def get_nodes(self, names):
+        return [self.nodes[name]
+                for name in sorted(names, key=self.positions.__getitem__)]
+
+
+class _NotLoaded(object):
+    def __repr__(self):
+        return "<node template not loaded>"
+
+
+_NOT_LOADED = _NotLoaded()
+
+
+class _NodeTemplates(dict):
+    '''Maps names to node templates and keeps a _NodeTemplateIndex of them.
+
+    The index is built on first use and updated as templates are added,
+    other changes drop it so it is rebuilt when next used.
+
+    If created with lazy(), the node templates are only created and
+    validated when they are first accessed.
+    '''
+
+    _index = None
+    _topology = None  # set if templates are loaded lazily
+    _not_loaded = 0
+
+    @classmethod
+    def lazy(cls, topology, names):
+        node_templates = cls.fromkeys(names, _NOT_LOADED)
+        node_templates._topology = topology
+        node_templates._not_loaded = len(node_templates)
+        return node_templates
+
+    def is_loaded(self, name):
+        return dict.get(self, name, _NOT_LOADED) is not _NOT_LOADED
+
+    def _load(self, name):
+        topology = self._topology
+        node = NodeTemplate(name, topology, topology.custom_defs,
+                            topology.relationship_templates)
+        node.validate(topology)
+        self[name] = node
+        return node
+
+    def __getitem__(self, name):
+        node = dict.__getitem__(self, name)
+        if node is _NOT_LOADED:
+            return self._load(name)
+        return node
+
+    def get(self, name, default=None):
+        if self._not_loaded and name in self:
+            return self[name]
+        return dict.get(self, name, default)
+
+    def values(self):
+        if self._not_loaded:
+            return [self[name] for name in list(self)]
+        return dict.values(self)
+
+    def items(self):
+        if self._not_loaded:
+            return [(name, self[name]) for name in list(self)]
+        return dict.items(self)
+
+    def copy(self):
+        return dict(self.items())
+
+    def index(self):
+        if self._index is None:
+            index = _NodeTemplateIndex()
+            for node in self.values():
+                index.add(node)
+            self._index = index
+        return self._index
+
+    def __setitem__(self, name, node):
+        if self._not_loaded and dict.get(self, name) is _NOT_LOADED:
+            self._not_loaded -= 1
+        dict.__setitem__(self, name, node)
+        if self._index is not None:
+            if node.name == name:
+                self._index.add(node)
+            else:
+                self._index = None
+
+    def update(self, *args, **kw):
+        for name, node in dict(*args, **kw).items():
+            self[name] = node
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def setdefault(self, name, node=None):
+        if name not in self:
+            self[name] = node
+        return self[name]
+
+    def __delitem__(self, name):
+        self._index = None
+        if dict.get(self, name) is _NOT_LOADED:
+            self._not_loaded -= 1
+        dict.__delitem__(self, name)
+
+    def pop(self, name, *default):
+        self._index = None
+        if name in self:
+            node = self[name]
+            dict.__delitem__(self, name)
+            return node
+        return dict.pop(self, name, *default)
+
+    def popitem(self):
+        if not self:
+            raise KeyError('popitem(): dictionary is empty')
+        name = next(reversed(self))
+        return name, self.pop(name)
+
+    def clear(self):
+        self._index = None
+        self._not_loaded = 0
+        dict.clear(self)
+
+
+class _NamedList(list):
+    '''A list of inputs or outputs that can be looked up by name.
+
+    The map of names is built on first use and dropped whenever the list
+    is modified.
+    '''
+
+    _by_name = None
+
+    def get(self, name):
+        if self._by_name is None:
+            by_name = {}
+            for item in self:
+                by_name.setdefault(item.name, item)  # the first one wins
+            self._by_name = by_name
+        return self._by_name.get(name)
+
+    def __setitem__(self, index, item):
+        self._by_name = None
+        list.__setitem__(self, index, item)
+
+    def __delitem__(self, index):
+        self._by_name = None
+        list.__delitem__(self, index)
+
+    def __iadd__(self, items):
+        self._by_name = None
+        return list.__iadd__(self, items)
+
+    def __imul__(self, count):
+        self._by_name = None
+        return list.__imul__(self, count)
+
+    def append(self, item):
+        self._by_name = None
+        list.append(self, item)
+
+    def extend(self, items):
+        self._by_name = None
+        list.extend(self, items)
+
+    def insert(self, index, item):
+        self._by_name = None
+        list.insert(self, index, item)
+
+    def pop(self, index=-1):
+        self._by_name = None
+        return list.pop(self, index)
+
+    def remove(self, item):
+        self._by_name = None
+        list.remove(self, item)
+
+    def clear(self):
+        self._by_name = None
+        list.clear(self)
+
+    def reverse(self):
+        self._by_name = None
+        list.reverse(self)
+
+    def sort(self, *args, **kw):
+        self._by_name = None
+        list.sort(self, *args, **kw)
+
+
 class TopologyTemplate(object):
     processIntrinsicFunctions = False
 
@@ -55,6 +327,7 @@ class TopologyTemplate(object):
                  tosca_template=None):
         self.tpl = template or {}
         self.tosca_template = tosca_template
+        self.lazy = getattr(tosca_template, 'lazy_node_templates', False)
         self.custom_defs = custom_defs
         self.parsed_params = parsed_params
         self._validate_field()
@@ -66,17 +339,51 @@ class TopologyTemplate(object):
         self.groups = self._groups()
         self.policies = self._policies()
         self.workflows = self._workflows()
-        if not exception.ExceptionCollector.exceptionsCaught():
-            if self.processIntrinsicFunctions:
-                self._process_intrinsic_functions()
-            else:
-                self._validate_intrinsic_functions()
+        if (not self.lazy
+                and not exception.ExceptionCollector.exceptionsCaught()):
+            self._intrinsic_functions()
 
         self.substitution_mappings = None
         tpl_substitution_mapping = self._tpl_substitution_mappings()
         if tpl_substitution_mapping:
             self.substitution_mappings = SubstitutionMappings(tpl_substitution_mapping, self)
 
+    @property
+    def node_templates(self):
+        return self._node_templates
+
+    @node_templates.setter
+    def node_templates(self, node_templates):
+        if not isinstance(node_templates, _NodeTemplates):
+            node_templates = _NodeTemplates(node_templates)
+        self._node_templates = node_templates
+
+    @property
+    def inputs(self):
+        return self._inputs_list
+
+    @inputs.setter
+    def inputs(self, inputs):
+        if not isinstance(inputs, _NamedList):
+            inputs = _NamedList(inputs)
+        self._inputs_list = inputs
+
+    @property
+    def outputs(self):
+        return self._outputs_list
+
+    @outputs.setter
+    def outputs(self, outputs):
+        if not isinstance(outputs, _NamedList):
+            outputs = _NamedList(outputs)
+        self._outputs_list = outputs
+
+    def _intrinsic_functions(self):
+        if self.processIntrinsicFunctions:
+            self._process_intrinsic_functions()
+        else:
+            self._validate_intrinsic_functions()
+
     def copy(self):
         return TopologyTemplate(self.tpl, self.custom_defs, self.parsed_params, self.tosca_template)
 
@@ -109,6 +416,8 @@ class TopologyTemplate(object):
     def _nodetemplates(self):
         nodetemplates = {}
         tpls = self._tpl_nodetemplates()
+        if tpls and self.lazy:
+            return _NodeTemplates.lazy(self, tpls)
         if tpls:
             for name in tpls:
                 tpl = NodeTemplate(
@@ -124,7 +433,34 @@ class TopologyTemplate(object):
                 #       bool(tpl.custom_def)))):
                 tpl.validate(self)
                 nodetemplates[name] = tpl
-        return nodetemplates
+        return _NodeTemplates(nodetemplates)
+
+    def load_node_templates(self):
+        '''Create and validate the node templates that haven't been loaded yet.
+
+        When the node templates are loaded lazily this also runs the
+        validation that is otherwise done when the topology is created.
+        '''
+        self.node_templates.values()
+        if self.lazy and not exception.ExceptionCollector.exceptionsCaught():
+            self._intrinsic_functions()
+
+    def _get_node_template_tpl(self, name):
+        if not self.node_templates.is_loaded(name):
+            return self._tpl_nodetemplates()[name]
+        return self.node_templates[name].entity_tpl
+
+    def get_node_template_type(self, name):
+        '''Return the type of the named node template without loading it.'''
+        return self._get_node_template_tpl(name).get('type')
+
+    def get_node_template_requirements(self, name):
+        '''Return the named node template's requirements without loading it.'''
+        return self._get_node_template_tpl(name).get('requirements') or []
+
+    def get_node_template_directives(self, name):
+        '''Return the named node template's directives without loading it.'''
+        return self._get_node_template_tpl(name).get('directives', [])
 
     def add_node_template(self, name, tpl, get_relationships=True):
         # if name in self.node_templates:
@@ -147,6 +483,59 @@ class TopologyTemplate(object):
         self.node_templates[name] = node
         return node
 
+    def find_node_templates(self, nodetype=None, capabilities=None,
+                            node_filter=None):
+        '''Return the node templates that might match a requirement.
+
+        If nodetype is set, only templates of that type (or derived from it)
+        are returned. If capabilities is set, only templates with a capability
+        whose name or type (or a type it is derived from) is in capabilities
+        are returned. If node_filter is set, templates whose properties can't
+        match its property conditions are left out. The templates still need
+        to be matched against the requirement, this just narrows down the
+        candidates.
+        '''
+        index = self.node_templates.index()
+        if nodetype:
+            candidates = index.find(index.by_type, (nodetype,))
+            if capabilities is not None:
+                matching = set(index.find_names(index.by_capability,
+                                                capabilities))
+                candidates = [node for node in candidates
+                              if node.name in matching]
+        elif capabilities is not None:
+            candidates = index.find(index.by_capability, capabilities)
+        else:
+            candidates = None
+        if node_filter and node_filter.get('properties'):
+            compiled = PropertyFilter.get_compiled(node_filter)
+            matching = compiled.find_candidates(index)
+            if matching is not None:
+                if candidates is None:
+                    return index.get_nodes(matching)
+                return [node for node in candidates if node.name in matching]
+        if candidates is None:
+            return list(self.node_templates.values())
+        return candidates
+
+    def find_node_template(self, name):
+        '''Return the first node template named or derived from name.
+
+        A template whose type is (or is derived from) name is returned if it
+        comes before the template named name. Returns None if there isn't one.
+        '''
+        if not isinstance(name, str):
+            return None
+        return self.node_templates.index().find_first(name)
+
+    def get_input(self, name):
+        '''Return the input named name or None if it isn't declared.'''
+        return self.inputs.get(name)
+
+    def get_output(self, name):
+        '''Return the output named name or None if it isn't declared.'''
+        return self.outputs.get(name)
+
     def add_relationship_template(self, name, tpl):
         self.tpl.setdefault(RELATIONSHIP_TEMPLATES, {})[name] = tpl
         rel_template = RelationshipTemplate(tpl, name, self.custom_defs)
@@ -176,9 +565,10 @@ class TopologyTemplate(object):
     def _do_substitutions(self, nested_topologies):
         # if a node template should be substituted, set its substitution
         remaining_topologies = [t for t in nested_topologies if t is not self]
-        for nodetemplate in self.nodetemplates:
-            if "substitute" not in nodetemplate.directives:
+        for name in list(self.node_templates):
+            if "substitute" not in self.get_node_template_directives(name):
                 continue
+            nodetemplate = self.node_templates[name]
             for topology in remaining_topologies:
                 mappings = topology.substitution_mappings
                 if mappings.match(nodetemplate):
@@ -549,13 +939,13 @@ def find_type(typename: str, custom_defs, namespace_id=None):
         elif section == "relationship_types":
             custom_defs[typename]["derived_from"] = "tosca.relationships.Root"
     if test_typedef.is_derived_from("tosca.nodes.Root"):
-        typedef = NodeType(typename, custom_defs)
+        typedef = NodeType.intern(typename, custom_def=custom_defs)
     elif test_typedef.is_derived_from("tosca.relationships.Root"):
-        typedef = RelationshipType(typename, custom_defs)
+        typedef = RelationshipType.intern(typename, custom_def=custom_defs)
     elif test_typedef.is_derived_from("tosca.artifacts.Root"):
-        typedef = ArtifactTypeDef(typename, custom_defs)
+        typedef = ArtifactTypeDef.intern(typename, custom_def=custom_defs)
     elif test_typedef.is_derived_from(CapabilityType.TOSCA_TYPEURI_CAPABILITY_ROOT):
-        typedef = CapabilityType("", typename, custom_defs)
+        typedef = CapabilityType.intern("", typename, custom_def=custom_defs)
     else:
         typedef = test_typedef
     EntityType.add_type(typename, typedef)
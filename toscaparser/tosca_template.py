@@ -14,19 +14,25 @@
 import logging
 import os
 import tempfile
+import weakref
 
 from toscaparser.common.exception import ExceptionCollector
 from toscaparser.common.exception import InvalidTemplateVersion
 from toscaparser.common.exception import MissingRequiredFieldError
 from toscaparser.common.exception import UnknownFieldError
 from toscaparser.common.exception import ValidationError
-from toscaparser.elements.entity_type import update_definitions, EntityType, Namespace
+from toscaparser.elements.entity_type import _LazyDefinitions
+from toscaparser.elements.entity_type import EntityType
+from toscaparser.elements.entity_type import Namespace
+from toscaparser.elements.entity_type import reset_definitions
+from toscaparser.elements.entity_type import update_definitions
 from toscaparser.extensions.exttools import ExtTools
 import toscaparser.imports
 from toscaparser.prereq.csar import CSAR, TOSCA_META
 from toscaparser.repositories import Repository
 from toscaparser.topology_template import TopologyTemplate
 from toscaparser.substitution_mappings import SubstitutionMappings
+from toscaparser.utils import archiveutils
 from toscaparser.utils.gettextutils import _
 import toscaparser.utils.yamlparser
 
@@ -54,19 +60,29 @@ YAML_LOADER = toscaparser.utils.yamlparser.load_yaml
 class ToscaTemplate(object):
     exttools = ExtTools()
     strict = False
+    # resolve all the imported types up front (see Namespace.compile())
+    compile_types = False
+    # create and validate node templates when they are first accessed,
+    # see validate_node_templates()
+    lazy_node_templates = False
+    # if base_dir isn't given, read a CSAR's files from the archive instead
+    # of extracting it to a temporary directory, artifacts can then be
+    # extracted with csar.extract_file()
+    mount_csar = False
 
     MAIN_TEMPLATE_VERSIONS = ['tosca_simple_yaml_1_0',
                               'tosca_simple_yaml_1_2',
                               'tosca_simple_yaml_1_3']
 
-    VALID_TEMPLATE_VERSIONS = MAIN_TEMPLATE_VERSIONS + exttools.get_versions()
+    # extensions are only discovered if this is accessed
+    VALID_TEMPLATE_VERSIONS = _LazyDefinitions(
+        lambda cls: cls.MAIN_TEMPLATE_VERSIONS + cls.exttools.get_versions())
 
+    # sections for extension versions are in exttools.get_sections()
     ADDITIONAL_SECTIONS = {'tosca_simple_yaml_1_0': SPECIAL_SECTIONS,
                            'tosca_simple_yaml_1_2': SPECIAL_SECTIONS,
                            'tosca_simple_yaml_1_3': SPECIAL_SECTIONS}
 
-    ADDITIONAL_SECTIONS.update(exttools.get_sections())
-
     '''Load the template data.'''
     def __init__(
         self,
@@ -79,8 +95,11 @@ class ToscaTemplate(object):
         fragment="",
         base_dir=None,
         strict=None,
+        type_snapshot=None,
     ):
         ExceptionCollector.start()
+        EntityType.use_snapshot(type_snapshot)
+        reset_definitions()
         self.a_file = a_file
         self.path = None
         self.fragment = fragment
@@ -88,6 +107,8 @@ class ToscaTemplate(object):
         self.import_resolver = import_resolver
         self.nested_tosca_tpls = {}
         self.nested_topologies = {}
+        self.csar = None
+        self._yaml_dict_tpl = bool(yaml_dict_tpl)
         self.verify = verify
         if strict is not None:
             self.strict = strict
@@ -117,6 +138,8 @@ class ToscaTemplate(object):
             EntityType.reset_caches()
             self.description = self._tpl_description()
             all_custom_defs = self.load_imports()
+            if self.compile_types:
+                all_custom_defs.compile()
             self.topology_template = self._topology_template(all_custom_defs)
             self._repositories = None
             if self.topology_template.tpl:
@@ -127,7 +150,8 @@ class ToscaTemplate(object):
                 self._handle_nested_tosca_templates_with_topology(all_custom_defs.all_namespaces)
 
         if verify:
-            if self.topology_template and self.topology_template.tpl:
+            if (self.topology_template and self.topology_template.tpl and
+                    not self.lazy_node_templates):
                 # now that all the node templates have been loaded we can validated the relationships between them
                 self.validate_relationships()
             ExceptionCollector.stop()
@@ -140,6 +164,18 @@ class ToscaTemplate(object):
         # this loads tosca_plugins:
         self._validate_field()
 
+    def validate_node_templates(self):
+        '''Load and validate the node templates and their relationships.
+
+        Use this to run the full validation when lazy_node_templates is set.
+        '''
+        ExceptionCollector.start()
+        if self.topology_template and self.topology_template.tpl:
+            self.topology_template.load_node_templates()
+            self.validate_relationships()
+        ExceptionCollector.stop()
+        self.raise_validation_errors()
+
     def validate_relationships(self):
         # note: nested topologies are validated when the substituted node template is validated
         self.topology_template.validate_relationships(self.strict)
@@ -186,7 +222,7 @@ class ToscaTemplate(object):
         if self._metadata is None:
             metadata = self.tpl.setdefault(METADATA, {})
             csar_metadata_file = os.path.join(self.base_dir, TOSCA_META)
-            if os.path.isfile(csar_metadata_file):
+            if archiveutils.isfile(csar_metadata_file):
                 csar_metadata = YAML_LOADER(csar_metadata_file, True)
                 if csar_metadata:
                     for key, to in [
@@ -235,9 +271,12 @@ class ToscaTemplate(object):
         This method loads the custom type definitions referenced in "imports"
         section of the TOSCA YAML template.
         """
+        # types are only shared with other templates if self.tpl was
+        # loaded from this file (see EntityType.find_type)
         mtime = (
             os.path.getmtime(self.path)
-            if self.path and os.path.isfile(self.path)
+            if (self.path and not self._yaml_dict_tpl and
+                os.path.isfile(self.path))
             else None
         )
         imported_types = Namespace({}, None, self.path or "", mtime=mtime)
@@ -298,12 +337,20 @@ class ToscaTemplate(object):
 
         for name in self.tpl:
             if (name not in SECTIONS and
-               name not in self.ADDITIONAL_SECTIONS.get(version, ())):
+               name not in self._additional_sections(version)):
                 ExceptionCollector.appendException(
                     UnknownFieldError(what='Template', field=name))
 
+    def _additional_sections(self, version):
+        if version in self.ADDITIONAL_SECTIONS:
+            return self.ADDITIONAL_SECTIONS[version]
+        if version in self.MAIN_TEMPLATE_VERSIONS:
+            return ()
+        return self.exttools.get_sections().get(version, ())
+
     def _validate_version(self, version):
-        if version not in self.VALID_TEMPLATE_VERSIONS:
+        if (version not in self.MAIN_TEMPLATE_VERSIONS and
+                version not in self.VALID_TEMPLATE_VERSIONS):
             ExceptionCollector.appendException(
                 InvalidTemplateVersion(
                     what=version,
@@ -317,13 +364,18 @@ class ToscaTemplate(object):
             return path, unzip_dir
         elif path.lower().endswith(('.zip', '.csar')):
             # a CSAR archive
+            extract = unzip_dir is not None or not self.mount_csar
             if unzip_dir is None:
                 # tempdir should last as long as self
                 self._csar_tmp_dir = tempfile.TemporaryDirectory()
                 unzip_dir = self._csar_tmp_dir.name
-            csar = CSAR(path, self.a_file, unzip_dir)
-            if csar.validate():
-                self.a_file = True  # the file has been decompressed locally
+            csar = CSAR(path, self.a_file, unzip_dir, extract)
+            self.csar = csar
+            valid = csar.validate()
+            if csar.mounted:
+                weakref.finalize(self, csar.unmount)
+            if valid:
+                self.a_file = True  # the file is available locally
                 return os.path.join(csar.unzip_dir, csar.get_main_template()), csar.unzip_dir
         else:
             ExceptionCollector.appendException(
@@ -10,34 +10,208 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+from toscaparser.elements.entity_type import EntityType
+
 
 class ToscaGraph(object):
-    '''Graph of Tosca Node Templates.'''
+    '''Graph of Tosca Node Templates.
+
+    There is an edge from each node template to the target of each of its
+    relationships, so a node's targets need to be deployed before it.
+    Relationships that target templates that aren't in the graph are
+    ignored. The graph isn't updated if the node templates change after it
+    was created.
+
+    Methods that take a node template also accept its name.
+    '''
     def __init__(self, nodetemplates):
-        self.nodetemplates = nodetemplates
+        self.nodetemplates = list(nodetemplates)
         self.vertices = {}
+        self.edges = {}  # name => [(target node, relationship template)]
+        # name => [(source node, relationship template)]
+        self.reverse_edges = {}
+        self._components = None  # see _strongly_connected_components()
+        self._dependencies = {}
+        self._dependents = {}
         self._create()
 
     def _create_vertex(self, node):
-        if node not in self.vertices:
+        if node.name not in self.vertices:
             self.vertices[node.name] = node
+            self.edges[node.name] = []
+            self.reverse_edges[node.name] = []
 
-    def _create_edge(self, node1, node2, relationship):
-        if node1 not in self.vertices:
+    def _create_edge(self, node1, node2, relTpl):
+        if node1.name not in self.vertices:
             self._create_vertex(node1)
-        self.vertices[node1.name].related[node2] = relationship
+        self.vertices[node1.name].related[node2] = relTpl.type_definition
+        self.edges[node1.name].append((node2, relTpl))
+        self.reverse_edges[node2.name].append((node1, relTpl))
 
     def vertex(self, node):
-        if node in self.vertices:
-            return self.vertices[node]
+        name = self._name(node)
+        if name in self.vertices:
+            return self.vertices[name]
 
     def __iter__(self):
         return iter(self.vertices.values())
 
+    def __len__(self):
+        return len(self.vertices)
+
     def _create(self):
         for node in self.nodetemplates:
-            for relTpl, req, reqDef in node.relationships:
-                for tpl in self.nodetemplates:
-                    if tpl.name == relTpl.target.name:
-                        self._create_edge(node, tpl, relTpl.type_definition)
             self._create_vertex(node)
+        for node in self.nodetemplates:
+            for relTpl, req, reqDef in node.relationships:
+                target = relTpl.target and self.vertices.get(
+                    relTpl.target.name)
+                if target:
+                    self._create_edge(node, target, relTpl)
+
+    @staticmethod
+    def _name(node):
+        return node if isinstance(node, str) else node.name
+
+    def targets(self, node):
+        '''Return the node templates the given node has relationships to.'''
+        return [target for target, relTpl in self.edges[self._name(node)]]
+
+    def sources(self, node):
+        '''Return the node templates with relationships to the given node.'''
+        return [source
+                for source, relTpl in self.reverse_edges[self._name(node)]]
+
+    def _strongly_connected_components(self):
+        # Tarjan's algorithm, iterative so long chains don't hit the
+        # recursion limit. Components are found after the components they
+        # have edges to.
+        if self._components is not None:
+            return self._components
+        index = {}
+        lowlink = {}
+        stack = []
+        on_stack = set()
+        components = []
+        for root in self.vertices:
+            if root in index:
+                continue
+            work = [(root, iter(self.edges[root]))]
+            index[root] = lowlink[root] = len(index)
+            stack.append(root)
+            on_stack.add(root)
+            while work:
+                name, edges = work[-1]
+                for target, relTpl in edges:
+                    if target.name not in index:
+                        index[target.name] = lowlink[target.name] = len(index)
+                        stack.append(target.name)
+                        on_stack.add(target.name)
+                        work.append(
+                            (target.name, iter(self.edges[target.name])))
+                        break
+                    elif target.name in on_stack:
+                        lowlink[name] = min(lowlink[name], index[target.name])
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        lowlink[parent] = min(lowlink[parent], lowlink[name])
+                    if lowlink[name] == index[name]:
+                        component = []
+                        while True:
+                            member = stack.pop()
+                            on_stack.discard(member)
+                            component.append(member)
+                            if member == name:
+                                break
+                        component.reverse()
+                        components.append(component)
+        self._components = components
+        return components
+
+    def topological_order(self):
+        '''Return the node templates in the order they can be deployed.
+
+        The targets of a node's relationships come before the node. The
+        nodes in a cycle are kept together, see cycles().
+        '''
+        return [self.vertices[name]
+                for component in self._strongly_connected_components()
+                for name in component]
+
+    def reverse_topological_order(self):
+        '''Return the node templates in the order they can be undeployed.'''
+        return list(reversed(self.topological_order()))
+
+    def cycles(self):
+        '''Return the lists of node templates whose relationships cycle.'''
+        cycles = []
+        for component in self._strongly_connected_components():
+            if len(component) > 1 or any(
+                target.name == component[0]
+                for target, relTpl in self.edges[component[0]]
+            ):
+                cycles.append([self.vertices[name] for name in component])
+        return cycles
+
+    def hosted_on(self, node):
+        '''Return the chain of node templates the given node is hosted on.
+
+        The chain starts with the node's host.
+        '''
+        chain = []
+        seen = {self._name(node)}
+        name = self._name(node)
+        while True:
+            for target, relTpl in self.edges[name]:
+                if relTpl.is_derived_from(EntityType.HOSTEDON):
+                    break
+            else:
+                return chain
+            if target.name in seen:
+                return chain
+            seen.add(target.name)
+            chain.append(target)
+            name = target.name
+
+    def _closure(self, edges, memo, component_order):
+        # the transitive closure of each component is the union of the
+        # closures of its edges
+        if not memo:
+            component_of = {}
+            for component in self._strongly_connected_components():
+                for name in component:
+                    component_of[name] = component
+            closures = {}
+            for component in component_order:
+                closure = set()
+                for name in component:
+                    for node, relTpl in edges[name]:
+                        closure.add(node.name)
+                        other = component_of[node.name]
+                        if other is not component:
+                            closure.update(closures[id(other)])
+                closure = frozenset(closure)
+                closures[id(component)] = closure
+                for name in component:
+                    memo[name] = closure
+        return memo
+
+    def dependencies(self, node):
+        '''Return the names of the node templates the given node depends on.
+
+        This includes the nodes it depends on indirectly.
+        '''
+        memo = self._closure(self.edges, self._dependencies,
+                             self._strongly_connected_components())
+        return memo[self._name(node)]
+
+    def dependents(self, node):
+        '''Return the names of the node templates that depend on the node.
+
+        This includes the nodes that depend on it indirectly.
+        '''
+        memo = self._closure(self.reverse_edges, self._dependents,
+                             reversed(self._strongly_connected_components()))
+        return memo[self._name(node)]
@@ -0,0 +1,75 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+'''Read files from a zip archive as if it had been extracted.
+
+An open ZipFile can be mounted at a directory, after which the paths of
+its members under that directory can be found with find_member() and
+tested with isfile() and getmtime() without the archive being extracted.
+'''
+
+import os
+import threading
+import time
+
+_mounts = {}  # directory => ZipFile
+_lock = threading.Lock()
+
+
+def mount(directory, zfile):
+    with _lock:
+        _mounts[os.path.abspath(directory)] = zfile
+
+
+def unmount(directory):
+    with _lock:
+        return _mounts.pop(os.path.abspath(directory), None)
+
+
+def find_member(path):
+    '''Return the (ZipFile, member name) mounted at path or (None, None).'''
+    if not _mounts:
+        return None, None
+    path = os.path.abspath(path)
+    with _lock:
+        mounts = list(_mounts.items())
+    for directory, zfile in mounts:
+        if path.startswith(directory + os.sep):
+            name = os.path.relpath(path, directory).replace(os.sep, '/')
+            try:
+                zfile.getinfo(name)
+            except KeyError:
+                continue
+            return zfile, name
+    return None, None
+
+
+def isfile(path):
+    '''Like os.path.isfile() but also true for mounted archive members.'''
+    if os.path.isfile(path):
+        return True
+    zfile, name = find_member(path)
+    return zfile is not None and not name.endswith('/')
+
+
+def getmtime(path):
+    '''Like os.path.getmtime() but also works for mounted archive members.
+
+    Returns None if path isn't a file.
+    '''
+    if os.path.isfile(path):
+        return os.path.getmtime(path)
+    zfile, name = find_member(path)
+    if zfile is None or name.endswith('/'):
+        return None
+    # zip timestamps are in local time
+    return time.mktime(zfile.getinfo(name).date_time + (0, 0, -1))
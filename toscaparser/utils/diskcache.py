@@ -0,0 +1,342 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import hashlib
+import logging
+import os
+import pickle
+import stat
+import tempfile
+import threading
+
+log = logging.getLogger('tosca')
+
+# set to a directory to enable the on-disk cache
+CACHE_DIR_ENV = 'TOSCAPARSER_CACHE_DIR'
+# set to disable the on-disk cache even if it was enabled
+NO_CACHE_ENV = 'TOSCAPARSER_NO_CACHE'
+# maximum size in bytes of the on-disk cache
+CACHE_MAX_BYTES_ENV = 'TOSCAPARSER_CACHE_MAX_BYTES'
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# bump this when the format of cached entries changes
+CACHE_FORMAT = 1
+
+# suffix of the pre-parsed snapshots of YAML files, see load_snapshot()
+SNAPSHOT_SUFFIX = '.snapshot'
+
+
+def default_cache_dir():
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(
+        os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'toscaparser')
+
+
+class DiskCache(object):
+    '''Persistent cache of parsed documents.
+
+    Entries are pickled files in `directory` named after a digest of the
+    document's path, mtime and contents so a stale entry is never
+    returned. When the total size of the cache exceeds `max_bytes` the
+    least recently used entries are removed.
+
+    Entries are unpickled so the directory must be private: it is created
+    with mode 0700 and the cache is not used if the directory is not owned
+    by the current user or is writable by others.
+    '''
+
+    SUFFIX = '.pickle'
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._is_safe = None
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+
+    def make_key(self, path, mtime, contents):
+        if isinstance(contents, str):
+            contents = contents.encode('utf-8')
+        key = hashlib.sha256(
+            ('%s\0%s\0%s\0' % (CACHE_FORMAT, path, mtime)).encode('utf-8'))
+        key.update(contents)
+        return key.hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.directory, key + self.SUFFIX)
+
+    def is_safe(self):
+        '''Create the cache directory if needed and check its permissions.'''
+        if self._is_safe is None:
+            try:
+                os.makedirs(self.directory, mode=0o700, exist_ok=True)
+                dir_stat = os.stat(self.directory)
+            except OSError as e:
+                log.warning('unable to use cache directory %s: %s',
+                            self.directory, e)
+                self._is_safe = False
+                return False
+            if hasattr(os, 'getuid') and dir_stat.st_uid != os.getuid():
+                log.warning('not using cache directory %s: it is not owned '
+                            'by the current user', self.directory)
+                self._is_safe = False
+            elif dir_stat.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+                log.warning('not using cache directory %s: it is writable by '
+                            'other users', self.directory)
+                self._is_safe = False
+            else:
+                self._is_safe = True
+        return self._is_safe
+
+    def get(self, key, default=None):
+        if not self.is_safe():
+            return default
+        entry_path = self._entry_path(key)
+        try:
+            with open(entry_path, 'rb') as f:
+                doc = pickle.load(f)
+        except FileNotFoundError:
+            self.misses += 1
+            return default
+        except Exception as e:
+            log.debug('discarding unreadable cache entry %s: %s',
+                      entry_path, e)
+            self._remove(entry_path)
+            self.misses += 1
+            return default
+        try:
+            os.utime(entry_path)  # mark as recently used
+        except OSError:
+            pass
+        self.hits += 1
+        return doc
+
+    def put(self, key, doc):
+        try:
+            data = pickle.dumps(doc, pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            return False  # not cacheable
+        if self.max_bytes and len(data) > self.max_bytes:
+            return False
+        if not self.is_safe():
+            return False
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory,
+                                            suffix='.tmp')
+        except OSError as e:
+            log.debug('unable to write to cache directory %s: %s',
+                      self.directory, e)
+            return False
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, self._entry_path(key))
+        except Exception as e:
+            log.debug('unable to write to cache directory %s: %s',
+                      self.directory, e)
+            self._remove(tmp_path)
+            return False
+        self.writes += 1
+        self._evict()
+        return True
+
+    def _entries(self):
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return []
+        entries = []
+        for name in names:
+            if not name.endswith(self.SUFFIX):
+                continue
+            entry_path = os.path.join(self.directory, name)
+            try:
+                entry_stat = os.stat(entry_path)
+            except OSError:
+                continue
+            entries.append(
+                (entry_stat.st_mtime, entry_stat.st_size, entry_path))
+        return entries
+
+    def _remove(self, entry_path):
+        try:
+            os.remove(entry_path)
+        except OSError:
+            pass
+
+    def _evict(self):
+        if not self.max_bytes:
+            return
+        with self._lock:
+            entries = self._entries()
+            total = sum(size for mtime, size, entry_path in entries)
+            if total <= self.max_bytes:
+                return
+            for mtime, size, entry_path in sorted(entries):
+                self._remove(entry_path)
+                self.evictions += 1
+                total -= size
+                if total <= self.max_bytes:
+                    break
+
+    def clear(self):
+        for mtime, size, entry_path in self._entries():
+            self._remove(entry_path)
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+
+    def stats(self):
+        entries = self._entries()
+        return dict(hits=self.hits, misses=self.misses, writes=self.writes,
+                    evictions=self.evictions, entries=len(entries),
+                    size=sum(size for mtime, size, path in entries))
+
+
+_disk_cache = None
+_disabled = False
+
+
+def _max_bytes_from_env():
+    max_bytes = os.environ.get(CACHE_MAX_BYTES_ENV)
+    if max_bytes:
+        try:
+            return int(max_bytes)
+        except ValueError:
+            log.warning('ignoring invalid value for %s: "%s"',
+                        CACHE_MAX_BYTES_ENV, max_bytes)
+    return DEFAULT_MAX_BYTES
+
+
+def enable_disk_cache(directory=None, max_bytes=None):
+    '''Enable the on-disk cache (in `~/.cache/toscaparser` by default).'''
+    global _disk_cache, _disabled
+    if max_bytes is None:
+        max_bytes = _max_bytes_from_env()
+    _disk_cache = DiskCache(directory or default_cache_dir(), max_bytes)
+    _disabled = False
+    return _disk_cache
+
+
+def disable_disk_cache():
+    global _disabled
+    _disabled = True
+
+
+def get_disk_cache():
+    '''Return the active DiskCache or None if it isn't enabled.'''
+    global _disk_cache
+    if _disabled or os.environ.get(NO_CACHE_ENV):
+        return None
+    if _disk_cache is None:
+        directory = os.environ.get(CACHE_DIR_ENV)
+        if not directory:
+            return None
+        _disk_cache = DiskCache(directory, _max_bytes_from_env())
+    return _disk_cache
+
+
+def _snapshot_cache():
+    # snapshots are written to the cache directory even if the disk cache
+    # isn't enabled, but not if it was explicitly disabled
+    if _disabled or os.environ.get(NO_CACHE_ENV):
+        return None
+    disk_cache = get_disk_cache()
+    if disk_cache is None:
+        directory = os.environ.get(CACHE_DIR_ENV) or default_cache_dir()
+        disk_cache = DiskCache(directory)
+    return disk_cache if disk_cache.is_safe() else None
+
+
+def _read_snapshot(snapshot_path, digest):
+    try:
+        with open(snapshot_path, 'rb') as f:
+            entry = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        log.debug('ignoring unreadable snapshot %s: %s', snapshot_path, e)
+        return None
+    if (isinstance(entry, tuple) and len(entry) == 3
+            and entry[:2] == (CACHE_FORMAT, digest)):
+        return entry
+    return None  # made from another version of the file
+
+
+def write_snapshot(path, doc, digest=None, snapshot_path=None):
+    '''Write a pickled snapshot of the document parsed from `path`.
+
+    By default the snapshot is written next to the file, so it can be
+    generated when the package is built or installed. Returns True if
+    the snapshot was written.
+    '''
+    if digest is None:
+        with open(path, 'rb') as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+    if snapshot_path is None:
+        snapshot_path = path + SNAPSHOT_SUFFIX
+    try:
+        data = pickle.dumps((CACHE_FORMAT, digest, doc),
+                            pickle.HIGHEST_PROTOCOL)
+        fd, tmp_path = tempfile.mkstemp(
+            dir=os.path.dirname(snapshot_path), suffix='.tmp')
+    except Exception as e:
+        log.debug('unable to write snapshot %s: %s', snapshot_path, e)
+        return False
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, snapshot_path)
+    except Exception as e:
+        log.debug('unable to write snapshot %s: %s', snapshot_path, e)
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        return False
+    return True
+
+
+def load_snapshot(path, load):
+    '''Return the document in the YAML file at `path`.
+
+    The document is read from a pickled snapshot, looked for next to the
+    file (see write_snapshot()) and then in the cache directory. A
+    snapshot is only used if it was made from the current contents of the
+    file. Otherwise the file is parsed with `load(path)` and a snapshot
+    is written to the cache directory for the next process, whether or
+    not the disk cache is enabled.
+    '''
+    try:
+        with open(path, 'rb') as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return load(path)  # let the loader report the error
+    cache = _snapshot_cache()
+    candidates = [path + SNAPSHOT_SUFFIX]
+    if cache is not None:
+        cached_path = os.path.join(
+            cache.directory, os.path.basename(path) + SNAPSHOT_SUFFIX)
+        candidates.append(cached_path)
+    for snapshot_path in candidates:
+        entry = _read_snapshot(snapshot_path, digest)
+        if entry is not None:
+            return entry[2]
+    doc = load(path)
+    if doc and cache is not None:
+        write_snapshot(path, doc, digest, cached_path)
+    return doc
@@ -10,15 +10,174 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
-
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import io
+import threading
+import urllib.error
 import urllib.request as urllib2
 
 from urllib.parse import urljoin
 from urllib.parse import urlparse
 
 from toscaparser.common.exception import ExceptionCollector
+from toscaparser.utils import diskcache
 from toscaparser.utils.gettextutils import _
 
+DEFAULT_TIMEOUT = 30  # seconds
+
+
+class UrlFetcher(object):
+    '''Fetches documents over HTTP(S) for URL imports.
+
+    Requests share a session so connections (and the TLS context) are
+    reused, they time out after `timeout` seconds and failed connections
+    and 429/5xx responses are retried with exponential backoff.
+
+    Responses with an ETag or Last-Modified header are kept (in memory
+    and in the on-disk cache if it is enabled) and revalidated with a
+    conditional request the next time the URL is fetched.
+    '''
+
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, retries=3, backoff_factor=0.3,
+                 pool_maxsize=10, max_entries=256):
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.pool_maxsize = pool_maxsize
+        self.max_entries = max_entries
+        self._session = None
+        self._responses = OrderedDict()  # url => (etag, last_modified, body)
+        self._accessible = {}  # url => bool, see is_accessible()
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        with self._lock:
+            if self._session is None:
+                self._session = self._create_session()
+            return self._session
+
+    def _create_session(self):
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        retry = Retry(total=self.retries, backoff_factor=self.backoff_factor,
+                      status_forcelist=self.RETRY_STATUSES,
+                      allowed_methods=('GET', 'HEAD'),
+                      raise_on_status=False)
+        adapter = HTTPAdapter(pool_maxsize=self.pool_maxsize,
+                              max_retries=retry)
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def _get_cached(self, url):
+        with self._lock:
+            cached = self._responses.get(url)
+            if cached is not None:
+                self._responses.move_to_end(url)
+                return cached
+        cache = diskcache.get_disk_cache()
+        if cache:
+            cached = cache.get(self._disk_key(cache, url))
+        return cached
+
+    def _put_cached(self, url, cached):
+        with self._lock:
+            self._responses[url] = cached
+            self._responses.move_to_end(url)
+            while len(self._responses) > self.max_entries:
+                self._responses.popitem(last=False)
+        cache = diskcache.get_disk_cache()
+        if cache:
+            cache.put(self._disk_key(cache, url), cached)
+
+    def _disk_key(self, cache, url):
+        return cache.make_key('GET ' + url, None, b'')
+
+    def clear(self):
+        with self._lock:
+            self._responses.clear()
+            self._accessible.clear()
+
+    def is_accessible(self, url, timeout=None):
+        '''Return True if `url` exists, the result is cached per URL.
+
+        A HEAD request is tried first, if the server doesn't allow it the
+        first byte of the document is requested instead. Transient failures
+        (timeouts, connection errors, 429 and 5xx responses) return False
+        but aren't cached, so the URL is checked again next time.
+        '''
+        with self._lock:
+            accessible = self._accessible.get(url)
+        if accessible is None:
+            accessible = self._check(url, timeout or self.timeout)
+            if accessible is None:
+                return False
+            with self._lock:
+                self._accessible[url] = accessible
+        return accessible
+
+    def _check(self, url, timeout):
+        # returns None if the result might be different next time
+        import requests
+
+        try:
+            response = self.session.head(url, timeout=timeout,
+                                         allow_redirects=True)
+            if response.status_code in (403, 405, 501):
+                # HEAD not allowed
+                response = self.session.get(url, timeout=timeout,
+                                            headers={'Range': 'bytes=0-0'},
+                                            stream=True)
+                response.close()
+        except requests.RequestException:
+            return None
+        if response.status_code == 429 or response.status_code >= 500:
+            return None
+        return response.status_code in (200, 206)
+
+    def fetch(self, url):
+        '''Return the contents of `url` as bytes.
+
+        Raises urllib.error.URLError (or HTTPError) on failure.
+        '''
+        import requests
+
+        cached = self._get_cached(url)
+        headers = {}
+        if cached:
+            etag, last_modified, body = cached
+            if etag:
+                headers['If-None-Match'] = etag
+            if last_modified:
+                headers['If-Modified-Since'] = last_modified
+        try:
+            response = self.session.get(url, headers=headers,
+                                        timeout=self.timeout)
+        except requests.RequestException as e:
+            raise urllib.error.URLError(e)
+        if response.status_code == 304 and cached:
+            return cached[2]
+        if response.status_code >= 400:
+            raise urllib.error.HTTPError(url, response.status_code,
+                                         response.reason, response.headers,
+                                         None)
+        body = response.content
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if etag or last_modified:
+            self._put_cached(url, (etag, last_modified, body))
+        return body
+
+
+url_fetcher = UrlFetcher()
+
 
 class UrlUtils(object):
 
@@ -52,10 +211,43 @@ class UrlUtils(object):
         return urljoin(url, relative_path)
 
     @staticmethod
-    def url_accessible(url):
+    def url_accessible(url, timeout=None):
         """Validates whether the given URL is accessible.
 
-        Returns true if the get call returns a 200 response code.
-        Otherwise, returns false.
+        Returns true if the request returns a 200 response code.
+        Otherwise, returns false. Results for HTTP(S) URLs are cached.
+        """
+        if urlparse(url).scheme in ('http', 'https'):
+            return url_fetcher.is_accessible(url, timeout)
+        return urllib2.urlopen(
+            url, timeout=timeout or url_fetcher.timeout).getcode() == 200
+
+    @staticmethod
+    def check_urls(urls, max_workers=8):
+        """Checks whether the given URLs are accessible concurrently.
+
+        Returns a dictionary mapping each URL to the result of
+        url_accessible(), exceptions count as not accessible.
+        """
+        def check(url):
+            try:
+                return UrlUtils.url_accessible(url)
+            except Exception:
+                return False
+
+        urls = list(dict.fromkeys(urls))
+        if len(urls) < 2 or not max_workers:
+            return {url: check(url) for url in urls}
+        with ThreadPoolExecutor(min(max_workers, len(urls))) as executor:
+            return dict(zip(urls, executor.map(check, urls)))
+
+    @staticmethod
+    def open_url(url):
+        """Opens the given URL for reading.
+
+        HTTP(S) URLs are fetched with the shared UrlFetcher, other schemes
+        with urllib.
         """
-        return urllib2.urlopen(url).getcode() == 200
+        if urlparse(url).scheme in ('http', 'https'):
+            return io.BytesIO(url_fetcher.fetch(url))
+        return urllib2.urlopen(url)
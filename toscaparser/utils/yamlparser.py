@@ -10,18 +10,23 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import functools
+import hashlib
+import os
+import pickle
+import threading
 import urllib
 import urllib.error
-import urllib.request
 import yaml
-import certifi
-import ssl
 
 from collections import OrderedDict
 
 from toscaparser.common.exception import ExceptionCollector
 from toscaparser.common.exception import URLException
+from toscaparser.utils import archiveutils
+from toscaparser.utils import diskcache
 from toscaparser.utils.gettextutils import _
+from toscaparser.utils.urlutils import UrlUtils
 
 
 if hasattr(yaml, 'CSafeLoader'):
@@ -30,16 +35,177 @@ else:
     yaml_loader = yaml.SafeLoader
 
 
+class YamlCache(object):
+    '''Process-wide LRU cache of parsed YAML documents.
+
+    Entries are keyed by the resolved path of the document and validated
+    against a fingerprint of its source (mtime and size for local files,
+    a digest of the contents for URLs). Documents are stored pickled so
+    every hit returns a private copy that callers are free to mutate.
+
+    Note that URLs are still downloaded before the cache is consulted
+    (their digest is computed from the contents), so for URLs a hit only
+    saves the cost of parsing the document.
+    '''
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # path => (fingerprint, pickled doc)
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, path, fingerprint, default=None):
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None or entry[0] != fingerprint:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(path)
+            self.hits += 1
+            data = entry[1]
+        return pickle.loads(data)
+
+    def put(self, path, fingerprint, doc):
+        if not self.max_bytes:
+            return
+        try:
+            data = pickle.dumps(doc, pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            return  # not cacheable
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            self._discard(path)
+            self._entries[path] = (fingerprint, data)
+            self._size += len(data)
+            while self._size > self.max_bytes:
+                self._discard(next(iter(self._entries)))
+
+    def link(self, path, fingerprint, new_path, new_fingerprint):
+        '''Also cache the document cached for `path` under `new_path`.
+
+        The pickled document is shared by the two entries and this isn't
+        counted as a lookup. Returns False if `path` isn't cached with
+        `fingerprint`.
+        '''
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None or entry[0] != fingerprint:
+                return False
+            data = entry[1]
+            self._discard(new_path)
+            self._entries[new_path] = (new_fingerprint, data)
+            self._size += len(data)
+            while self._size > self.max_bytes:
+                self._discard(next(iter(self._entries)))
+        return True
+
+    def _discard(self, path):
+        entry = self._entries.pop(path, None)
+        if entry is not None:
+            self._size -= len(entry[1])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def size(self):
+        return self._size
+
+
+yaml_cache = YamlCache()
+
+_missing = object()
+
+
+def load_archive_member(zfile, name, cache_key=None):
+    '''Parse a YAML file in a zip archive.
+
+    The document is cached like the ones returned by load_yaml() so the
+    archive members of a CSAR are only parsed once while it is validated
+    and loaded. Raises an exception if the member can't be parsed.
+    '''
+    info = zfile.getinfo(name)
+    if zfile.filename:
+        cache_key = '%s!%s' % (os.path.abspath(zfile.filename), name)
+    fingerprint = (info.CRC, info.file_size, info.date_time)
+    if cache_key:
+        doc = yaml_cache.get(cache_key, fingerprint, _missing)
+        if doc is not _missing:
+            return doc
+    doc = yaml.load(zfile.read(name), Loader=yaml_loader)
+    if cache_key:
+        yaml_cache.put(cache_key, fingerprint, doc)
+    return doc
+
+
+def cache_extracted_member(zfile, name, path):
+    '''Reuse the parsed document of an archive member for its extracted file.
+
+    Nothing is cached if the member hasn't been parsed already.
+    '''
+    if not zfile.filename or name.endswith('/'):
+        return
+    info = zfile.getinfo(name)
+    cache_key = '%s!%s' % (os.path.abspath(zfile.filename), name)
+    fingerprint = (info.CRC, info.file_size, info.date_time)
+    stat = os.stat(path)
+    yaml_cache.link(cache_key, fingerprint, os.path.abspath(path),
+                    (stat.st_mtime_ns, stat.st_size))
+
+
 def load_yaml(path, a_file=True, fragment=None):
     f = None
     try:
+        cache_key = path
+        mtime = None
         if a_file:
+            cache_key = os.path.abspath(path)
+            # the file might be in a CSAR that hasn't been extracted
+            zfile, name = archiveutils.find_member(cache_key)
+            if zfile is not None:
+                return load_archive_member(zfile, name, cache_key)
+            stat = os.stat(cache_key)
+            mtime = stat.st_mtime_ns
+            fingerprint = (mtime, stat.st_size)
+            doc = yaml_cache.get(cache_key, fingerprint, _missing)
+            if doc is not _missing:
+                return doc
             f = open(path, encoding='utf-8', errors='strict')
         else:
-            f = urllib.request.urlopen(path, context=ssl.create_default_context(cafile=certifi.where()))
+            f = UrlUtils.open_url(path)
         contents = f.read()
         f.close()
-        return yaml.load(contents, Loader=yaml_loader)
+        if not a_file:
+            if isinstance(contents, str):
+                digest = hashlib.sha256(contents.encode('utf-8'))
+            else:
+                digest = hashlib.sha256(contents)
+            fingerprint = digest.digest()
+            doc = yaml_cache.get(cache_key, fingerprint, _missing)
+            if doc is not _missing:
+                return doc
+        disk_cache = diskcache.get_disk_cache()
+        if disk_cache:
+            disk_key = disk_cache.make_key(cache_key, mtime, contents)
+            doc = disk_cache.get(disk_key, _missing)
+            if doc is not _missing:
+                yaml_cache.put(cache_key, fingerprint, doc)
+                return doc
+        doc = yaml.load(contents, Loader=yaml_loader)
+        yaml_cache.put(cache_key, fingerprint, doc)
+        if disk_cache:
+            disk_cache.put(disk_key, doc)
+        return doc
     except urllib.error.URLError as e:
         if hasattr(e, 'reason'):
             msg = (_('Failed to reach server "%(path)s". Reason is: '
@@ -76,23 +242,80 @@ def simple_parse(tmpl_str):
     return tpl
 
 
-def ordered_load(stream, Loader=yaml.Loader, object_pairs_hook=OrderedDict):
-    class OrderedLoader(Loader):
-        pass
+class SourcePositions(object):
+    '''Side table of where each mapping in a parsed document starts.
+
+    Pass an instance to ordered_load() or simple_ordered_parse() and look
+    up the (line, column) of a mapping with get(), both are 1-based.
+    '''
+
+    def __init__(self):
+        self._positions = {}  # id(mapping) => (mapping, line, column)
+
+    def add(self, mapping, mark):
+        self._positions[id(mapping)] = (mapping, mark.line + 1,
+                                        mark.column + 1)
+
+    def get(self, mapping, default=None):
+        entry = self._positions.get(id(mapping))
+        if entry is None or entry[0] is not mapping:
+            return default
+        return entry[1:]
+
+    def __len__(self):
+        return len(self._positions)
+
+
+def _construct_ordered_mapping(loader, node):
+    loader.flatten_mapping(node)
+    mapping = loader.object_pairs_hook(loader.construct_pairs(node))
+    if loader.positions is not None:
+        loader.positions.add(mapping, node.start_mark)
+    return mapping
+
+
+class OrderedLoader(yaml_loader):
+    '''Safe loader that constructs mappings with `object_pairs_hook`.'''
+    object_pairs_hook = OrderedDict
+    positions = None
+
+
+OrderedLoader.add_constructor(
+    yaml.resolver.BaseResolver.DEFAULT_MAPPING_TAG,
+    _construct_ordered_mapping)
+
+
+def ordered_load(stream, Loader=None, object_pairs_hook=OrderedDict,
+                 positions=None):
+    if Loader is None or Loader is OrderedLoader:
+        loader_class = OrderedLoader
+    else:
+        loader_class = _ordered_loader_class(Loader)
+    loader = loader_class(stream)
+    if object_pairs_hook is not loader.object_pairs_hook:
+        loader.object_pairs_hook = object_pairs_hook
+    loader.positions = positions
+    try:
+        return loader.get_single_data()
+    finally:
+        loader.dispose()
+
 
-    def construct_mapping(loader, node):
-        loader.flatten_mapping(node)
-        return object_pairs_hook(loader.construct_pairs(node))
+@functools.lru_cache(maxsize=None)
+def _ordered_loader_class(Loader):
+    class _OrderedLoader(Loader):
+        object_pairs_hook = OrderedDict
+        positions = None
 
-    OrderedLoader.add_constructor(
+    _OrderedLoader.add_constructor(
         yaml.resolver.BaseResolver.DEFAULT_MAPPING_TAG,
-        construct_mapping)
-    return yaml.load(stream, OrderedLoader)
+        _construct_ordered_mapping)
+    return _OrderedLoader
 
 
-def simple_ordered_parse(tmpl_str):
+def simple_ordered_parse(tmpl_str, positions=None):
     try:
-        tpl = ordered_load(tmpl_str)
+        tpl = ordered_load(tmpl_str, positions=positions)
     except yaml.YAMLError as yea:
         ExceptionCollector.appendException(ValueError(yea))
     else: